@@ -1,4 +1,23 @@
+import sys
+
 from . import kvm
 
 if __name__ == "__main__":
-    kvm.main()
+    if sys.argv[1:2] == ["bench"]:
+        from . import bench
+
+        bench.main(sys.argv[2:])
+    elif sys.argv[1:2] == ["type-file"]:
+        from .utils import typefile
+
+        typefile.main(sys.argv[2:])
+    elif sys.argv[1:2] == ["replay"]:
+        from .utils import recorder
+
+        recorder.main(sys.argv[2:])
+    elif sys.argv[1:2] == ["macro"]:
+        from .utils import macro
+
+        macro.main(sys.argv[2:])
+    else:
+        kvm.main()
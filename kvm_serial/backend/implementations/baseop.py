@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from serial import Serial
 from kvm_serial.utils.communication import DataComm
+from kvm_serial.utils.metrics import REGISTRY
+from kvm_serial.utils.trace import TRACER
 
 
 class KeyboardOp(ABC):
@@ -20,6 +22,18 @@ class KeyboardOp(ABC):
         """
         self.serial_port = serial_port
         self.hid_serial_out = DataComm(self.serial_port)
+        self.events = REGISTRY.counter(
+            "kvm_input_events_total", "Input events captured", backend=self.name
+        )
+
+    def event(self, name: str = "key", count: int = 1, now: int | None = None):
+        """
+        Count input events as they arrive, and stamp them as the source of a trace span
+        when tracing (see kvm_serial.utils.trace)
+        :param now: time.perf_counter_ns() when the event was captured, if earlier than now
+        """
+        self.events.inc(count)
+        TRACER.begin(self.name, name, now)
 
     @abstractmethod
     def run(self):
@@ -37,6 +51,12 @@ class KeyboardOp(ABC):
         """
         pass
 
+    def stop(self):
+        """
+        Ask run() to return, for implementations which support it
+        """
+        pass
+
     def cleanup(self):
         """
         Optional cleanup method for implementations that need it.
@@ -1,7 +1,18 @@
 # curses implementation
 import curses
 import logging
+import os
+import selectors
+import sys
 
+from kvm_serial.utils.paste import (
+    DISABLE,
+    ENABLE,
+    ESC_TIMEOUT,
+    PASTE_START,
+    PasteParser,
+    send_paste,
+)
 from kvm_serial.utils.utils import ascii_to_scancode, build_scancode, scancode_to_ascii
 from .baseop import KeyboardOp
 
@@ -19,18 +30,18 @@ MODIFIER_CODES = {
     "KEY_BACKSPACE": 0x2A,
     "KEY_HOME": 0x4A,
     "KEY_END": 0x4D,
-    "KEY_F(1)": 0x3B,
-    "KEY_F(2)": 0x3C,
-    "KEY_F(3)": 0x3D,
-    "KEY_F(4)": 0x3E,
-    "KEY_F(5)": 0x3F,
-    "KEY_F(6)": 0x40,
-    "KEY_F(7)": 0x41,
-    "KEY_F(8)": 0x42,
-    "KEY_F(9)": 0x43,
-    "KEY_F(10)": 0x44,
-    "KEY_F(11)": 0x57,
-    "KEY_F(12)": 0x58,
+    "KEY_F(1)": 0x3A,
+    "KEY_F(2)": 0x3B,
+    "KEY_F(3)": 0x3C,
+    "KEY_F(4)": 0x3D,
+    "KEY_F(5)": 0x3E,
+    "KEY_F(6)": 0x3F,
+    "KEY_F(7)": 0x40,
+    "KEY_F(8)": 0x41,
+    "KEY_F(9)": 0x42,
+    "KEY_F(10)": 0x43,
+    "KEY_F(11)": 0x44,
+    "KEY_F(12)": 0x45,
 }
 
 # Mapping of control character codes (from curses) to character codes
@@ -67,17 +78,121 @@ CONTROL_CHARACTERS = {
 
 
 class CursesOp(KeyboardOp):
+    """
+    Curses operation mode. The terminal is read without blocking, and when no input is
+    pending the loop sleeps in select() on stdin, so keys are forwarded as soon as they
+    arrive and an idle loop uses no CPU. stop() wakes the loop through a pipe.
+    """
+
     def __init__(self, serial_port):
         super().__init__(serial_port=serial_port)
         self.sc = None
+        self.running = True
+        self._selector: selectors.BaseSelector | None = None
+        self._wake: tuple[int, int] | None = None
 
     @property
     def name(self):
         return "curses"
 
     def run(self):
-        # Run curses
-        curses.wrapper(self._input_loop)
+        # Open the wake pipe first, so that stop() can wake the loop from the outset
+        self._open()
+        try:
+            curses.wrapper(self._input_loop)
+        finally:
+            self.cleanup()
+
+    def stop(self):
+        """Make run() return, waking the input loop if it is waiting for a key"""
+        self.running = False
+        if self._wake is not None:
+            os.write(self._wake[1], b"\0")
+
+    def cleanup(self):
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        if self._wake is not None:
+            for fd in self._wake:
+                os.close(fd)
+            self._wake = None
+
+    def _open(self):
+        """Create the selector on stdin and the pipe stop() writes to"""
+        if self._selector is None:
+            self._wake = os.pipe()
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(sys.stdin.fileno(), selectors.EVENT_READ)
+            self._selector.register(self._wake[0], selectors.EVENT_READ)
+
+    def _wait_for_input(self, timeout: float | None = None):
+        """Block until stdin is readable, stop() is called, or the timeout expires"""
+        self._open()
+        for key, _ in self._selector.select(timeout):
+            if key.fd == self._wake[0]:
+                os.read(self._wake[0], 64)
+
+    def _paste_started(self, term) -> bool:
+        """
+        After an ESC, read ahead to see whether it starts a bracketed paste, waiting up to
+        ESC_TIMEOUT for each byte of the marker still to arrive
+        """
+        expected = [ord(c) for c in PASTE_START[1:]]
+        ahead = []
+        while len(ahead) < len(expected):
+            ch = term.getch()
+            if ch < 0:
+                self._wait_for_input(ESC_TIMEOUT)
+                ch = term.getch()
+                if ch < 0:
+                    break
+            ahead.append(ch)
+            if ch != expected[len(ahead) - 1]:
+                break
+
+        if ahead == expected:
+            return True
+        for ch in reversed(ahead):
+            curses.ungetch(ch)
+        return False
+
+    def _paste(self, term):
+        """Collect a bracketed paste and type it in bulk. ESC cancels a long paste"""
+        self.event("paste")
+        parser = PasteParser(in_paste=True)
+        text = None
+        while text is None:
+            try:
+                key = term.getkey()
+            except curses.error:
+                if not self.running:
+                    return
+                self._wait_for_input()
+                continue
+            if len(key) == 1:  # Named keys cannot be part of pasted text
+                text = next((s for pasted, s in parser.feed(key) if pasted), None)
+
+        def status(message: str):
+            y, _ = term.getyx()
+            term.move(y, 0)
+            term.clrtoeol()
+            term.addstr(message)
+            term.refresh()
+
+        def progress(sent: int, total: int):
+            status(f"Pasting: {sent}/{total} characters (ESC to cancel)")
+
+        # Keys typed during the paste are discarded, except ESC
+        escaped = False
+
+        def cancelled() -> bool:
+            nonlocal escaped
+            escaped = term.getch() == 0x1B
+            return escaped
+
+        sent = send_paste(self.hid_serial_out, text, progress=progress, cancelled=cancelled)
+        status(f"{'Paste cancelled after' if escaped else 'Pasted'} {sent} characters\n")
 
     def _input_loop(self, term) -> None:
         """
@@ -98,8 +213,15 @@ class CursesOp(KeyboardOp):
             "Press ESC to exit.\n"
         )
 
-        while self._parse_key(term):
-            pass
+        # Have the terminal mark pastes, so they can be sent in bulk
+        sys.stdout.write(ENABLE)
+        sys.stdout.flush()
+        try:
+            while self.running and self._parse_key(term):
+                pass
+        finally:
+            sys.stdout.write(DISABLE)
+            sys.stdout.flush()
 
     def _parse_key(self, term) -> bool:
         # Keep as much of the code inside this try block as possible!
@@ -110,13 +232,13 @@ class CursesOp(KeyboardOp):
                 if logging.DEBUG >= logging.root.level:
                     term.addstr(f"{str(self.sc)}\t({', '.join([hex(i) for i in self.sc])})\n")
 
-                self.hid_serial_out.send_scancode(bytes(self.sc))
-                self.hid_serial_out.release()
+                self.hid_serial_out.send_keypress(bytes(self.sc))
                 self.sc = None
 
             # Next, attempt to get a key from the curses terminal:
             try:
                 key = term.getkey()
+                self.event()
 
                 # Is it a 'named key'?
                 if len(key) > 1:
@@ -133,6 +255,11 @@ class CursesOp(KeyboardOp):
                     term.addstr(key)
                     return True
 
+                # Is it the start of a bracketed paste?
+                elif key == "\x1b" and self._paste_started(term):
+                    self._paste(term)
+                    return True
+
                 # Is it a control character?
                 elif ord(key) in CONTROL_CHARACTERS.keys():
                     self.sc = build_scancode(CONTROL_CHARACTERS[ord(key)], 0x1)
@@ -155,7 +282,7 @@ class CursesOp(KeyboardOp):
             # Handle common exceptions and continue to next loop (return True):
             except curses.error as e:
                 if "no input" in str(e).lower():
-                    curses.napms(100)
+                    self._wait_for_input()
                     return True
                 elif "addwstr" in str(e).lower():
                     term.clear()
@@ -1,7 +1,8 @@
 # pynput implementation
 import logging
 from pynput.keyboard import Key, KeyCode, Listener
-from kvm_serial.utils.utils import ascii_to_scancode, merge_scancodes
+from kvm_serial.utils.keyreport import KeyReportState
+from kvm_serial.utils import layout as _layout
 from .baseop import KeyboardOp
 
 logger = logging.getLogger(__name__)
@@ -17,9 +18,9 @@ MODIFIER_TO_VALUE = {
 KEYS_WITH_CODES = {
     Key.up: 0x52, Key.down: 0x51, Key.left: 0x50, Key.right: 0x4f,
     Key.delete: 0x4c, Key.backspace: 0x2a,
-    Key.f1: 0x3b, Key.f2: 0x3c, Key.f3: 0x3d, Key.f4: 0x3e,
-    Key.f5: 0x3f, Key.f6: 0x40, Key.f7: 0x41, Key.f8: 0x42,
-    Key.f9: 0x43, Key.f10: 0x44, Key.f11: 0x57, Key.f12: 0x58,
+    Key.f1: 0x3a, Key.f2: 0x3b, Key.f3: 0x3c, Key.f4: 0x3d,
+    Key.f5: 0x3e, Key.f6: 0x3f, Key.f7: 0x40, Key.f8: 0x41,
+    Key.f9: 0x42, Key.f10: 0x43, Key.f11: 0x44, Key.f12: 0x45,
     Key.home: 0x4a, Key.end: 0x4d, Key.page_down: 0x4e, Key.page_up: 0x4b,
     Key.space: 0x2C, Key.tab: 0x2B, Key.enter: 0x28,
     Key.caps_lock: 0x39,
@@ -30,6 +31,8 @@ KEYS_WITH_CODES = {
 }
 # fmt: on
 
+CTRL = 0x01 | 0x10  # Left and right Ctrl modifier bits
+
 
 class PynputOp(KeyboardOp):
     @property
@@ -38,7 +41,8 @@ class PynputOp(KeyboardOp):
 
     def __init__(self, serial_port):
         super().__init__(serial_port)
-        self.modifier_map = {}
+        self.state = KeyReportState()
+        self._held: dict[object, int] = {}  # Code sent for each held character key
 
     def run(self):
         """
@@ -60,59 +64,70 @@ class PynputOp(KeyboardOp):
         with Listener(on_press=self.on_press, on_release=self.on_release) as listener:
             listener.join()
 
+    def _key_id(self, key):
+        # Characters can change between press and release (e.g. Shift pressed between),
+        # so character keys are matched by their virtual key code where available
+        return getattr(key, "vk", None) or key
+
+    def _lookup(self, key) -> tuple[int, int]:
+        """(HID usage code, modifier bits) for a pynput key, or (0, 0) if it has none"""
+        if key in MODIFIER_TO_VALUE:
+            return 0, MODIFIER_TO_VALUE[key]
+        if key in KEYS_WITH_CODES:
+            return KEYS_WITH_CODES[key] or 0, 0
+
+        char = getattr(key, "char", None)
+        report = _layout.get_layout(None).encode(char) if char else None
+        if report is None:
+            logging.error(f"Key not found: {key}")
+            return 0, 0
+        # Modifiers come from the physical modifier keys, not from the character
+        return report[2], 0
+
     def on_press(self, key):
         """
-        Function which runs when a key is pressed down
+        Function which runs when a key is pressed down. Sends the new report, unless the
+        press is an auto-repeat of a key already held
         :param key:
         :return:
         """
-        scancode = [b for b in b"\x00" * 8]
-
-        try:
-            # Collect modifiers
-            if isinstance(key, Key):
-                if key in MODIFIER_TO_VALUE:
-                    value = MODIFIER_TO_VALUE[key]
-                    scancode[0] = value
-                else:
-                    value = KEYS_WITH_CODES[key]
-                    scancode[2] = value
-
-                self.modifier_map[key] = scancode
+        self.event("press")
 
-            scancode = merge_scancodes(self.modifier_map.values())
+        code, modifiers = self._lookup(key)
+        if code and isinstance(key, KeyCode):
+            self._held[self._key_id(key)] = code
 
-            # Merge alphanumerics in with the modifiers
-            if isinstance(key, KeyCode):
-                scancode[2] = ascii_to_scancode(key.char)[2]
-
-        except KeyError as e:
-            logging.error("Key not found: " + str(e))
-
-        # Merge keys in the modifier_keys_map and send over serial
-        logging.debug(f"{scancode}\t({', '.join([hex(i) for i in scancode])})")
-        self.hid_serial_out.send_scancode(bytes(scancode))
+        report = self.state.press(code, modifiers)
+        if report is not None:
+            logging.debug(f"{report.hex(' ')}")
+            self.hid_serial_out.send_scancode(report)
 
     def on_release(self, key):
         """
-        Function which runs when a key is released
+        Function which runs when a key is released. Keys still held stay in the report
         :param key:
         :return:
         """
-        # Send key release (null scancode)
-        self.hid_serial_out.release()
+        self.event("release")
+
+        code, modifiers = self._lookup(key)
+        if isinstance(key, KeyCode):
+            code = self._held.pop(self._key_id(key), code)
 
         # Ctrl + ESC escape sequence
-        if key == Key.esc and Key.ctrl in self.modifier_map:
+        if key == Key.esc and self.state.modifiers & CTRL:
+            self.state.clear()
+            self.hid_serial_out.send_scancode(self.state.report())
+
             # Stop listener
             from pynput.keyboard import Listener as PynputListener
 
             raise PynputListener.StopException()
 
-        try:
-            self.modifier_map.pop(key)
-        except KeyError:
-            pass  # It might not be a modifier. Ask forgiveness, not permission
+        report = self.state.release(code, modifiers)
+        if report is not None:
+            logging.debug(f"{report.hex(' ')}")
+            self.hid_serial_out.send_scancode(report)
 
 
 def main_pynput(serial_port):
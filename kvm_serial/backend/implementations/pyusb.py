@@ -1,5 +1,10 @@
 # PyUSB implementation
 import logging
+import queue
+import threading
+import time
+from array import array
+
 import usb.core
 from usb.core import Device, Interface
 from kvm_serial.utils.utils import scancode_to_ascii
@@ -20,6 +25,7 @@ class PyUSBOp(KeyboardOp):
     def __init__(self, serial_port):
         super().__init__(serial_port)
         self.usb_endpoints = get_usb_endpoints()
+        self.capture: USBCapture | None = None
 
     def run(self):
         """
@@ -45,27 +51,36 @@ class PyUSBOp(KeyboardOp):
             if dev.is_kernel_driver_active(interface_number):
                 dev.detach_kernel_driver(interface_number)
 
+            capture = self.capture = USBCapture(endpoint).start()
             logging.info("Press Ctrl+ESC to exit")
-            while self._parse_key(endpoint):
+            while self._parse_key(*capture.get()):
                 pass
 
         except usb.core.USBError as e:
             logging.error(e)
 
         finally:
+            if self.capture is not None:
+                self.capture.stop()
+                self.capture = None
             usb.util.dispose_resources(dev)
             if dev is not None:
                 dev.attach_kernel_driver(interface_number)
 
-    def _parse_key(self, endpoint):
-        # Read keyboard scancodes
-        try:
-            data_in = endpoint.read(endpoint.wMaxPacketSize, timeout=100)
-        except usb.core.USBError as e:
-            if e.errno == 60:
-                # logging.debug("[Errno 60] Operation timed out. Continuing...")
-                return True
-            raise e
+    def stop(self):
+        if self.capture is not None:
+            self.capture.stop()
+
+    def _parse_key(self, data_in: bytes, captured: int | None = None) -> bool:
+        """
+        Forward one keyboard report
+        :param data_in: HID report read from the keyboard (empty once capture stops)
+        :param captured: time.perf_counter_ns() when the report was read, for tracing
+        :return: False on Ctrl+ESC or end of capture, otherwise whether the report was sent
+        """
+        if not data_in:
+            return False
+        self.event(now=captured)
 
         # Debug print scancodes:
         logging.debug(
@@ -93,6 +108,113 @@ class PyUSBOp(KeyboardOp):
         return self.hid_serial_out.send_scancode(data_in)
 
 
+class USBCapture:
+    """
+    Read reports from an interrupt IN endpoint on a dedicated thread.
+
+    The reader goes straight from one transfer to the next, into a pool of buffers
+    allocated up front, and hands each filled buffer to the consumer through a queue;
+    get() copies the report out and recycles the buffer at once, so the serial output
+    path never holds up the next read. Reads block for up to `timeout` ms, so an idle
+    keyboard wakes the thread once per timeout rather than polling.
+
+    pyusb exposes no asynchronous transfers, so one transfer is in flight at a time;
+    the pool lets the reader run ahead of the consumer by up to `buffers` reports, and
+    only if every buffer is waiting to be consumed does the reader wait for one.
+    """
+
+    def __init__(self, endpoint, buffers: int = 16, timeout: int = 1000):
+        """
+        :param endpoint: pyusb interrupt IN endpoint to read
+        :param buffers: Number of report buffers to preallocate
+        :param timeout: Milliseconds each read waits for a report; bounds stop() latency
+        """
+        self.endpoint = endpoint
+        self.timeout = timeout
+        size = endpoint.wMaxPacketSize
+        self._free: queue.SimpleQueue[array | None] = queue.SimpleQueue()
+        for _ in range(buffers):
+            self._free.put(array("B", bytes(size)))
+        self._reports: queue.SimpleQueue[tuple[array | None, int | BaseException, int]] = (
+            queue.SimpleQueue()
+        )
+
+        self.received = 0
+        self.stalls = 0  # Reads delayed because every buffer was waiting to be consumed
+
+        self.running = False
+        self.thread = threading.Thread(target=self._run, name="USBCapture", daemon=True)
+
+    def start(self) -> "USBCapture":
+        self.running = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop reading and wake get(); returns once the read in flight completes or times out"""
+        self.running = False
+        self._reports.put((None, 0, 0))
+        self._free.put(None)  # Wake the reader if it is waiting for a buffer
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def get(self, timeout: float | None = None) -> tuple[bytes, int]:
+        """
+        Wait for the next report
+        :param timeout: Seconds to wait, or None to wait until a report arrives
+        :return: The report, copied out of its buffer, and the time.perf_counter_ns() at
+            which it was read; (b"", 0) once stopped
+        :raises queue.Empty: On timeout
+        :raises Exception: Whatever made the reader thread fail; it has stopped
+        """
+        buffer, length, captured = self._reports.get(timeout=timeout)
+        if buffer is None:
+            self._reports.put((None, length, 0))  # Every later get() sees it too
+            if isinstance(length, BaseException):
+                raise length
+            return b"", 0
+        report = buffer[:length].tobytes()
+        self._free.put(buffer)
+        return report, captured
+
+    def _fail(self, error: BaseException):
+        """Stop reading, and have get() raise the error"""
+        self.running = False
+        self._reports.put((None, error, 0))
+
+    def _run(self):
+        free, reports, endpoint = self._free, self._reports, self.endpoint
+        while self.running:
+            try:
+                buffer = free.get_nowait()
+            except queue.Empty:
+                self.stalls += 1
+                buffer = free.get()
+            if buffer is None:
+                return
+
+            try:
+                length = endpoint.read(buffer, timeout=self.timeout)
+            except usb.core.USBTimeoutError:
+                length = 0
+            except usb.core.USBError as e:
+                if e.errno != 60:  # Operation timed out (macOS)
+                    self._fail(e)
+                    return
+                length = 0
+            except Exception as e:
+                self._fail(e)
+                return
+
+            if length:
+                # Stamped here, so traces include the time spent queued for the consumer
+                captured = time.perf_counter_ns()
+                self.received += 1
+                reports.put((buffer, length, captured))
+            else:
+                free.put(buffer)
+
+
 def get_usb_endpoints():
     endpoints = {}
 
@@ -1,14 +1,18 @@
 # tty implementation
+import codecs
+import os
+import select
 import sys
 import tty
 import termios
 import logging
-import time
-from kvm_serial.utils.utils import ascii_to_scancode
+from kvm_serial.utils.paste import DISABLE, ENABLE, ESC_TIMEOUT, PasteParser, send_paste
 from .baseop import KeyboardOp
 
 logger = logging.getLogger(__name__)
 
+READ_SIZE = 65536
+
 
 class TtyOp(KeyboardOp):
     """
@@ -20,8 +24,18 @@ class TtyOp(KeyboardOp):
     TTY operation mode is a very basic mode which can support pasted text, but
     has no support for modifier keys, which will be parsed by the host and NOT
     passed through to the CH9329 HID keyboard
+
+    Input is read as it arrives: everything available is translated as a batch and
+    written in one burst, with the pace set by the serial link (e.g. a SerialWriter
+    given the baud rate). Bracketed paste is enabled, so pasted text is collected whole
+    and sent in bulk, with progress and cancel.
     """
 
+    def __init__(self, serial_port):
+        super().__init__(serial_port)
+        self.parser = PasteParser()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
     @property
     def name(self):
         return "tty"
@@ -35,22 +49,83 @@ class TtyOp(KeyboardOp):
 
         try:
             tty.setcbreak(sys.stdin)
+            print(ENABLE, end="", flush=True)
             while self._parse_key():
-                time.sleep(0.1)
+                pass
         except termios.error as e:
             raise Exception("Run this app from a terminal!") from e
+        finally:
+            print(DISABLE, end="", flush=True)
+
+    def _read(self, timeout: float | None = None) -> str | None:
+        """
+        Read all input available, waiting up to timeout (None: forever) for some
+        :return: The text read, "" if nothing complete arrived in time (e.g. only part of a
+            multi-byte character), or None at end of input
+        """
+        fd = sys.stdin.fileno()
+        if not select.select([fd], [], [], timeout)[0]:
+            return ""
+
+        # stdin stays blocking (it shares the terminal with stdout): drain it while ready
+        chunks = [os.read(fd, READ_SIZE)]
+        if not chunks[0]:
+            return None
+        while chunks[-1] and select.select([fd], [], [], 0)[0]:
+            chunks.append(os.read(fd, READ_SIZE))
+        return self._decoder.decode(b"".join(chunks))
 
     def _parse_key(self) -> bool:
-        ascii_val = sys.stdin.read(1)
-        scancode = ascii_to_scancode(ascii_val)
-        print(ascii_val, end="", flush=True)
-        logging.debug(scancode)
+        parser = self.parser
+        data = ""
+        while data == "":  # Wait out partial characters
+            data = self._read()
+        if data is None:
+            return False  # End of input
+        segments = parser.feed(data)
+
+        # Collect the rest of a paste, and release a held-back ESC if nothing follows it
+        while parser.in_paste or parser.pending:
+            data = self._read(None if parser.in_paste else ESC_TIMEOUT)
+            if data is None:
+                return False
+            if data:
+                segments += parser.feed(data)
+            elif not parser.in_paste:
+                segments += parser.flush()
 
-        self.hid_serial_out.send_scancode(bytes(scancode))
-        self.hid_serial_out.release()
+        for pasted, text in segments:
+            if pasted:
+                self._paste(text)
+                continue
+
+            # Everything typed since the last read goes out in one write
+            self.event(count=len(text))
+            print(text, end="", flush=True)
+            logging.debug(f"Typing {text!r}")
+            self.hid_serial_out.send_text(text)
 
         return True
 
+    def _paste(self, text: str):
+        """Type a bracketed paste in bulk, showing progress. ESC cancels"""
+        self.event("paste")
+
+        def progress(sent: int, total: int):
+            print(f"\rPasting: {sent}/{total} characters (ESC to cancel)", end="", flush=True)
+
+        # Keys typed during the paste are discarded, except ESC
+        escaped = False
+
+        def cancelled() -> bool:
+            nonlocal escaped
+            escaped = "\x1b" in (self._read(0) or "")
+            return escaped
+
+        sent = send_paste(self.hid_serial_out, text, progress=progress, cancelled=cancelled)
+        outcome = "Paste cancelled after" if escaped else "Pasted"
+        print(f"\r{outcome} {sent} characters" + " " * 30)
+
 
 # For backward compatibility
 def main_tty(serial_port):
@@ -2,6 +2,8 @@ import threading
 from serial import Serial
 from enum import Enum
 from .inputhandler import InputHandler
+from kvm_serial.utils.flowcontrol import RateController
+from kvm_serial.utils.writer import SerialWriter
 
 try:
     from kvm_serial.backend.implementations.baseop import KeyboardOp
@@ -22,11 +24,17 @@ class Mode(Enum):
 
 
 class KeyboardListener(InputHandler):
-    def __init__(self, serial_port: Serial | str, mode: Mode | str = "pynput", baud: int = 9600):
+    def __init__(
+        self,
+        serial_port: Serial | SerialWriter | str,
+        mode: Mode | str = "pynput",
+        baud: int = 9600,
+        rate: RateController | None = None,
+    ):
 
         if isinstance(serial_port, str):
             self.serial_port = Serial(serial_port, baud)
-        elif isinstance(serial_port, Serial):
+        elif isinstance(serial_port, (Serial, SerialWriter)):
             self.serial_port = serial_port
 
         if isinstance(mode, str):
@@ -34,7 +42,11 @@ class KeyboardListener(InputHandler):
         elif isinstance(mode, Mode):
             self.mode = mode
 
+        # Paces bulk sends (pastes, typed bursts) by the device's replies
+        self.rate = rate
+
         self.running = False
+        self.handler: KeyboardOp | None = None
         self.thread = threading.Thread(target=self.run_keyboard)
 
     def run(self):
@@ -46,6 +58,8 @@ class KeyboardListener(InputHandler):
 
     def stop(self):
         self.running = False
+        if self.handler is not None:
+            self.handler.stop()
         self.thread.join()
 
     def run_keyboard(self):
@@ -73,6 +87,8 @@ class KeyboardListener(InputHandler):
         else:
             raise Exception("Selected mode somehow invalid")
 
+        keyboard_handler.hid_serial_out.rate = self.rate
+        self.handler = keyboard_handler
         keyboard_handler.run()
 
 
@@ -5,13 +5,27 @@ from serial import Serial
 from screeninfo import get_monitors
 
 from kvm_serial.utils.communication import DataComm
+from kvm_serial.utils.metrics import REGISTRY
+from kvm_serial.utils.mousereport import (
+    ABS_RANGE,
+    BUTTON_LEFT,
+    BUTTON_MIDDLE,
+    BUTTON_RIGHT,
+    MouseReportEngine,
+)
 from .inputhandler import InputHandler
 
 logger = logging.getLogger(__name__)
 
 
 class MouseListener(InputHandler):
-    def __init__(self, serial, block=True):
+    def __init__(self, serial, block=True, rate: float | None = 125, dead_zone: int = 0):
+        """
+        :param serial: Serial port (or SerialWriter) connected to the CH9329
+        :param block: Suppress mouse events reaching the host OS
+        :param rate: Mouse reports per second, or None to send one report per event
+        :param dead_zone: Pointer moves of at most this many device units are not sent alone
+        """
         self.thread = Listener(
             on_move=self.on_move,
             on_click=self.on_click,
@@ -19,13 +33,17 @@ class MouseListener(InputHandler):
             suppress=block,  # Suppress mouse events reaching the OS
         )
         self.comm = DataComm(serial)
+        self.engine = MouseReportEngine(self.comm, rate=rate, dead_zone=dead_zone)
+        self.events = REGISTRY.counter(
+            "kvm_input_events_total", "Input events captured", backend="mouse"
+        )
 
-        # Mouse movement control character
+        # Mouse button masks
         self.control_chars = {
-            "NU": b"\x00",  # Release
-            Button.left: b"\x01",  # Left click
-            Button.right: b"\x02",  # Right click
-            Button.middle: b"\x04",  # Centre Click
+            "NU": 0x00,  # Release
+            Button.left: BUTTON_LEFT,  # Left click
+            Button.right: BUTTON_RIGHT,  # Right click
+            Button.middle: BUTTON_MIDDLE,  # Centre Click
         }
 
         # Get screen dimensions
@@ -34,58 +52,50 @@ class MouseListener(InputHandler):
         self.height = monitor.height
 
     def run(self):
-        self.thread.start()
+        self.start()
         self.thread.join()
 
     def start(self):
+        self.engine.start()
         self.thread.start()
 
     def stop(self):
         self.thread.stop()
         self.thread.join()
+        self.engine.stop()
 
-    def on_move(self, x, y):
-        # Prepare data payload
-        data = bytearray(b"\x02\x00")  # Absolute coordinates (0x02); No mouse buttons (0x0)
-
-        # Scale coordinates to device range
-        dx = int((4096 * x) // self.width)
-        dy = int((4096 * y) // self.height)
+    def scale(self, x, y) -> tuple[int, int]:
+        """Scale screen coordinates to the device's absolute range"""
+        dx = int((ABS_RANGE * x) // self.width)
+        dy = int((ABS_RANGE * y) // self.height)
 
         # Handle negative coordinates (e.g., dual monitor setups)
         if dx < 0:
-            dx = abs(4096 + dx)
+            dx = abs(ABS_RANGE + dx)
         if dy < 0:
-            dy = abs(4096 + dy)
-
-        data += dx.to_bytes(2, "little")
-        data += dy.to_bytes(2, "little")
+            dy = abs(ABS_RANGE + dy)
 
-        # Ensure data is exactly 7 bytes for abs move
-        data = data[:7] if len(data) > 7 else data.ljust(7, b"\x00")
+        return dx, dy
 
-        self.comm.send(data, cmd=b"\x04")
+    def on_move(self, x, y):
+        self.events.inc()
+        self.engine.move_to(*self.scale(x, y))
         logging.debug(f"Mouse moved to ({x}, {y})")
 
         return True
 
     def on_click(self, x, y, button: Button, down):
-        data = bytearray(b"\x01")  # Relative coordinates (0x01)
-        data += self.control_chars[button] if down else b"\x00"  # Mouse button
-        data += b"\x00\x00"  # Rel. mouse position x/y coordinate (2 bytes 0x0)
-        data += b"\x00"  # pad to length 5
-
-        self.comm.send(data, cmd=b"\x05")
+        self.events.inc()
+        # Ensure the click lands where the OS saw it, then send the button change
+        self.engine.move_to(*self.scale(x, y))
+        self.engine.set_button(self.control_chars[button], down)
 
         logging.debug(f"Mouse click at ({x}, {y}) with {button} (down={down}) - suppressed.")
         return True  # Suppress the click event
 
     def on_scroll(self, x, y, dx, dy):
-        data = bytearray(b"\x01")  # Relative coordinates (0x01)
-        data += dx.to_bytes(2, "big", signed=True)
-        data += dy.to_bytes(2, "big", signed=True)
-
-        self.comm.send(data, cmd=b"\x05")
+        self.events.inc()
+        self.engine.scroll(dy)
 
         logging.debug(f"Mouse scroll ({x}, {y}, {dx}, {dy})")
         return True
@@ -103,6 +113,13 @@ if __name__ == "__main__":
         default=9600,
         type=int,
     )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        help="Mouse reports per second (0 for one report per event)",
+        default=125,
+        type=float,
+    )
     parser.add_argument(
         "-x",
         "--block",
@@ -113,7 +130,7 @@ if __name__ == "__main__":
 
     try:
         se = Serial(args.port, args.baud)
-        ml = MouseListener(se, block=args.block)
+        ml = MouseListener(se, block=args.block, rate=args.rate)
         ml.start()
         while ml.thread.is_alive():
             ml.thread.join(timeout=0.1)
@@ -4,10 +4,21 @@ import cv2
 import numpy
 import threading
 import logging
+import time
+from kvm_serial.utils.metrics import REGISTRY
 from .inputhandler import InputHandler
 
 logger = logging.getLogger(__name__)
 
+_captured = REGISTRY.counter("kvm_video_frames_captured_total", "Frames read from the camera")
+_displayed = REGISTRY.counter("kvm_video_frames_displayed_total", "Frames shown in the window")
+_dropped = REGISTRY.counter("kvm_video_frames_dropped_total", "Failed frame reads")
+_frame_seconds = REGISTRY.histogram(
+    "kvm_video_frame_seconds",
+    "Time between displayed frames",
+    buckets=(0.01, 0.02, 0.033, 0.05, 0.067, 0.1, 0.2, 0.5, 1.0),
+)
+
 CAMERAS_TO_CHECK = 10
 MAX_CAM_FAILURES = 1
 
@@ -133,10 +144,21 @@ class CaptureDevice(InputHandler):
     def frameLoop(self, exitKey=27, windowTitle="kvm"):
         try:
             self.running = True
+            last = None
             while self.cam.isOpened():
                 # Display the captured frame
-                _, frame = self.cam.read()
-                cv2.imshow(windowTitle, frame)
+                ok, frame = self.cam.read()
+                if ok:
+                    _captured.inc()
+                    cv2.imshow(windowTitle, frame)
+                    _displayed.inc()
+
+                    now = time.perf_counter()
+                    if last is not None:
+                        _frame_seconds.observe(now - last)
+                    last = now
+                else:
+                    _dropped.inc()
 
                 # Default is 'ESC' to exit the loop
                 # 50 = 20fps?
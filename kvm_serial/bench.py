@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the serial hot path.
+
+Micro-benchmarks measure encoding and scancode conversion in isolation. Loopback
+benchmarks drive a CH9329Simulator on a pty end-to-end, at each baud rate and through
+each sending backend, measuring throughput and key-event-to-wire latency.
+
+Run with `python -m kvm_serial bench` to print the results as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import select
+import sys
+import threading
+import time
+from importlib import metadata
+from typing import Callable
+
+from kvm_serial.utils.bulk import encode_text
+from kvm_serial.utils.communication import CMD_MOUSE_ABS, DataComm
+from kvm_serial.utils.metrics import Counter, Histogram
+from kvm_serial.utils.utils import merge_scancodes, scancode_to_ascii, string_to_scancodes
+
+BACKENDS = ("direct", "writer", "async")
+SAMPLE_TEXT = "The quick brown fox jumps over the lazy dog! 0123456789 (x + y) * z;\n"
+
+
+class NullPort:
+    """Serial stand-in which discards written bytes, so only encoding cost is measured"""
+
+    def write(self, data) -> int:
+        return len(data)
+
+
+def legacy_encode(data: bytes, head=b"\x57\xab", addr=b"\x00", cmd=b"\x02") -> bytes:
+    """Frame encoding as performed by DataComm.send before FrameEncoder (for comparison)"""
+    if len(head) != 2 or len(addr) != 1 or len(cmd) != 1:
+        raise ValueError("DataComm packet header MUST have: header 2b; addr 1b; cmd 1b")
+
+    length = len(data).to_bytes(1, "little")
+    checksum = (
+        sum(head)
+        + int.from_bytes(addr, "big")
+        + int.from_bytes(cmd, "big")
+        + int.from_bytes(length, "big")
+        + sum(data)
+    ) % 256
+    return head + addr + cmd + length + data + bytes([checksum])
+
+
+def frames_per_second(func: Callable[[], object], iterations: int = 100_000) -> float:
+    """Time `iterations` calls of func and return the call rate"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed else float("inf")
+
+
+def bench_frame_encoder(iterations: int = 100_000) -> dict:
+    """
+    Compare legacy and current frame encoding for keyboard and absolute mouse reports
+    :param iterations: Number of frames to encode per measurement
+    :return: dict of frames/sec keyed by measurement name
+    """
+    port = NullPort()
+    comm = DataComm(port)
+    key = bytes((0x0, 0x0, 0x4, 0x0, 0x0, 0x0, 0x0, 0x0))
+    move = bytearray(b"\x02\x00\x00\x08\x00\x08\x00")
+
+    return {
+        "keyboard_legacy": frames_per_second(lambda: port.write(legacy_encode(key)), iterations),
+        "keyboard_send": frames_per_second(lambda: comm.send(key), iterations),
+        "mouse_legacy": frames_per_second(
+            lambda: port.write(legacy_encode(move, cmd=CMD_MOUSE_ABS)), iterations
+        ),
+        "mouse_send": frames_per_second(lambda: comm.send(move, cmd=CMD_MOUSE_ABS), iterations),
+    }
+
+
+def percentiles(samples: list[float]) -> dict:
+    """p50/p95/p99 of samples, in milliseconds"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": None, "p95": None, "p99": None}
+
+    def pick(p: int) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3)
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99)}
+
+
+def bench_utils(iterations: int = 10_000) -> dict:
+    """
+    Measure the scancode conversion utilities
+    :param iterations: Number of calls per measurement
+    :return: dict of rates keyed by measurement name
+    """
+    scancodes = string_to_scancodes("aB1!")
+    shifted = string_to_scancodes("A")[0]
+
+    start = time.perf_counter()
+    for _ in range(max(1, iterations // len(SAMPLE_TEXT))):
+        string_to_scancodes(SAMPLE_TEXT)
+    chars = max(1, iterations // len(SAMPLE_TEXT)) * len(SAMPLE_TEXT)
+    elapsed = time.perf_counter() - start
+
+    text = SAMPLE_TEXT * max(1, iterations // len(SAMPLE_TEXT))
+    start = time.perf_counter()
+    encode_text(text)
+    bulk = time.perf_counter() - start
+
+    return {
+        "string_to_scancodes_chars_per_sec": chars / elapsed if elapsed else float("inf"),
+        "encode_text_chars_per_sec": len(text) / bulk if bulk else float("inf"),
+        "merge_scancodes_per_sec": frames_per_second(
+            lambda: merge_scancodes(scancodes), iterations
+        ),
+        "scancode_to_ascii_per_sec": frames_per_second(
+            lambda: scancode_to_ascii(shifted), iterations
+        ),
+    }
+
+
+def bench_cpu_per_frame(iterations: int = 100_000) -> dict:
+    """CPU time per frame sent through DataComm to a NullPort, in microseconds"""
+    comm = DataComm(NullPort())
+    key = bytes((0x0, 0x0, 0x4, 0x0, 0x0, 0x0, 0x0, 0x0))
+    reports = [key, DataComm.RELEASE] * (iterations // 2)
+
+    start = time.process_time()
+    for _ in range(iterations):
+        comm.send(key)
+    single = time.process_time() - start
+
+    start = time.process_time()
+    comm.send_many(reports)
+    batched = time.process_time() - start
+
+    # Cost of the metrics instrumenting each frame
+    counter, histogram = Counter(), Histogram()
+    start = time.process_time()
+    for _ in range(iterations):
+        counter.inc()
+    counted = time.process_time() - start
+
+    start = time.process_time()
+    for _ in range(iterations):
+        histogram.observe(0.003)
+    observed = time.process_time() - start
+
+    return {
+        "send_us": single / iterations * 1e6,
+        "send_many_us": batched / max(1, len(reports)) * 1e6,
+        "metrics_counter_us": counted / iterations * 1e6,
+        "metrics_histogram_us": observed / iterations * 1e6,
+    }
+
+
+def _wakeup_latencies(wait: Callable[[int], object], samples: int, spread: float) -> list[float]:
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    sent: list[float] = []
+
+    def type_keys():
+        rng = random.Random(0)
+        for _ in range(samples):
+            time.sleep(rng.uniform(0, spread))
+            sent.append(time.perf_counter())
+            os.write(write_fd, b"k")
+
+    typist = threading.Thread(target=type_keys, daemon=True)
+    typist.start()
+    latencies = []
+    try:
+        while len(latencies) < samples:
+            try:
+                os.read(read_fd, 1)
+            except BlockingIOError:
+                wait(read_fd)
+                continue
+            latencies.append(time.perf_counter() - sent[len(latencies)])
+    finally:
+        typist.join()
+        os.close(read_fd)
+        os.close(write_fd)
+    return latencies
+
+
+def bench_input_wakeup(samples: int = 20, interval: float = 0.1) -> dict:
+    """
+    Delay between a key arriving on an input fd and an input loop reading it, in
+    milliseconds: sleeping `interval` whenever no input is pending (as the curses backend
+    did with curses.napms(100)), against waiting in select() (as it does now). Keys
+    arrive at random times on a pipe.
+    """
+    return {
+        "polling": percentiles(
+            _wakeup_latencies(lambda fd: time.sleep(interval), samples, interval)
+        ),
+        "select": percentiles(
+            _wakeup_latencies(lambda fd: select.select([fd], [], []), samples, interval)
+        ),
+    }
+
+
+class _Loopback:
+    """Send reports to a simulator through one of the BACKENDS"""
+
+    def __init__(self, port_name: str, baud: int, backend: str):
+        from serial import Serial
+
+        self.backend = backend
+        self.serial = Serial(port_name, baud, timeout=0)
+        self.writer = None
+        self.loop = None
+
+        if backend == "direct":
+            self.comm = DataComm(self.serial)
+        elif backend == "writer":
+            from kvm_serial.utils.writer import SerialWriter
+
+            self.writer = SerialWriter(self.serial, baud=baud).start()
+            self.comm = DataComm(self.writer)
+        elif backend == "async":
+            from kvm_serial.utils.aio import AsyncDataComm, AsyncSerialTransport
+
+            self.loop = asyncio.new_event_loop()
+            self.comm = AsyncDataComm(AsyncSerialTransport(self.serial))
+        else:
+            raise ValueError(f"Unknown backend {backend!r}; choose from {', '.join(BACKENDS)}")
+
+    def send_many(self, reports: list) -> None:
+        if self.loop is not None:
+            self.loop.run_until_complete(self.comm.send_many(reports))
+        else:
+            self.comm.send_many(reports)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.stop()
+        if self.loop is not None:
+            self.loop.close()
+        self.serial.close()
+
+
+def bench_loopback(
+    baud: int = 9600, backend: str = "direct", chars: int = 200, samples: int = 50
+) -> dict:
+    """
+    Measure one backend end-to-end against a CH9329Simulator modelling the given baud rate
+
+    :param baud: Baud rate of the simulated link
+    :param backend: One of BACKENDS
+    :param chars: Length of the text pasted to measure throughput
+    :param samples: Number of single keypresses timed to measure latency
+    :return: dict of measurements
+    """
+    from kvm_serial.utils.simulator import CH9329Simulator
+
+    text = (SAMPLE_TEXT * (chars // len(SAMPLE_TEXT) + 1))[:chars]
+    reports = []
+    for scancode in string_to_scancodes(text):
+        reports += [scancode, DataComm.RELEASE]
+
+    with CH9329Simulator(baud=baud, buffer_frames=len(reports) + 1) as simulator:
+        link = _Loopback(simulator.port, baud, backend)
+        try:
+            # Throughput: paste the whole text at once
+            cpu = time.process_time()
+            start = time.monotonic()
+            link.send_many(reports)
+            complete = simulator.wait_for(len(reports), timeout=60)
+            elapsed = (simulator.reports[-1].time - start) if complete else None
+            cpu = time.process_time() - cpu
+
+            # Latency: single keypresses, spaced out so that none queue behind another
+            key = string_to_scancodes("a")[0]
+            gap = 2 * 14 * 10 / baud + 0.002
+            sent = []
+            for _ in range(samples):
+                sent.append(time.monotonic())
+                link.send_many([key, DataComm.RELEASE])
+                time.sleep(gap)
+            simulator.wait_for(len(reports) + 2 * samples, timeout=30)
+            arrived = simulator.reports[len(reports) :: 2]
+            latencies = [report.time - t for report, t in zip(arrived, sent)]
+        finally:
+            link.close()
+
+        return {
+            "baud": baud,
+            "backend": backend,
+            "frames": len(reports),
+            "complete": complete,  # Rates are None if the paste did not all arrive
+            "frames_per_sec": len(reports) / elapsed if elapsed else None,
+            "chars_per_sec": len(text) / elapsed if elapsed else None,
+            "text_intact": simulator.text().startswith(text),
+            "overruns": simulator.overruns,
+            "cpu_per_frame_us": cpu / len(reports) * 1e6,  # Includes the simulator thread
+            "latency_ms": percentiles(latencies),
+        }
+
+
+def run_suite(
+    bauds: list[int] | None = None,
+    backends: list[str] | None = None,
+    iterations: int = 100_000,
+    chars: int = 200,
+    samples: int = 50,
+    loopback: bool = True,
+) -> dict:
+    """Run every benchmark, returning a JSON-serialisable dict"""
+    try:
+        version = metadata.version("kvm-serial")
+    except metadata.PackageNotFoundError:
+        version = None
+
+    results = {
+        "version": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "micro": {
+            "frame_encoder_frames_per_sec": bench_frame_encoder(iterations),
+            "utils": bench_utils(iterations // 10),
+            "cpu_per_frame": bench_cpu_per_frame(iterations),
+        },
+        "loopback": [],
+    }
+
+    if loopback:
+        results["input_wakeup_ms"] = bench_input_wakeup(min(samples, 20))
+        for baud in bauds or [9600, 115200]:
+            for backend in backends or BACKENDS:
+                results["loopback"].append(bench_loopback(baud, backend, chars, samples))
+
+    return results
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m kvm_serial bench", description="Benchmark serial throughput and latency"
+    )
+    parser.add_argument(
+        "-b", "--baud", help="Baud rate to test (repeatable)", action="append", type=int
+    )
+    parser.add_argument(
+        "--backend", help="Backend to test (repeatable)", action="append", choices=BACKENDS
+    )
+    parser.add_argument(
+        "-n", "--iterations", help="Micro-benchmark iterations", default=100_000, type=int
+    )
+    parser.add_argument("--chars", help="Characters pasted per loopback run", default=200, type=int)
+    parser.add_argument("--samples", help="Keypresses timed for latency", default=50, type=int)
+    parser.add_argument("--micro", help="Skip the loopback benchmarks", action="store_true")
+    parser.add_argument("-o", "--output", help="Write JSON to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = run_suite(
+        bauds=args.baud,
+        backends=args.backend,
+        iterations=args.iterations,
+        chars=args.chars,
+        samples=args.samples,
+        loopback=not args.micro,
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,16 @@ from serial import Serial
 from kvm_serial.backend.mouse import MouseListener
 from kvm_serial.backend.keyboard import KeyboardListener
 from kvm_serial.backend.video import CaptureDevice
+from kvm_serial.utils.baudrate import probe_baud, upgrade_baud
+from kvm_serial.utils.communication import DataComm
+from kvm_serial.utils.flowcontrol import RateController, link_frame_rate
+from kvm_serial.utils.layout import set_default_layout
+from kvm_serial.utils.macro import MacroHotkeys, MacroLibrary
+from kvm_serial.utils.metrics import MetricsServer, TextfileExporter
+from kvm_serial.utils.recorder import Recorder
+from kvm_serial.utils.replies import ReplyReader, ReplyTracker
+from kvm_serial.utils.trace import TRACER
+from kvm_serial.utils.writer import SerialWriter
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +27,11 @@ logger = logging.getLogger(__name__)
 ml: MouseListener | None = None
 cap: CaptureDevice | None = None
 keeb: KeyboardListener | None = None
+writer: SerialWriter | None = None
+replies: ReplyReader | None = None
+hotkeys: MacroHotkeys | None = None
+metrics_server: MetricsServer | None = None
+metrics_file: TextfileExporter | None = None
 
 
 # Provide different options for handling SIGINT so Ctrl+C can be passed to controller
@@ -32,6 +47,9 @@ def signal_handler_ignore(sig, frame):
 
 
 def stop_threads():
+    if hotkeys is not None and hotkeys.thread.is_alive():
+        hotkeys.stop()
+
     if ml is not None and ml.thread.is_alive():
         ml.stop()
 
@@ -41,6 +59,20 @@ def stop_threads():
     if keeb is not None and keeb.thread.is_alive():
         keeb.stop()
 
+    # Stop the writer last, so frames queued by the listeners above are still sent
+    if writer is not None and writer.thread.is_alive():
+        writer.stop()
+
+    if replies is not None and replies.thread.is_alive():
+        replies.stop()
+
+    # Export metrics last, so the final textfile includes everything sent
+    if metrics_server is not None and metrics_server.thread.is_alive():
+        metrics_server.stop()
+
+    if metrics_file is not None and metrics_file.thread.is_alive():
+        metrics_file.stop()
+
 
 def parse_args():
     # Parse arguments using argparse module. Example call:
@@ -60,6 +92,60 @@ def parse_args():
         default=9600,
         type=int,
     )
+    parser.add_argument(
+        "--upgrade-baud",
+        "-u",
+        help="Reconfigure the CH9329 to a faster baud rate (default 115200) before starting",
+        nargs="?",
+        const=115200,
+        type=int,
+    )
+    parser.add_argument(
+        "--probe",
+        "-p",
+        help="Discover the CH9329's current baud rate instead of trusting --baud",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--queue",
+        "-q",
+        help="Maximum number of writes queued for the serial port",
+        default=256,
+        type=int,
+    )
+    parser.add_argument(
+        "--backpressure",
+        help="Behaviour when the serial write queue is full",
+        default="block",
+        type=str,
+        choices=["block", "drop_newest", "drop_oldest"],
+    )
+    parser.add_argument(
+        "--record",
+        "-r",
+        help="Record the HID reports sent to this file (replay with: python -m kvm_serial replay)",
+        type=str,
+    )
+    parser.add_argument(
+        "--macros",
+        help="JSON macro file: its hotkeys run macros while capturing",
+        type=str,
+    )
+    parser.add_argument(
+        "--metrics-port",
+        help="Serve Prometheus metrics over HTTP on this local port",
+        type=int,
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Write Prometheus metrics to this textfile every 15 seconds, and on exit",
+        type=str,
+    )
+    parser.add_argument(
+        "--trace",
+        help="Trace each key from capture to serial write, into this Chrome trace JSON file",
+        type=str,
+    )
     parser.add_argument(
         "--sigint",
         "-s",
@@ -77,6 +163,13 @@ def parse_args():
         type=str,
         choices=["usb", "pynput", "tty", "curses", "none"],
     )
+    parser.add_argument(
+        "--layout",
+        "-l",
+        help="Keyboard layout of the target: uk, us, de, or a JSON layout file",
+        default="uk",
+        type=str,
+    )
     parser.add_argument(
         "--no-keyboard",
         "-n",
@@ -89,6 +182,12 @@ def parse_args():
         help="Capture mouse input",
         action="store_true",
     )
+    parser.add_argument(
+        "--mouse-rate",
+        help="Mouse reports per second (0 for one report per event)",
+        default=125,
+        type=float,
+    )
     vids_group = parser.add_argument_group(
         "Video Options",
         description="Define video options",
@@ -117,6 +216,7 @@ def parse_args():
 
 
 def main():
+    global ml, cap, keeb, writer, replies, hotkeys, metrics_server, metrics_file
     args = parse_args()
 
     # Set log level
@@ -142,13 +242,54 @@ def main():
     if args.camindex and not args.video:
         logging.warning("--camindex (-c) arg will not work without --video (-x)")
 
-    # Make serial connection
+    set_default_layout(args.layout)
+
+    # Export runtime metrics with --metrics-port and --metrics-file
+    if args.metrics_port:
+        metrics_server = MetricsServer(args.metrics_port).start()
+    if args.metrics_file:
+        metrics_file = TextfileExporter(args.metrics_file).start()
+
+    # Trace event-to-wire latency with --trace (open the file in https://ui.perfetto.dev)
+    if args.trace:
+        TRACER.start()
+
+    # Make serial connection. A single writer thread owns the port, shared by keyboard and mouse
     serial_port = Serial(args.port, args.baud)
 
+    if args.upgrade_baud:
+        args.baud = upgrade_baud(
+            serial_port, args.upgrade_baud, current=None if args.probe else args.baud
+        )
+    elif args.probe:
+        args.baud = probe_baud(serial_port) or args.baud
+
+    # Record at the writer's port, so only the writer thread records
+    recorder = Recorder() if args.record else None
+    writer = SerialWriter(
+        recorder.tap(serial_port) if recorder else serial_port,
+        maxsize=args.queue,
+        policy=args.backpressure,
+        baud=args.baud,
+    ).start()
+
+    # Read CH9329 replies, so the receive buffer drains and each frame's status is tracked
+    tracker = ReplyTracker(byte_time=10 / args.baud).attach(writer)
+    replies = ReplyReader(serial_port, tracker).start()
+
+    # Pace pastes and typed bursts by those replies, up to what the link can carry
+    link_rate = link_frame_rate(args.baud)
+    rate = RateController(tracker, initial=link_rate / 2, maximum=link_rate)
+
     try:
+        # Run macros on their hotkeys with --macros
+        if args.macros:
+            hotkeys = MacroHotkeys(MacroLibrary(args.macros), DataComm(writer))
+            hotkeys.start()
+
         # Start mouse listner on --mouse (-e)
         if args.mouse:
-            ml = MouseListener(serial_port)
+            ml = MouseListener(writer, rate=args.mouse_rate)
             ml.start()
             # Wait if no keyboard capture
             if args.mode == "none" or args.no_keyboard:
@@ -156,7 +297,7 @@ def main():
 
         # Do not capture keyboard with --no-keyboard (-n)
         if not args.no_keyboard:
-            keeb = KeyboardListener(serial_port, mode=args.mode)
+            keeb = KeyboardListener(writer, mode=args.mode, rate=rate)
             keeb.start()
 
         # Display video window if --video (-x)
@@ -179,6 +320,11 @@ def main():
         logging.warning("... cleaning up!")
     finally:
         stop_threads()  # Stop threads (if running)
+        if recorder is not None:
+            recorder.save(args.record)
+        if args.trace:
+            TRACER.stop()
+            TRACER.dump(args.trace)
         logging.info("Exiting. Bye!")
 
 
@@ -0,0 +1,195 @@
+"""
+asyncio support: a non-blocking serial transport and a coroutine-based DataComm.
+
+Requires a port with a selectable file descriptor (pyserial on Linux/macOS).
+"""
+
+import asyncio
+import os
+from typing import Iterable
+
+from serial import Serial
+
+from kvm_serial.utils.communication import CMD_KEYBOARD, CMD_MOUSE_ABS, DataComm, FrameEncoder
+from kvm_serial.utils.mousereport import ABS_RANGE, BUTTON_LEFT
+from kvm_serial.utils.utils import string_to_scancodes
+
+
+class AsyncSerialTransport:
+    """
+    Non-blocking writer/reader for a serial port driven by the event loop's
+    add_writer/add_reader hooks. No threads are used.
+
+    write() buffers whole writes in call order, so frames from concurrent coroutines are
+    never torn; drain() waits until the buffer has been handed to the OS.
+    """
+
+    def __init__(self, port: Serial):
+        """
+        :param port: An open port exposing fileno(), e.g. serial.Serial(url, baud, timeout=0)
+        """
+        self.port = port
+        self.fd = port.fileno()
+        os.set_blocking(self.fd, False)
+
+        self._buffer = bytearray()
+        self._waiters: list[asyncio.Future] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.bytes_written = 0
+
+    def write(self, data: bytes) -> None:
+        """Write immediately if possible, buffering anything the OS cannot take yet"""
+        if self._buffer:
+            self._buffer += data
+            return
+
+        try:
+            written = os.write(self.fd, data)
+        except BlockingIOError:
+            written = 0
+        self.bytes_written += written
+
+        if written < len(data):
+            self._buffer += memoryview(data)[written:]
+            self._loop = asyncio.get_running_loop()
+            self._loop.add_writer(self.fd, self._on_writable)
+
+    async def drain(self) -> None:
+        """Wait until everything written so far has been passed to the OS"""
+        if not self._buffer:
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        await waiter
+
+    async def read(self, size: int = 256) -> bytes:
+        """Read up to size bytes, waiting until at least one is available"""
+        while True:
+            try:
+                return os.read(self.fd, size)
+            except BlockingIOError:
+                pass
+
+            loop = asyncio.get_running_loop()
+            readable = loop.create_future()
+            loop.add_reader(self.fd, readable.set_result, None)
+            try:
+                await readable
+            finally:
+                loop.remove_reader(self.fd)
+
+    def close(self) -> None:
+        if self._loop is not None:
+            self._loop.remove_writer(self.fd)
+        self._wake(ConnectionError("Transport closed"))
+        self.port.close()
+
+    def _on_writable(self) -> None:
+        try:
+            written = os.write(self.fd, self._buffer)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._buffer.clear()
+            self._loop.remove_writer(self.fd)
+            self._wake(e)
+            return
+
+        self.bytes_written += written
+        del self._buffer[:written]
+        if not self._buffer:
+            self._loop.remove_writer(self.fd)
+            self._wake()
+
+    def _wake(self, error: Exception | None = None) -> None:
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if waiter.done():
+                continue
+            if error is None:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(error)
+
+
+class AsyncDataComm:
+    """
+    Coroutine equivalent of DataComm. Any number of producers may await it concurrently
+    from one event loop; each call's frames are written contiguously.
+    """
+
+    def __init__(self, transport: AsyncSerialTransport):
+        self.transport = transport
+        self.encoder = FrameEncoder()
+
+    async def send(self, data: bytes, cmd: bytes = CMD_KEYBOARD) -> bool:
+        """Encode and send a single report"""
+        self.transport.write(self.encoder.encode(data, cmd))
+        await self.transport.drain()
+        return True
+
+    async def send_many(self, reports: Iterable[bytes], cmd: bytes = CMD_KEYBOARD) -> int:
+        """Encode a sequence of reports into one buffer and send it in a single write"""
+        encode = self.encoder.encode_cached if cmd == CMD_KEYBOARD else self.encoder.encode
+        frames = [encode(bytes(report), cmd) for report in reports]
+        if frames:
+            self.transport.write(b"".join(frames))
+            await self.transport.drain()
+        return len(frames)
+
+    async def release(self) -> bool:
+        return await self.send(DataComm.RELEASE)
+
+    async def type_text(self, text: str, delay: float = 0.0) -> int:
+        """
+        Type a string, pressing and releasing each key
+
+        :param text: Text to type
+        :param delay: Seconds to wait between keys; 0 sends the whole string in one write
+        :return: Number of reports sent
+        """
+        reports = []
+        for scancode in string_to_scancodes(text):
+            reports.append(scancode)
+            reports.append(DataComm.RELEASE)
+
+        if not delay:
+            return await self.send_many(reports)
+
+        for i in range(0, len(reports), 2):
+            await self.send_many(reports[i : i + 2])
+            await asyncio.sleep(delay)
+        return len(reports)
+
+    async def move_to(self, x: int, y: int, buttons: int = 0) -> bool:
+        """Move the absolute pointer to device coordinates (0..4095)"""
+        x = min(max(int(x), 0), ABS_RANGE - 1)
+        y = min(max(int(y), 0), ABS_RANGE - 1)
+        data = bytes((0x02, buttons, x & 0xFF, x >> 8, y & 0xFF, y >> 8, 0))
+        return await self.send(data, cmd=CMD_MOUSE_ABS)
+
+    async def click(self, x: int, y: int, button: int = BUTTON_LEFT, hold: float = 0.0) -> int:
+        """
+        Click a mouse button at device coordinates (0..4095)
+
+        :param hold: Seconds to hold the button down; 0 sends press and release together
+        :return: Number of reports sent
+        """
+        x = min(max(int(x), 0), ABS_RANGE - 1)
+        y = min(max(int(y), 0), ABS_RANGE - 1)
+        position = bytes((x & 0xFF, x >> 8, y & 0xFF, y >> 8, 0))
+        press = b"\x02" + bytes((button,)) + position
+        release = b"\x02\x00" + position
+
+        if not hold:
+            return await self.send_many((press, release), cmd=CMD_MOUSE_ABS)
+
+        await self.send(press, cmd=CMD_MOUSE_ABS)
+        await asyncio.sleep(hold)
+        await self.send(release, cmd=CMD_MOUSE_ABS)
+        return 2
+
+
+def open_async(port: str, baud: int = 9600) -> AsyncDataComm:
+    """Open a serial port by name for use with asyncio"""
+    return AsyncDataComm(AsyncSerialTransport(Serial(port, baud, timeout=0)))
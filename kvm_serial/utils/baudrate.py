@@ -0,0 +1,169 @@
+"""
+CH9329 configuration commands, used to discover and change the chip's serial baud rate.
+
+Parameter changes made with SET_PARA_CFG take effect after a reset (or power cycle).
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+
+from serial import Serial
+
+from kvm_serial.utils.communication import FrameEncoder
+from kvm_serial.utils.replies import REPLY_ERROR, STATUS_SUCCESS, Frame, FrameParser
+
+logger = logging.getLogger(__name__)
+
+CMD_GET_INFO = 0x01
+CMD_GET_PARA_CFG = 0x08
+CMD_SET_PARA_CFG = 0x09
+CMD_RESET = 0x0F
+
+PARA_CFG_LENGTH = 50
+PARA_BAUD = slice(3, 7)  # Baud rate, 4 bytes big-endian
+
+# Rates the CH9329 supports, most likely first
+BAUD_RATES = [9600, 115200, 57600, 19200, 38400, 4800, 2400, 1200]
+
+
+@contextmanager
+def _read_timeout(port: Serial, timeout: float):
+    previous = port.timeout
+    port.timeout = timeout
+    try:
+        yield
+    finally:
+        port.timeout = previous
+
+
+def command(port: Serial, cmd: int, data: bytes = b"", timeout: float = 0.5) -> Frame | None:
+    """
+    Send a command frame and wait for its reply
+
+    Returns:
+        The reply frame, or None if there was no valid reply within the timeout
+    """
+    port.reset_input_buffer()
+    port.write(FrameEncoder().encode(data, bytes((cmd,))))
+
+    parser = FrameParser()
+    deadline = time.monotonic() + timeout
+    with _read_timeout(port, min(timeout, 0.05)):
+        while time.monotonic() < deadline:
+            for frame in parser.feed(port.read(port.in_waiting or 1)):
+                if (frame.cmd & ~REPLY_ERROR) == cmd:
+                    return frame
+    return None
+
+
+def _succeeded(reply: Frame | None) -> bool:
+    return (
+        reply is not None
+        and (reply.cmd & REPLY_ERROR) != REPLY_ERROR
+        and (not reply.data or reply.data[0] == STATUS_SUCCESS)
+    )
+
+
+def get_info(port: Serial, timeout: float = 0.5) -> dict | None:
+    """Read chip version and USB status (GET_INFO), or None if the chip did not answer"""
+    reply = command(port, CMD_GET_INFO, timeout=timeout)
+    if reply is None or len(reply.data) < 3:
+        return None
+    return {
+        "version": reply.data[0],
+        "usb_connected": bool(reply.data[1]),
+        "leds": reply.data[2],
+    }
+
+
+def get_parameters(port: Serial) -> bytearray | None:
+    """Read the 50-byte parameter block (GET_PARA_CFG)"""
+    reply = command(port, CMD_GET_PARA_CFG)
+    if reply is None or len(reply.data) != PARA_CFG_LENGTH:
+        return None
+    return bytearray(reply.data)
+
+
+def set_parameters(port: Serial, params: bytes) -> bool:
+    """Write the 50-byte parameter block (SET_PARA_CFG)"""
+    if len(params) != PARA_CFG_LENGTH:
+        raise ValueError(f"Parameter block must be {PARA_CFG_LENGTH} bytes")
+    return _succeeded(command(port, CMD_SET_PARA_CFG, bytes(params)))
+
+
+def reset(port: Serial) -> bool:
+    """Software reset, applying any new parameters"""
+    return _succeeded(command(port, CMD_RESET))
+
+
+def probe_baud(port: Serial, rates: list[int] | None = None) -> int | None:
+    """
+    Find the rate the chip is listening at by trying GET_INFO at each rate.
+    The port is left at the discovered rate.
+
+    Returns:
+        The discovered baud rate, or None (port left at its original rate)
+    """
+    original = port.baudrate
+    for rate in [original] + [r for r in (rates or BAUD_RATES) if r != original]:
+        port.baudrate = rate
+        if get_info(port, timeout=0.2) is not None:
+            logger.debug(f"CH9329 answered at {rate} baud")
+            return rate
+    port.baudrate = original
+    return None
+
+
+def upgrade_baud(
+    port: Serial, target: int = 115200, current: int | None = None, settle: float = 0.5
+) -> int:
+    """
+    Reconfigure the chip to a faster baud rate and switch the port to match.
+
+    Reads the parameter block, rewrites its baud rate, resets the chip, then verifies
+    with GET_INFO at the new rate. If anything fails, the port is returned to whichever
+    rate the chip is found to be using.
+
+    :param port: Open serial port connected to the CH9329
+    :param target: Desired baud rate
+    :param current: Rate the chip currently uses, or None to probe for it
+    :param settle: Seconds to wait for the chip to restart after reset
+    :return: The baud rate the chip and port are using afterwards
+    """
+    if current is None:
+        current = probe_baud(port)
+        if current is None:
+            logger.warning("CH9329 did not answer at any baud rate; leaving port unchanged")
+            return port.baudrate
+    port.baudrate = current
+
+    if current == target:
+        return current
+
+    params = get_parameters(port)
+    if params is None:
+        logger.warning(f"Could not read CH9329 parameters; staying at {current} baud")
+        return current
+
+    params[PARA_BAUD] = target.to_bytes(4, "big")
+    if not set_parameters(port, params):
+        logger.warning(f"CH9329 rejected new parameters; staying at {current} baud")
+        return current
+
+    reset(port)
+    time.sleep(settle)
+
+    port.baudrate = target
+    if get_info(port) is not None:
+        logger.info(f"CH9329 baud rate upgraded from {current} to {target}")
+        return target
+
+    # Fall back to whatever the chip is actually using (it may need a power cycle)
+    port.baudrate = current
+    if get_info(port) is not None:
+        logger.warning(f"CH9329 still at {current} baud: a power cycle may be needed")
+        return current
+
+    found = probe_baud(port)
+    return found if found is not None else port.baudrate
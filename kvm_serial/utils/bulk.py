@@ -0,0 +1,122 @@
+"""
+Vectorised encoding of text into ready-to-write CH9329 keyboard frames, for large pastes.
+"""
+
+import logging
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from kvm_serial.utils import layout as _layout
+from kvm_serial.utils.communication import CMD_KEYBOARD, HEADER
+from kvm_serial.utils.layout import KeyboardLayout
+
+logger = logging.getLogger(__name__)
+
+FRAME_LENGTH = 14  # header (2) + addr + cmd + length + 8-byte report + checksum
+_MODIFIER = 5  # Offsets of the variable bytes within a keyboard frame
+_KEY = 7
+
+# Per-layout (modifier, key) tables indexed by code point, for code points below 256
+_tables: "WeakKeyDictionary[KeyboardLayout, tuple[np.ndarray, np.ndarray]]" = WeakKeyDictionary()
+
+
+def _layout_tables(layout: KeyboardLayout) -> tuple[np.ndarray, np.ndarray]:
+    try:
+        return _tables[layout]
+    except KeyError:
+        pass
+
+    modifiers = np.zeros(256, dtype=np.uint8)
+    keys = np.zeros(256, dtype=np.uint8)
+    for point, report in enumerate(layout.reports):
+        if report is not None:
+            modifiers[point] = report[0]
+            keys[point] = report[2]
+    _tables[layout] = (modifiers, keys)
+    return modifiers, keys
+
+
+def _frame_template(addr: bytes) -> np.ndarray:
+    return np.frombuffer(HEADER + addr + CMD_KEYBOARD + b"\x08" + bytes(9), dtype=np.uint8)
+
+
+def encode_text(
+    text: str,
+    layout: KeyboardLayout | str | None = None,
+    release: bool = True,
+    addr: bytes = b"\x00",
+    minimal: bool = False,
+) -> memoryview:
+    """
+    Encode text as keyboard frames in one pass: each character is looked up in the
+    layout's tables, and every checksum computed, as array operations.
+
+    Characters the layout cannot type are skipped.
+
+    :param text: Text to type
+    :param layout: Keyboard layout, or its name (default: the default layout)
+    :param release: Follow every key press with a release frame, so repeated characters
+        register as separate keypresses
+    :param addr: CH9329 address byte
+    :param minimal: Emit the shortest sequence instead, as optimise_scancodes does with
+        rollover 1: releases only between repeated keys, plus one at the end
+    :return: Contiguous frames, FRAME_LENGTH bytes each
+    """
+    layout = _layout.get_layout(layout)
+    modifier_table, key_table = _layout_tables(layout)
+
+    points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    low = np.minimum(points, 255)
+    modifiers = modifier_table[low]
+    keys = key_table[low]
+
+    # Code points above U+00FF are rare (e.g. '€'): look up each distinct one
+    high = points > 255
+    if high.any():
+        for point in np.unique(points[high]):
+            report = layout.extra.get(chr(point), _layout.NO_KEY)
+            where = points == point
+            modifiers[where] = report[0]
+            keys[where] = report[2]
+
+    typed = keys != 0
+    if not typed.all():
+        logger.debug(f"Skipping {int((~typed).sum())} characters not in layout {layout.name}")
+        modifiers = modifiers[typed]
+        keys = keys[typed]
+
+    template = _frame_template(addr)
+    base = int(template[:-1].sum()) & 0xFF
+    count = len(keys)
+
+    presses = np.empty((count, FRAME_LENGTH), dtype=np.uint8)
+    presses[:] = template
+    presses[:, _MODIFIER] = modifiers
+    presses[:, _KEY] = keys
+    presses[:, -1] = (base + modifiers.astype(np.uint16) + keys) & 0xFF
+
+    if minimal and count:
+        # A release is needed only where a key repeats; it carries the next modifier
+        repeat = keys[:-1] == keys[1:]
+        position = np.arange(count)
+        position[1:] += np.cumsum(repeat)
+        frames = np.empty((count + int(repeat.sum()) + 1, FRAME_LENGTH), dtype=np.uint8)
+        frames[:] = template
+        frames[:, -1] = base
+        frames[position] = presses
+
+        releases = position[:-1][repeat] + 1
+        next_modifiers = modifiers[1:][repeat]
+        frames[releases, _MODIFIER] = next_modifiers
+        frames[releases, -1] = (base + next_modifiers.astype(np.uint16)) & 0xFF
+        return memoryview(frames.reshape(-1))
+
+    if not release or minimal:
+        return memoryview(presses.reshape(-1))
+
+    frames = np.empty((count * 2, FRAME_LENGTH), dtype=np.uint8)
+    frames[0::2] = presses
+    frames[1::2] = template
+    frames[1::2, -1] = base
+    return memoryview(frames.reshape(-1))
@@ -1,10 +1,132 @@
 import sys
 import glob
+import time
 import serial
 import termios
 import logging
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable
 from serial import Serial, SerialException
 
+from kvm_serial.utils.metrics import REGISTRY
+from kvm_serial.utils.trace import TRACER
+
+if TYPE_CHECKING:
+    from kvm_serial.utils.flowcontrol import RateController
+
+# CH9329 frame header and the data commands used by this package
+HEADER = b"\x57\xab"
+CMD_KEYBOARD = b"\x02"
+CMD_MOUSE_ABS = b"\x04"
+CMD_MOUSE_REL = b"\x05"
+
+_writes = REGISTRY.counter("kvm_datacomm_writes_total", "Writes made by DataComm")
+_bytes = REGISTRY.counter("kvm_datacomm_bytes_total", "Frame bytes written by DataComm")
+
+
+class FrameEncoder:
+    """
+    Build CH9329 frames without re-validating or re-summing the constant part of each packet.
+
+    A frame is laid out as: header (2b), address (1b), command (1b), length (1b), data, checksum.
+    The first four bytes and their contribution to the checksum are computed once per
+    (head, addr, cmd) combination; only the length and data are summed per frame.
+    """
+
+    MAX_DATA_LENGTH = 255
+    OVERHEAD = 6  # header + addr + cmd + length + checksum
+
+    def __init__(self, cache_size: int = 256):
+        """
+        :param cache_size: Number of fully-built frames to keep in the LRU cache
+        """
+        self._prefixes: dict[tuple[bytes, bytes, bytes], tuple[bytes, int]] = {}
+        self.encode_cached = lru_cache(maxsize=cache_size)(self.encode)
+
+    def prefix(
+        self, cmd: bytes = CMD_KEYBOARD, head: bytes = HEADER, addr: bytes = b"\x00"
+    ) -> tuple[bytes, int]:
+        """
+        Return the 4-byte frame prefix and its partial checksum, validating it on first use.
+
+        Raises:
+            ValueError: if the header, address or command have the wrong length
+        """
+        key = (head, addr, cmd)
+        try:
+            return self._prefixes[key]
+        except KeyError:
+            pass
+
+        if len(head) != 2 or len(addr) != 1 or len(cmd) != 1:
+            raise ValueError("DataComm packet header MUST have: header 2b; addr 1b; cmd 1b")
+
+        prefix = bytes(head) + bytes(addr) + bytes(cmd)
+        self._prefixes[key] = entry = (prefix, sum(prefix))
+        return entry
+
+    def encode_into(
+        self,
+        buffer: bytearray | memoryview,
+        offset: int,
+        data: bytes,
+        cmd: bytes = CMD_KEYBOARD,
+        head: bytes = HEADER,
+        addr: bytes = b"\x00",
+    ) -> int:
+        """
+        Write a frame for `data` into a caller-owned buffer starting at `offset`,
+        so that many frames can be packed into one preallocated bytearray/memoryview.
+
+        Returns:
+            The offset one past the end of the written frame
+        Raises:
+            OverflowError: if data is longer than 255 bytes
+        """
+        prefix, partial = self.prefix(cmd, head, addr)
+
+        length = len(data)
+        if length > self.MAX_DATA_LENGTH:
+            raise OverflowError(f"Data length {length} does not fit in a CH9329 frame")
+
+        end = offset + 5 + length
+        buffer[offset : offset + 4] = prefix
+        buffer[offset + 4] = length
+        buffer[offset + 5 : end] = data
+        buffer[end] = (partial + length + sum(data)) & 0xFF
+        return end + 1
+
+    def encode(
+        self,
+        data: bytes,
+        cmd: bytes = CMD_KEYBOARD,
+        head: bytes = HEADER,
+        addr: bytes = b"\x00",
+    ) -> bytes:
+        """
+        Build a single frame for `data`.
+
+        Returns:
+            The complete frame as bytes
+        Raises:
+            OverflowError: if data is longer than 255 bytes
+        """
+        try:
+            prefix, partial = self._prefixes[(head, addr, cmd)]
+        except KeyError:
+            prefix, partial = self.prefix(cmd, head, addr)
+
+        length = len(data)
+        if length > self.MAX_DATA_LENGTH:
+            raise OverflowError(f"Data length {length} does not fit in a CH9329 frame")
+
+        # Appending to a bytearray is cheaper than slice-assigning small frames into a buffer
+        frame = bytearray(prefix)
+        frame.append(length)
+        frame += data
+        frame.append((partial + length + sum(data)) & 0xFF)
+        return bytes(frame)
+
 
 class DataComm:
     """
@@ -13,9 +135,43 @@ class DataComm:
     """
 
     SCANCODE_LENGTH = 8
+    RELEASE = b"\x00" * SCANCODE_LENGTH
 
-    def __init__(self, port: Serial):
+    def __init__(self, port: Serial, rate: "RateController | None" = None):
+        """
+        :param port: Serial port (or SerialWriter) to write frames to
+        :param rate: Paces send_text by the device's replies (see utils.flowcontrol)
+        """
         self.port = port
+        self.rate = rate
+        self.encoder = FrameEncoder()
+
+    def _write(self, data):
+        span = TRACER.current()
+        if span is None:
+            self.port.write(data)
+        else:
+            span.stamp("serialised")
+            started = time.perf_counter_ns()
+            self.port.write(data)
+            # A SerialWriter stamps and finishes queued spans when it writes them
+            if "queued" not in span.stamps:
+                span.stamp("write", started)
+                span.stamp("written")
+                TRACER.finish(span)
+        _writes.inc()
+        _bytes.inc(len(data))
+
+    def write_frames(self, frames: bytes) -> int:
+        """
+        Write frames which are already encoded (e.g. a compiled macro), counted and traced
+        like any other send.
+
+        Returns:
+            Number of bytes written
+        """
+        self._write(frames)
+        return len(frames)
 
     def send(
         self,
@@ -35,27 +191,116 @@ class DataComm:
         Returns:
             True if successful, otherwise throws an exception
         """
-        # Check inputs
-        if len(head) != 2 or len(addr) != 1 or len(cmd) != 1:
-            raise ValueError("DataComm packet header MUST have: header 2b; addr 1b; cmd 1b")
+        # Keyboard reports repeat constantly (press/release), so serve them from the LRU cache
+        if type(data) is bytes and cmd == CMD_KEYBOARD:
+            packet = self.encoder.encode_cached(data, cmd, head, addr)
+        else:
+            packet = self.encoder.encode(data, cmd, head, addr)
 
-        length = len(data).to_bytes(1, "little")
+        # Write command to serial port
+        self._write(packet)
 
-        # Calculate checksum
-        checksum = (
-            sum(head)
-            + int.from_bytes(addr, "big")
-            + int.from_bytes(cmd, "big")
-            + int.from_bytes(length, "big")
-            + sum(data)
-        ) % 256
+        return True
 
-        # Build data packet
-        packet = head + addr + cmd + length + data + bytes([checksum])
+    def send_many(
+        self,
+        reports: Iterable[bytes],
+        cmd: bytes = CMD_KEYBOARD,
+        max_burst: int | None = None,
+    ) -> int:
+        """
+        Pack a sequence of reports into one contiguous buffer and write it in as few calls
+        as possible. Frames are never split across writes.
 
-        # Write command to serial port
-        self.port.write(packet)
+        Args:
+            reports: data packets to encapsulate, e.g. the output of string_to_scancodes
+            cmd: Data command used for every report
+            max_burst: Maximum bytes per write. When set, the port is flushed between bursts
+                so that the CH9329 input buffer is not overrun.
+        Returns:
+            The number of frames sent
+        """
+        if not isinstance(reports, (list, tuple)):
+            reports = list(reports)
+        if not reports:
+            return 0
+
+        overhead = FrameEncoder.OVERHEAD
+        buffer = bytearray(sum(len(report) for report in reports) + overhead * len(reports))
+        encode_into = self.encoder.encode_into
+
+        if max_burst is None:
+            end = 0
+            for report in reports:
+                end = encode_into(buffer, end, report, cmd)
+            self._write(buffer)
+            return len(reports)
+
+        view = memoryview(buffer)
+        start = end = 0
+        for report in reports:
+            # Flush the burst collected so far if the next frame would not fit
+            if end > start and end + len(report) + overhead - start > max_burst:
+                self._write(view[start:end])
+                self.port.flush()
+                start = end
+            end = encode_into(buffer, end, report, cmd)
+        self._write(view[start:end])
+
+        return len(reports)
+
+    def send_text(
+        self, text: str, layout=None, max_burst: int | None = None, minimal: bool = False
+    ) -> int:
+        """
+        Type a string, pressing and releasing each key. The frames for the whole string are
+        built at once by kvm_serial.utils.bulk.encode_text, for large pastes. With a rate
+        controller they are sent at its rate instead, and max_burst is ignored.
+
+        Args:
+            text: Text to type. Characters the layout cannot type are skipped
+            layout: KeyboardLayout or layout name (default: the default layout)
+            max_burst: Maximum bytes per write, as for send_many
+            minimal: Send the shortest report sequence (see utils.optimise_scancodes)
+        Returns:
+            The number of frames sent
+        """
+        from kvm_serial.utils.bulk import FRAME_LENGTH, encode_text
+
+        frames = encode_text(text, layout, minimal=minimal)
+        if not frames:
+            return 0
+
+        if self.rate is not None:
+            return self.rate.send_many(self, frames)
+        if max_burst is None:
+            self._write(frames)
+        else:
+            burst = max(1, max_burst // FRAME_LENGTH) * FRAME_LENGTH
+            for start in range(0, len(frames), burst):
+                if start:
+                    self.port.flush()
+                self._write(frames[start : start + burst])
+
+        return len(frames) // FRAME_LENGTH
+
+    def send_keypress(self, scancode: bytes) -> bool:
+        """
+        Send a key report immediately followed by a release, in a single write
+
+        Args:
+            scancode: An 8-byte scancode representing keyboard state
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if len(scancode) < self.SCANCODE_LENGTH:
+            return False
 
+        encoder = self.encoder
+        press = (
+            encoder.encode_cached(scancode) if type(scancode) is bytes else encoder.encode(scancode)
+        )
+        self._write(press + encoder.encode_cached(self.RELEASE))
         return True
 
     def send_scancode(self, scancode: bytes) -> bool:
@@ -80,7 +325,7 @@ class DataComm:
         Return:
             bool: True if successful
         """
-        return self.send(b"\x00" * self.SCANCODE_LENGTH)
+        return self.send(self.RELEASE)
 
 
 def list_serial_ports():
@@ -0,0 +1,181 @@
+"""
+Closed-loop send rate control, driven by CH9329 replies
+"""
+
+import logging
+import time
+from typing import Iterable
+
+from kvm_serial.utils.communication import DataComm
+from kvm_serial.utils.replies import STATUS_SUCCESS, ReplyTracker
+
+logger = logging.getLogger(__name__)
+
+
+def link_frame_rate(baud: int, frame_length: int = 14, bits_per_byte: int = 10) -> float:
+    """Keyboard frames per second a serial link can carry (14-byte frames, 8N1)"""
+    return baud / bits_per_byte / frame_length
+
+
+def _frame_ends(frames: memoryview) -> list[int]:
+    """End offset of each frame in a buffer of frames encoded back to back"""
+    ends, pos, size = [], 0, len(frames)
+    while pos + 5 <= size:
+        pos = min(size, pos + 6 + frames[pos + 4])
+        ends.append(pos)
+    if pos < size:
+        ends.append(size)  # Trailing bytes which are not a whole frame
+    return ends
+
+
+class RateController:
+    """
+    AIMD (additive increase, multiplicative decrease) control of the frame send rate.
+
+    Each successful reply raises the rate so that it grows by `increase` frames/s per
+    second. An error reply, a lost frame, or a round-trip time grown well beyond the
+    fastest seen (frames queueing up somewhere) cuts the rate by `decrease`. After a cut,
+    further cuts wait at least one round trip and one batch period, until replies to
+    frames sent at the new rate arrive, so one burst of trouble is not punished repeatedly.
+    """
+
+    def __init__(
+        self,
+        tracker: ReplyTracker | None = None,
+        initial: float = 50.0,
+        minimum: float = 5.0,
+        maximum: float = 1000.0,
+        increase: float = 20.0,
+        decrease: float = 0.5,
+        latency_factor: float = 3.0,
+        latency_floor: float = 0.02,
+        window: int = 64,
+    ):
+        """
+        :param tracker: ReplyTracker fed by a ReplyReader. Without one the rate stays fixed
+        :param initial: Starting rate in frames/s
+        :param minimum: Lowest rate in frames/s
+        :param maximum: Highest rate in frames/s (e.g. the link's frame rate)
+        :param increase: Additive increase in frames/s per second of successful replies
+        :param decrease: Multiplier applied to the rate on congestion
+        :param latency_factor: Round-trip time, relative to the baseline, treated as congestion
+        :param latency_floor: Seconds of round-trip growth never treated as congestion, as
+            scheduling and USB-serial latency jitter by this much with no queue at all
+        :param window: Maximum frames awaiting a reply before sending pauses
+        """
+        self.tracker = tracker
+        self.rate = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self.window = window
+
+        self.baseline_rtt: float | None = None
+        self.last_rtt = 0.0
+        self.cuts = 0
+        self._last_cut = float("-inf")
+        self._lost = 0
+        self._deadline = float("-inf")  # When the next batch may be sent
+        self._period = 0.0  # Batch period of the last send_many
+
+        if tracker is not None:
+            self._lost = tracker.lost
+            tracker.listeners.append(self.on_reply)
+
+    def on_reply(self, cmd: int, status: int, rtt: float, now: float | None = None):
+        """ReplyTracker listener: adjust the rate from one reply"""
+        now = time.monotonic() if now is None else now
+        self.last_rtt = rtt
+
+        if status != STATUS_SUCCESS:
+            self._cut(now, f"status 0x{status:02x}")
+            return
+
+        if rtt > 0 and (self.baseline_rtt is None or rtt < self.baseline_rtt):
+            self.baseline_rtt = rtt
+        elif self.baseline_rtt is not None and rtt > max(
+            self.baseline_rtt * self.latency_factor, self.baseline_rtt + self.latency_floor
+        ):
+            self._cut(now, f"rtt {rtt * 1000:.1f}ms")
+            return
+
+        self.rate = min(self.maximum, self.rate + self.increase / self.rate)
+
+    def check_loss(self, now: float | None = None):
+        """Cut the rate if the tracker has counted lost frames since the last check"""
+        if self.tracker is None:
+            return
+        self.tracker.expire(now)
+        if self.tracker.lost > self._lost:
+            self._lost = self.tracker.lost
+            self._cut(time.monotonic() if now is None else now, "lost frames")
+
+    def _cut(self, now: float, reason: str):
+        # Frames already in flight were sent at the old rate: wait for replies to newer ones
+        cooldown = max(
+            (self.baseline_rtt or 0.0) * self.latency_factor, self.last_rtt, self._period
+        )
+        if now - self._last_cut < cooldown:
+            return
+        self.rate = max(self.minimum, self.rate * self.decrease)
+        self._last_cut = now
+        self.cuts += 1
+        logger.debug(f"Send rate cut to {self.rate:.1f} frames/s ({reason})")
+
+    def send_many(
+        self, comm: DataComm, reports: Iterable[bytes] | bytes, period: float = 0.05
+    ) -> int:
+        """
+        Send reports at the controlled rate, in batches of roughly `period` seconds' worth.
+        The pace carries over between calls, so a series of short sends is paced as one
+
+        Args:
+            comm: DataComm to send with
+            reports: Keyboard reports, or a bytes-like buffer of frames already encoded
+                back to back (e.g. by kvm_serial.utils.bulk.encode_text), sent as they are
+            period: Seconds' worth of frames sent per batch
+        Returns:
+            The number of frames sent
+        """
+        if isinstance(reports, (bytes, bytearray, memoryview)):
+            frames = memoryview(reports)
+            ends = _frame_ends(frames)
+            total = len(ends)
+
+            def send(start: int, stop: int):
+                comm._write(frames[ends[start - 1] if start else 0 : ends[stop - 1]])
+
+        else:
+            reports = reports if isinstance(reports, (list, tuple)) else list(reports)
+            total = len(reports)
+
+            def send(start: int, stop: int):
+                comm.send_many(reports[start:stop])
+
+        self._period = period
+        sent = 0
+        deadline = max(self._deadline, time.monotonic())
+        while sent < total:
+            self.check_loss()
+
+            # Do not run further ahead of the device than the window allows
+            if self.tracker is not None and self.tracker.pending > self.window:
+                time.sleep(min(period, (self.baseline_rtt or period)))
+                continue
+
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.monotonic()
+
+            stop = min(total, sent + max(1, int(self.rate * period)))
+            send(sent, stop)
+            deadline += (stop - sent) / self.rate
+            sent = stop
+
+        self._deadline = deadline
+        return sent
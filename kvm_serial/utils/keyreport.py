@@ -0,0 +1,74 @@
+"""
+Incremental keyboard report state for the CH9329 (boot protocol, 6-key rollover)
+"""
+
+MAX_KEYS = 6
+
+
+class KeyReportState:
+    """
+    The keys currently held, as a modifier bitmask and six key slots.
+
+    press() and release() update the state in constant time and return the report to
+    send, or None when the report would not change: an OS auto-repeat of a held key,
+    a seventh key beyond the rollover limit, or releasing a key which is not held.
+    Releasing one key of a chord leaves the others held in the report.
+    """
+
+    __slots__ = ("modifiers", "keys", "_slots")
+
+    def __init__(self):
+        self.modifiers = 0
+        self.keys = bytearray(MAX_KEYS)
+        self._slots: dict[int, int] = {}  # Key code -> slot index
+
+    def report(self) -> bytes:
+        """The 8-byte report for the current state"""
+        return bytes((self.modifiers, 0)) + self.keys
+
+    def press(self, code: int = 0, modifiers: int = 0) -> bytes | None:
+        """
+        Hold a key and/or modifiers
+        :param code: HID usage code of the key, or 0 for modifiers only
+        :param modifiers: Modifier bits to hold
+        :return: The new report, or None if nothing changed
+        """
+        changed = False
+        if modifiers & ~self.modifiers:
+            self.modifiers |= modifiers
+            changed = True
+
+        if code and code not in self._slots:
+            slot = self.keys.find(0)
+            if slot >= 0:
+                self.keys[slot] = code
+                self._slots[code] = slot
+                changed = True
+
+        return self.report() if changed else None
+
+    def release(self, code: int = 0, modifiers: int = 0) -> bytes | None:
+        """
+        Release a key and/or modifiers. Other held keys keep their slots
+        :return: The new report, or None if nothing changed
+        """
+        changed = False
+        if modifiers & self.modifiers:
+            self.modifiers &= ~modifiers
+            changed = True
+
+        slot = self._slots.pop(code, None) if code else None
+        if slot is not None:
+            self.keys[slot] = 0
+            changed = True
+
+        return self.report() if changed else None
+
+    def clear(self) -> bytes | None:
+        """Release everything, returning the empty report unless nothing was held"""
+        if not self.modifiers and not self._slots:
+            return None
+        self.modifiers = 0
+        self.keys[:] = bytes(MAX_KEYS)
+        self._slots.clear()
+        return self.report()
@@ -0,0 +1,299 @@
+"""
+Keyboard layouts: mappings between characters and HID usage codes, compiled once into
+flat lookup tables so that converting a character is a single index operation.
+
+UK (ISO), US (ANSI) and DE (ISO, QWERTZ) layouts are built in. Custom layouts are read
+from JSON files (see load_layout) and their compiled tables cached on disk.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+COMPILER_VERSION = 1  # Bump when KeyboardLayout or compile_layout change, to invalidate caches
+
+MOD_SHIFT = 0x02  # Left Shift
+MOD_SHIFT_ANY = 0x22  # Left or Right Shift
+MOD_ALTGR = 0x40  # Right Alt
+
+NO_KEY = bytes(8)
+
+# Keys which decode to a name rather than a character. These are never typed from text.
+# fmt: off
+NAMED_KEYS = {
+    0x39: 'CAPSLOCK', 0x29: 'ESC', 0x4f: '→', 0x50: '←', 0x51: '↓', 0x52: '↑',
+    0x49: 'Ins', 0x4a: 'Home', 0x4b: 'PgUp', 0x4c: 'Del', 0x4d: 'End', 0x4e: 'PgDn',
+}
+
+# Layout-independent keys by name, for key chords (e.g. "ctrl+alt+delete")
+KEY_NAMES = {
+    'enter': 0x28, 'esc': 0x29, 'escape': 0x29, 'backspace': 0x2a, 'tab': 0x2b,
+    'space': 0x2c, 'capslock': 0x39, 'printscreen': 0x46, 'scrolllock': 0x47,
+    'pause': 0x48, 'insert': 0x49, 'home': 0x4a, 'pageup': 0x4b, 'delete': 0x4c,
+    'end': 0x4d, 'pagedown': 0x4e, 'right': 0x4f, 'left': 0x50, 'down': 0x51, 'up': 0x52,
+    'menu': 0x65,
+    **{f'f{n}': 0x3a + n - 1 for n in range(1, 13)},
+}
+
+MODIFIER_NAMES = {
+    'ctrl': 0x01, 'shift': 0x02, 'alt': 0x04, 'gui': 0x08, 'win': 0x08, 'cmd': 0x08,
+    'rctrl': 0x10, 'rshift': 0x20, 'ralt': 0x40, 'altgr': 0x40, 'rgui': 0x80,
+}
+
+# Keys common to every layout
+_COMMON = {0x28: '\n', 0x2C: ' ', 0x2B: '\t', 0x2a: '\b'}
+
+_QWERTY = {code: chr(ord('a') + code - 0x04) for code in range(0x04, 0x1E)}
+_DIGITS = {0x1E: '1', 0x1F: '2', 0x20: '3', 0x21: '4', 0x22: '5',
+           0x23: '6', 0x24: '7', 0x25: '8', 0x26: '9', 0x27: '0'}
+
+UK = {
+    "plain": {
+        **_QWERTY, **_DIGITS, **_COMMON,
+        0x2D: '-', 0x2E: '=', 0x2F: '[', 0x30: ']', 0x31: '#', 0x32: '#', 0x33: ';',
+        0x34: "'", 0x35: '`', 0x36: ',', 0x37: '.', 0x38: '/', 0x64: '\\',
+    },
+    "shift": {
+        0x1E: '!', 0x1F: '"', 0x20: '£', 0x21: '$', 0x22: '%', 0x23: '^', 0x24: '&',
+        0x25: '*', 0x26: '(', 0x27: ')', 0x2D: '_', 0x2E: '+', 0x2F: '{', 0x30: '}',
+        0x31: '~', 0x32: '~', 0x33: ':', 0x34: '@', 0x35: '¬', 0x36: '<', 0x37: '>',
+        0x38: '?', 0x64: '|',
+    },
+    "altgr": {0x21: '€', 0x35: '¦'},
+}
+
+US = {
+    "plain": {
+        **_QWERTY, **_DIGITS, **_COMMON,
+        0x2D: '-', 0x2E: '=', 0x2F: '[', 0x30: ']', 0x31: '\\', 0x33: ';', 0x34: "'",
+        0x35: '`', 0x36: ',', 0x37: '.', 0x38: '/',
+    },
+    "shift": {
+        0x1E: '!', 0x1F: '@', 0x20: '#', 0x21: '$', 0x22: '%', 0x23: '^', 0x24: '&',
+        0x25: '*', 0x26: '(', 0x27: ')', 0x2D: '_', 0x2E: '+', 0x2F: '{', 0x30: '}',
+        0x31: '|', 0x33: ':', 0x34: '"', 0x35: '~', 0x36: '<', 0x37: '>', 0x38: '?',
+    },
+    "altgr": {},
+}
+
+# Dead keys (^ ´ `) are left out: they do not produce a character on their own
+DE = {
+    "plain": {
+        **_QWERTY, **_DIGITS, **_COMMON, 0x1C: 'z', 0x1D: 'y',
+        0x2D: 'ß', 0x2F: 'ü', 0x30: '+', 0x32: '#', 0x33: 'ö', 0x34: 'ä', 0x36: ',',
+        0x37: '.', 0x38: '-', 0x64: '<',
+    },
+    "shift": {
+        0x1E: '!', 0x1F: '"', 0x20: '§', 0x21: '$', 0x22: '%', 0x23: '&', 0x24: '/',
+        0x25: '(', 0x26: ')', 0x27: '=', 0x2D: '?', 0x2F: 'Ü', 0x30: '*', 0x32: "'",
+        0x33: 'Ö', 0x34: 'Ä', 0x36: ';', 0x37: ':', 0x38: '_', 0x64: '>',
+    },
+    "altgr": {
+        0x14: '@', 0x08: '€', 0x10: 'µ', 0x1F: '²', 0x20: '³', 0x24: '{', 0x25: '[',
+        0x26: ']', 0x27: '}', 0x2D: '\\', 0x30: '~', 0x64: '|',
+    },
+}
+# fmt: on
+
+BUILTIN = {"uk": UK, "us": US, "de": DE}
+
+
+class KeyboardLayout:
+    """
+    A keyboard layout compiled into flat lookup tables.
+
+    Decoding indexes a 256-entry table (plain, shifted or AltGr) by usage code. Encoding
+    indexes a 256-entry table of ready-made 8-byte reports by code point, falling back to
+    a dict for characters above U+00FF (e.g. '€').
+    """
+
+    def __init__(self, name: str, plain: dict, shift: dict, altgr: dict | None = None):
+        """
+        :param name: Layout name
+        :param plain: Usage code to character, with no modifier held
+        :param shift: Usage code to character with Shift held. Keys not listed are unaffected
+        :param altgr: Usage code to character with AltGr held
+        """
+        self.name = name
+        altgr = altgr or {}
+
+        # Letters missing from the shifted table are upper-cased
+        shift = {
+            **{code: char.upper() for code, char in plain.items() if char.isalpha()},
+            **shift,
+        }
+
+        self.plain: list[str | None] = [None] * 256
+        self.shift: list[str | None] = [None] * 256
+        self.altgr: list[str | None] = [None] * 256
+        for code, char in {**NAMED_KEYS, **plain}.items():
+            self.plain[code] = char
+            self.shift[code] = char
+        for code, char in shift.items():
+            self.shift[code] = char
+        for code, char in altgr.items():
+            self.altgr[code] = char
+
+        # Reverse mapping: the first key found producing a character wins, plain first.
+        # ISO keyboards duplicate 0x32 (non-US #) on 0x31 (ANSI \), so 0x31 is tried last.
+        self.reports: list[bytes | None] = [None] * 256
+        self.extra: dict[str, bytes] = {}
+        for modifier, table in ((0, plain), (MOD_SHIFT, shift), (MOD_ALTGR, altgr)):
+            for code in sorted(table, key=lambda code: (code == 0x31, code)):
+                char = table[code]
+                if len(char) != 1:
+                    continue
+                report = bytes((modifier, 0, code, 0, 0, 0, 0, 0))
+                if ord(char) < 256:
+                    if self.reports[ord(char)] is None:
+                        self.reports[ord(char)] = report
+                else:
+                    self.extra.setdefault(char, report)
+
+    def to_tables(self) -> dict:
+        """Compiled tables as plain JSON types, for caching (see from_tables)"""
+        return {
+            "name": self.name,
+            "plain": self.plain,
+            "shift": self.shift,
+            "altgr": self.altgr,
+            "reports": [report.hex() if report else None for report in self.reports],
+            "extra": {char: report.hex() for char, report in self.extra.items()},
+        }
+
+    @classmethod
+    def from_tables(cls, tables: dict) -> "KeyboardLayout":
+        """
+        Rebuild a layout from to_tables() output without recompiling.
+
+        :raises ValueError: If the tables are malformed
+        """
+        layout = cls.__new__(cls)
+        try:
+            layout.name = str(tables["name"])
+            for key in ("plain", "shift", "altgr"):
+                table = tables[key]
+                if len(table) != 256 or not all(c is None or isinstance(c, str) for c in table):
+                    raise ValueError(f"Bad {key} table")
+                setattr(layout, key, list(table))
+            layout.reports = [
+                bytes.fromhex(r) if r is not None else None for r in tables["reports"]
+            ]
+            layout.extra = {str(c): bytes.fromhex(r) for c, r in tables["extra"].items()}
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Bad layout tables: {e!r}") from e
+        if len(layout.reports) != 256 or any(
+            len(r) != 8 for r in (*layout.extra.values(), *filter(None, layout.reports))
+        ):
+            raise ValueError("Bad layout reports")
+        return layout
+
+    def __repr__(self) -> str:
+        return f"KeyboardLayout({self.name!r})"
+
+    def encode(self, char: str) -> bytes | None:
+        """The 8-byte keyboard report which types char, or None if the layout lacks it"""
+        point = ord(char)
+        if point < 256:
+            return self.reports[point]
+        return self.extra.get(char)
+
+    def decode(self, modifier: int, code: int) -> str | None:
+        """The character (or key name) produced by a usage code with the given modifiers"""
+        if modifier & MOD_ALTGR:
+            return self.altgr[code]
+        if modifier & MOD_SHIFT_ANY:
+            return self.shift[code]
+        return self.plain[code]
+
+
+def _parse_table(table: dict) -> dict[int, str]:
+    return {int(code, 16) if isinstance(code, str) else code: char for code, char in table.items()}
+
+
+def compile_layout(spec: dict, name: str = "custom") -> KeyboardLayout:
+    """
+    Compile a layout specification. Tables map usage codes (ints, or hex strings as in
+    JSON) to characters, and may extend a built-in layout named by "base":
+        {"name": "uk-extended", "base": "uk", "altgr": {"0x04": "á"}}
+    """
+    base = BUILTIN[spec["base"].lower()] if spec.get("base") else {}
+    tables = {
+        key: {**base.get(key, {}), **_parse_table(spec.get(key, {}))}
+        for key in ("plain", "shift", "altgr")
+    }
+    return KeyboardLayout(spec.get("name", name), **tables)
+
+
+def default_cache_dir() -> Path:
+    """Directory for compiled layouts and macros (~/.cache/kvm-serial)"""
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "kvm-serial"
+
+
+def load_layout(path: str | os.PathLike, cache_dir: str | os.PathLike | None = None):
+    """
+    Load a custom layout from a JSON file (see compile_layout for the format).
+
+    Compiled tables are cached on disk, keyed by a hash of the compiler version, the
+    file's name and its content, so that later loads skip compilation.
+
+    :param path: JSON layout file
+    :param cache_dir: Directory for compiled layouts, default ~/.cache/kvm-serial
+    :return: KeyboardLayout
+    """
+    path = Path(path)
+    content = path.read_bytes()
+    digest = hashlib.sha256(json.dumps([COMPILER_VERSION, path.stem]).encode())
+    digest.update(content)
+    cache = Path(cache_dir or default_cache_dir()) / f"layout-{digest.hexdigest()[:16]}.json"
+
+    # The cache holds plain tables, never code, so a tampered file can at worst be rejected
+    try:
+        with open(cache, "rb") as f:
+            return KeyboardLayout.from_tables(json.load(f))
+    except (OSError, ValueError):
+        pass
+
+    layout = compile_layout(json.loads(content), name=path.stem)
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache, "w", encoding="utf-8") as f:
+            json.dump(layout.to_tables(), f)
+    except OSError as e:
+        logger.debug(f"Could not cache compiled layout: {e}")
+    return layout
+
+
+_layouts: dict[str, KeyboardLayout] = {}
+
+
+def get_layout(name: str | os.PathLike | None = None) -> KeyboardLayout:
+    """
+    Get a built-in layout by name ("uk", "us", "de"), or load a JSON layout file.
+    None returns the default layout.
+    """
+    if name is None:
+        return default_layout
+    if isinstance(name, KeyboardLayout):
+        return name
+    key = str(name)
+    if key not in _layouts:
+        if key.lower() in BUILTIN:
+            _layouts[key] = compile_layout(BUILTIN[key.lower()], name=key.lower())
+        else:
+            _layouts[key] = load_layout(key)
+    return _layouts[key]
+
+
+def set_default_layout(name: str | os.PathLike | KeyboardLayout) -> KeyboardLayout:
+    """Set the layout used by the utils conversion functions when none is given"""
+    global default_layout
+    default_layout = get_layout(name)
+    return default_layout
+
+
+default_layout = get_layout("uk")
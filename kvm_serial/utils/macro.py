@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+"""
+Macros: sequences of text, key chords, delays and mouse actions, compiled once into a
+ready-to-write frame blob and a timing schedule.
+
+Macros are defined in a JSON file:
+    {
+        "hotkeys": {"<ctrl>+<alt>+l": "login"},
+        "macros": {
+            "login": [{"text": "admin"}, {"keys": "tab"}, {"text": "secret"}, {"keys": "enter"}],
+            "bios": [{"keys": "f2", "times": 20, "interval": 0.1}],
+            "reboot": [{"keys": "ctrl+alt+delete"}, {"delay": 5}, {"click": "left"}]
+        }
+    }
+
+Steps:
+    {"text": str, "minimal": bool}              Type text (via the layout)
+    {"keys": str | [str], "times": n, "interval": s}
+                                                Press and release chords of "+"-joined modifier
+                                                names, key names (layout.KEY_NAMES) or characters
+    {"delay": seconds}                          Wait
+    {"move": [x, y]}                            Move the absolute pointer (0..4095)
+    {"click": "left"|"right"|"middle", "at": [x, y]}
+    {"scroll": notches, "at": [x, y]}           Positive scrolls up
+
+Clicks and scrolls without "at" (and before any "move") happen wherever the pointer is.
+
+Run with `python -m kvm_serial macro PORT FILE NAME`.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from kvm_serial.utils import layout as _layout
+from kvm_serial.utils.bulk import encode_text
+from kvm_serial.utils.communication import (
+    CMD_KEYBOARD,
+    CMD_MOUSE_ABS,
+    CMD_MOUSE_REL,
+    DataComm,
+    FrameEncoder,
+)
+from kvm_serial.utils.layout import KEY_NAMES, MODIFIER_NAMES
+from kvm_serial.utils.mousereport import ABS_RANGE, BUTTON_LEFT, BUTTON_MIDDLE, BUTTON_RIGHT
+
+logger = logging.getLogger(__name__)
+
+COMPILER_VERSION = 2  # Bump when compiled output changes, to invalidate cached macros
+
+BUTTONS = {"left": BUTTON_LEFT, "right": BUTTON_RIGHT, "middle": BUTTON_MIDDLE}
+
+
+class CompiledMacro(NamedTuple):
+    blob: bytes  # Every frame of the macro, back to back
+    schedule: tuple[tuple[float, int, int], ...]  # (delay before, start, end) slices of blob
+
+    @property
+    def duration(self) -> float:
+        return sum(delay for delay, _, _ in self.schedule)
+
+
+def parse_chord(chord: str, layout=None) -> bytes:
+    """
+    Build the keyboard report for a chord such as "ctrl+alt+delete" or "ctrl+C"
+
+    Raises:
+        ValueError: if a key name is not recognised, or more than six keys are held
+    """
+    layout = _layout.get_layout(layout)
+    modifiers = 0
+    keys = []
+    # Split on "+" unless it is the last character, so "ctrl++" presses the plus key
+    for name in re.split(r"\+(?=.)", chord):
+        lower = name.lower()
+        if lower in MODIFIER_NAMES:
+            modifiers |= MODIFIER_NAMES[lower]
+        elif lower in KEY_NAMES:
+            keys.append(KEY_NAMES[lower])
+        elif len(name) == 1 and (report := layout.encode(name)) is not None:
+            modifiers |= report[0]
+            keys.append(report[2])
+        else:
+            raise ValueError(f"Unknown key {name!r} in {chord!r}")
+
+    if len(keys) > 6:
+        raise ValueError(f"Too many keys in {chord!r}: at most six can be held")
+    return bytes((modifiers, 0, *keys, *bytes(6 - len(keys))))
+
+
+def compile_macro(steps: list[dict], layout=None) -> CompiledMacro:
+    """
+    Compile macro steps into a frame blob and schedule
+
+    Raises:
+        ValueError: if a step is not understood
+    """
+    layout = _layout.get_layout(layout)
+    encoder = FrameEncoder()
+    release = encoder.encode(DataComm.RELEASE)
+    blob = bytearray()
+    schedule = []
+    delay = 0.0
+    start = 0
+    position = None  # Pointer position set by the macro; None until it moves the pointer
+
+    def pause(seconds: float):
+        nonlocal delay, start
+        if len(blob) > start or delay:
+            schedule.append((delay, start, len(blob)))
+        delay, start = float(seconds), len(blob)
+
+    def mouse(buttons: int = 0, wheel: int = 0):
+        if position is None:
+            # Relative report with no movement: act wherever the pointer already is
+            blob.extend(encoder.encode(bytes((0x01, buttons, 0, 0, wheel & 0xFF)), CMD_MOUSE_REL))
+            return
+        x, y = position
+        data = bytes((0x02, buttons, x & 0xFF, x >> 8, y & 0xFF, y >> 8, wheel & 0xFF))
+        blob.extend(encoder.encode(data, CMD_MOUSE_ABS))
+
+    for step in steps:
+        if "text" in step:
+            blob.extend(encode_text(step["text"], layout, minimal=step.get("minimal", False)))
+
+        elif "keys" in step:
+            chords = step["keys"] if isinstance(step["keys"], list) else [step["keys"]]
+            frames = b"".join(
+                encoder.encode(parse_chord(chord, layout), CMD_KEYBOARD) + release
+                for chord in chords
+            )
+            for i in range(step.get("times", 1)):
+                if i and step.get("interval"):
+                    pause(step["interval"])
+                blob.extend(frames)
+
+        elif "delay" in step:
+            pause(step["delay"])
+
+        elif "move" in step or "click" in step or "scroll" in step:
+            target = step.get("move", step.get("at"))
+            if target is not None:
+                position = tuple(min(max(int(v), 0), ABS_RANGE - 1) for v in target)
+            if "click" in step:
+                if step["click"] not in BUTTONS:
+                    raise ValueError(f"Unknown button {step['click']!r} in macro step: {step}")
+                mouse(BUTTONS[step["click"]])
+                mouse()
+            elif "scroll" in step:
+                mouse(wheel=max(-127, min(127, int(step["scroll"]))))
+            else:
+                mouse()
+
+        else:
+            raise ValueError(f"Unknown macro step: {step}")
+
+    pause(0)
+    return CompiledMacro(bytes(blob), tuple(schedule))
+
+
+def run_macro(comm: DataComm, macro: CompiledMacro) -> int:
+    """
+    Send a compiled macro, sleeping as scheduled between slices of its blob
+
+    Returns:
+        Number of bytes written
+    """
+    view = memoryview(macro.blob)
+    for delay, start, end in macro.schedule:
+        if delay:
+            time.sleep(delay)
+        if end > start:
+            comm.write_frames(view[start:end])
+    return len(macro.blob)
+
+
+class MacroLibrary:
+    """
+    The macros of one definition file, compiled on first use. Compiled macros are cached
+    on disk keyed by a hash of their definition and layout, so unchanged macros are never
+    recompiled.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        layout=None,
+        cache_dir: str | os.PathLike | None = None,
+    ):
+        """
+        :param path: JSON macro definition file
+        :param layout: KeyboardLayout or layout name (default: the default layout)
+        :param cache_dir: Directory for compiled macros, default ~/.cache/kvm-serial
+        """
+        with open(path, encoding="utf-8") as f:
+            definition = json.load(f)
+        self.macros: dict[str, list[dict]] = definition.get("macros", {})
+        self.hotkeys: dict[str, str] = definition.get("hotkeys", {})
+        self.layout = _layout.get_layout(layout)
+        self.cache_dir = Path(cache_dir or _layout.default_cache_dir())
+        self._compiled: dict[str, CompiledMacro] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.macros
+
+    def _cache_path(self, name: str) -> Path:
+        digest = hashlib.sha256(
+            json.dumps([COMPILER_VERSION, self.macros[name]], sort_keys=True).encode()
+        )
+        digest.update(json.dumps(self.layout.to_tables()).encode())
+        return self.cache_dir / f"macro-{digest.hexdigest()[:16]}"
+
+    @staticmethod
+    def _load_cached(cache: Path) -> CompiledMacro:
+        """
+        Read a cached macro: its blob as raw bytes (.bin) and its schedule as JSON (.json)
+
+        Raises:
+            OSError: if the cache cannot be read
+            ValueError: if it is malformed
+        """
+        blob = cache.with_suffix(".bin").read_bytes()
+        with open(cache.with_suffix(".json"), encoding="utf-8") as f:
+            entries = json.load(f)
+        try:
+            schedule = tuple((float(delay), int(start), int(end)) for delay, start, end in entries)
+        except TypeError as e:
+            raise ValueError(f"Bad macro schedule: {e}") from e
+        if not all(0 <= start <= end <= len(blob) for _, start, end in schedule):
+            raise ValueError("Macro schedule does not match its blob")
+        return CompiledMacro(blob, schedule)
+
+    def get(self, name: str) -> CompiledMacro:
+        """
+        The compiled macro of this name
+
+        Raises:
+            KeyError: if there is no such macro
+        """
+        if name in self._compiled:
+            return self._compiled[name]
+
+        steps = self.macros[name]
+        cache = self._cache_path(name)
+        try:
+            macro = self._load_cached(cache)
+        except (OSError, ValueError):
+            macro = compile_macro(steps, self.layout)
+            try:
+                cache.parent.mkdir(parents=True, exist_ok=True)
+                cache.with_suffix(".bin").write_bytes(macro.blob)
+                with open(cache.with_suffix(".json"), "w", encoding="utf-8") as f:
+                    json.dump(macro.schedule, f)
+            except OSError as e:
+                logger.debug(f"Could not cache compiled macro: {e}")
+
+        self._compiled[name] = macro
+        return macro
+
+    def run(self, name: str, comm: DataComm) -> int:
+        """Send the named macro through comm. Returns the number of bytes written"""
+        logger.debug(f"Running macro {name!r}")
+        return run_macro(comm, self.get(name))
+
+
+class MacroHotkeys:
+    """
+    Run macros when their hotkeys (pynput GlobalHotKeys syntax, e.g. "<ctrl>+<alt>+l") are
+    pressed on the host. Macros run in a thread of their own, one at a time.
+
+    GlobalHotKeys only observes the keyboard, so the chord itself is not suppressed: it
+    still reaches the host's focused window and, while capturing, is forwarded to the
+    target like any other keys. Choose chords that neither machine acts on.
+    """
+
+    def __init__(self, library: MacroLibrary, comm: DataComm):
+        from pynput.keyboard import GlobalHotKeys
+
+        self.library = library
+        self.comm = comm
+        self._busy = threading.Lock()
+        self.thread = GlobalHotKeys(
+            {hotkey: self._trigger(name) for hotkey, name in library.hotkeys.items()}
+        )
+
+    def _trigger(self, name: str):
+        def run():
+            if not self._busy.acquire(blocking=False):
+                logger.warning(f"Macro {name!r} ignored: another macro is running")
+                return
+            try:
+                self.library.run(name, self.comm)
+            finally:
+                self._busy.release()
+
+        return lambda: threading.Thread(target=run, name=f"Macro-{name}", daemon=True).start()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.thread.stop()
+        self.thread.join()
+
+
+def main(argv: list[str] | None = None):
+    import argparse
+
+    from serial import Serial
+
+    parser = argparse.ArgumentParser(prog="python -m kvm_serial macro", description="Run a macro")
+    parser.add_argument("port", help="Serial port of the CH9329")
+    parser.add_argument("file", help="JSON macro definition file")
+    parser.add_argument("name", help="Macro to run", nargs="?")
+    parser.add_argument("-b", "--baud", help="Serial baud rate", default=9600, type=int)
+    parser.add_argument("-l", "--layout", help="Target keyboard layout", default="uk")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    library = MacroLibrary(args.file, layout=args.layout)
+    if args.name is None or args.name not in library:
+        print("Macros: " + ", ".join(library.macros))
+        return
+
+    serial = Serial(args.port, args.baud)
+    try:
+        library.run(args.name, DataComm(serial))
+        serial.flush()
+    finally:
+        serial.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Runtime metrics: counters, gauges and fixed-bucket histograms, exported in the Prometheus
+text format as a textfile (for node_exporter's textfile collector) or over HTTP.
+
+Updating a metric is a plain attribute update, without a lock, so that instrumenting hot
+paths costs well under a microsecond. Updates from several threads may occasionally be
+lost; the values are intended for monitoring only.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from 100µs (a keypress on a fast link) to 1s (a stalled port)
+# fmt: off
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+# fmt: on
+
+
+class Counter:
+    """Monotonic count, or the result of `function` if given"""
+
+    __slots__ = ("value", "function")
+    kind = "counter"
+
+    def __init__(self, function: Callable[[], float] | None = None):
+        self.value = 0
+        self.function = function
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Gauge(Counter):
+    """Value which may go up and down, or the result of `function` if given"""
+
+    __slots__ = ()
+    kind = "gauge"
+
+    def set(self, value: float):
+        self.value = value
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+
+class Histogram:
+    """Distribution of observations in fixed buckets (upper bounds, inclusive)"""
+
+    __slots__ = ("buckets", "counts", "sum")
+    kind = "histogram"
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # The last count is for +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """
+    Named metric families, each holding one metric per distinct set of labels.
+
+    Asking for a metric that already exists returns it, so instrumented classes can look
+    up their metrics in __init__ and share them between instances.
+    """
+
+    def __init__(self):
+        self._families: dict[str, tuple[type, str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls: type, name: str, help: str, labels: dict, factory: Callable):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (cls, help, {})
+            elif family[0] is not cls:
+                raise ValueError(f"Metric {name} is already registered as a {family[0].kind}")
+
+            metrics = family[2]
+            if key not in metrics:
+                metrics[key] = factory()
+            return metrics[key]
+
+    def counter(
+        self, name: str, help: str = "", function: Callable[[], float] | None = None, **labels
+    ) -> Counter:
+        """
+        Get or create a counter
+        :param function: Read the value from this callable when exporting, instead of
+            counting with inc(). Replaces the function of an existing counter.
+        """
+        counter = self._get(Counter, name, help, labels, Counter)
+        if function is not None:
+            counter.function = function
+        return counter
+
+    def gauge(
+        self, name: str, help: str = "", function: Callable[[], float] | None = None, **labels
+    ) -> Gauge:
+        """Get or create a gauge (see counter() for `function`)"""
+        gauge = self._get(Gauge, name, help, labels, Gauge)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(
+        self, name: str, help: str = "", buckets: tuple[float, ...] = LATENCY_BUCKETS, **labels
+    ) -> Histogram:
+        """Get or create a histogram. Buckets are fixed when it is first created"""
+        return self._get(Histogram, name, help, labels, lambda: Histogram(buckets))
+
+    def clear(self):
+        with self._lock:
+            self._families.clear()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            families = [(name, *family) for name, family in sorted(self._families.items())]
+
+        lines = []
+        for name, cls, help, metrics in families:
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {cls.kind}")
+            for labels, metric in sorted(metrics.items()):
+                if cls is Histogram:
+                    total = 0
+                    for bound, count in zip((*metric.buckets, float("inf")), metric.counts):
+                        total += count
+                        bucket = _format_labels(labels, f'le="{_format_value(float(bound))}"')
+                        lines.append(f"{name}_bucket{bucket} {total}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(metric.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {total}")
+                else:
+                    try:
+                        value = metric.get()
+                    except Exception as e:
+                        logger.debug(f"Could not read metric {name}: {e}")
+                        continue
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str | os.PathLike):
+        """
+        Write all metrics to a file, atomically, for node_exporter's textfile collector
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".prom")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.chmod(temp, 0o644)
+            os.replace(temp, path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+
+REGISTRY = Registry()
+
+
+class MetricsServer:
+    """Serve a registry over HTTP at /metrics, from a background thread"""
+
+    def __init__(self, port: int = 9329, host: str = "127.0.0.1", registry: Registry = REGISTRY):
+        """
+        :param port: TCP port to listen on (0 picks a free port; see .port)
+        :param host: Address to bind; the default only accepts local connections
+        :param registry: Metrics to serve
+        """
+        registry_ = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry_.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="MetricsServer", daemon=True
+        )
+
+    def start(self) -> "MetricsServer":
+        self.thread.start()
+        logger.info(f"Serving metrics on http://{self.server.server_address[0]}:{self.port}/")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread.is_alive():
+            self.thread.join()
+
+
+class TextfileExporter:
+    """Rewrite a Prometheus textfile every `interval` seconds, and once more on stop()"""
+
+    def __init__(
+        self, path: str | os.PathLike, interval: float = 15.0, registry: Registry = REGISTRY
+    ):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="TextfileExporter", daemon=True)
+
+    def start(self) -> "TextfileExporter":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            stopping = self._stop.wait(self.interval)
+            try:
+                self.registry.write_textfile(self.path)
+            except OSError as e:
+                logger.error(f"Could not write metrics to {self.path}: {e}")
+            if stopping:
+                break
@@ -0,0 +1,131 @@
+"""
+Fixed-rate mouse report generation for the CH9329 absolute mouse
+"""
+
+import threading
+import time
+
+from kvm_serial.utils.communication import CMD_MOUSE_ABS, DataComm
+
+ABS_RANGE = 4096  # CH9329 absolute coordinates run 0..4095 on each axis
+
+BUTTON_LEFT = 0x01
+BUTTON_RIGHT = 0x02
+BUTTON_MIDDLE = 0x04
+
+
+class MouseReportEngine:
+    """
+    Accumulate pointer position, wheel movement and button state, and send one combined
+    absolute report (cmd 0x04) per tick instead of one frame per OS event.
+
+    Every report carries position, buttons and wheel together, so a move can never
+    release a held button and a click always lands at the latest position. Button changes
+    are sent straight away (carrying any pending movement), so a press and release which
+    fall within the same tick are both seen by the target.
+    """
+
+    def __init__(
+        self,
+        comm: DataComm,
+        rate: float | None = 125,
+        dead_zone: int = 0,
+        scroll_step: float = 1.0,
+    ):
+        """
+        :param comm: DataComm to send reports with
+        :param rate: Reports per second, or None/0 to send a report for every event
+        :param dead_zone: Moves of at most this many device units are not sent on their own
+        :param scroll_step: Wheel notches per unit of scroll input (fractions accumulate)
+        """
+        self.comm = comm
+        self.rate = rate or None
+        self.dead_zone = dead_zone
+        self.scroll_step = scroll_step
+
+        self.x = self.y = 0
+        self.buttons = 0
+        self._wheel = 0.0
+
+        # Last state sent to the device
+        self._sent_x = self._sent_y = 0
+        self._sent_buttons = 0
+
+        self.reports = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="MouseReportEngine", daemon=True)
+
+    def start(self):
+        if self.rate:
+            self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.tick()  # Send any remaining state
+
+    def move_to(self, x: int, y: int):
+        """Set the pointer position in device coordinates (0..4095)"""
+        x = min(max(int(x), 0), ABS_RANGE - 1)
+        y = min(max(int(y), 0), ABS_RANGE - 1)
+        with self._lock:
+            self.x, self.y = x, y
+        if not self.rate:
+            self.tick()
+
+    def set_button(self, mask: int, down: bool):
+        """Press (down=True) or release the buttons in mask, sending the change straight away"""
+        with self._lock:
+            self.buttons = (self.buttons | mask) if down else (self.buttons & ~mask)
+            self._send()
+
+    def scroll(self, amount: float):
+        """Accumulate wheel movement; positive scrolls up"""
+        with self._lock:
+            self._wheel += amount * self.scroll_step
+        if not self.rate:
+            self.tick()
+
+    def tick(self) -> bool:
+        """
+        Send a report if the accumulated state differs from what was last sent
+
+        Returns:
+            True if a report was sent
+        """
+        with self._lock:
+            moved = (
+                abs(self.x - self._sent_x) > self.dead_zone
+                or abs(self.y - self._sent_y) > self.dead_zone
+            )
+            if moved or int(self._wheel) or self.buttons != self._sent_buttons:
+                self._send()
+                return True
+        return False
+
+    def _send(self):
+        # Whole wheel notches only; fractions are carried to the next report
+        wheel = max(-127, min(127, int(self._wheel)))
+        self._wheel -= wheel
+
+        x, y = self.x, self.y
+        data = bytes((0x02, self.buttons, x & 0xFF, x >> 8, y & 0xFF, y >> 8, wheel & 0xFF))
+        self.comm.send(data, cmd=CMD_MOUSE_ABS)
+
+        self._sent_x, self._sent_y, self._sent_buttons = x, y, self.buttons
+        self.reports += 1
+
+    def _run(self):
+        interval = 1.0 / self.rate
+        deadline = time.monotonic()
+        while not self._stop.is_set():
+            self.tick()
+            deadline += interval
+            delay = deadline - time.monotonic()
+            if delay < 0:
+                # Fell behind (e.g. blocked on a full write queue): skip missed ticks
+                deadline = time.monotonic()
+                continue
+            self._stop.wait(delay)
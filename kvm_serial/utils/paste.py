@@ -0,0 +1,126 @@
+"""
+Bracketed paste: with the mode enabled, terminals wrap pasted text in marker sequences,
+so a paste can be collected whole and sent in bulk rather than key by key.
+"""
+
+import logging
+from typing import Callable
+
+from kvm_serial.utils.communication import DataComm
+
+logger = logging.getLogger(__name__)
+
+ENABLE = "\x1b[?2004h"
+DISABLE = "\x1b[?2004l"
+PASTE_START = "\x1b[200~"
+PASTE_END = "\x1b[201~"
+ESC_TIMEOUT = 0.05  # Seconds to wait after an ESC for the rest of a paste marker
+
+
+def _partial(text: str, marker: str) -> int:
+    """Length of the longest suffix of text which could be the start of marker"""
+    for length in range(min(len(text), len(marker) - 1), 0, -1):
+        if marker.startswith(text[-length:]):
+            return length
+    return 0
+
+
+class PasteParser:
+    """
+    Split terminal input into typed keys and pasted blocks.
+
+    feed() returns (pasted, text) segments in order. Input which might be the start of a
+    marker is held back until more input shows what it is; call flush() when no more
+    input is immediately available, so a lone ESC keypress is not held indefinitely.
+    """
+
+    def __init__(self, in_paste: bool = False):
+        """
+        :param in_paste: Start inside a paste, e.g. when the start marker was already read
+        """
+        self._pending = ""
+        self._paste: list[str] | None = [] if in_paste else None
+
+    @property
+    def in_paste(self) -> bool:
+        return self._paste is not None
+
+    @property
+    def pending(self) -> bool:
+        """Whether input is held back, waiting to see if it starts a marker"""
+        return bool(self._pending)
+
+    def feed(self, data: str) -> list[tuple[bool, str]]:
+        segments = []
+        buffer = self._pending + data
+        self._pending = ""
+
+        while buffer:
+            if self._paste is not None:
+                end = buffer.find(PASTE_END)
+                if end < 0:
+                    keep = _partial(buffer, PASTE_END)
+                    self._paste.append(buffer[: len(buffer) - keep])
+                    self._pending = buffer[len(buffer) - keep :]
+                    break
+                self._paste.append(buffer[:end])
+                segments.append((True, "".join(self._paste)))
+                self._paste = None
+                buffer = buffer[end + len(PASTE_END) :]
+            else:
+                start = buffer.find(PASTE_START)
+                if start < 0:
+                    keep = _partial(buffer, PASTE_START)
+                    if len(buffer) > keep:
+                        segments.append((False, buffer[: len(buffer) - keep]))
+                    self._pending = buffer[len(buffer) - keep :]
+                    break
+                if start:
+                    segments.append((False, buffer[:start]))
+                self._paste = []
+                buffer = buffer[start + len(PASTE_START) :]
+
+        return segments
+
+    def flush(self) -> list[tuple[bool, str]]:
+        """Release held-back input as typed keys (unless it is inside a paste)"""
+        if self._paste is not None or not self._pending:
+            return []
+        pending, self._pending = self._pending, ""
+        return [(False, pending)]
+
+
+def send_paste(
+    comm: DataComm,
+    text: str,
+    layout=None,
+    chunk: int = 32,
+    progress: Callable[[int, int], None] | None = None,
+    cancelled: Callable[[], bool] | None = None,
+) -> int:
+    """
+    Type a pasted block in bulk (see DataComm.send_text), `chunk` characters per write.
+    The port is flushed after each chunk, so progress is what has actually been sent and
+    cancelling stops within one chunk.
+
+    :param comm: DataComm to send with
+    :param text: Pasted text; CR and CRLF line endings are typed as Enter
+    :param layout: KeyboardLayout or layout name (default: the default layout)
+    :param chunk: Characters per write
+    :param progress: Called with (characters sent, total) after each chunk
+    :param cancelled: Polled after each chunk; returning True stops the paste
+    :return: Number of characters sent
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    sent = 0
+    while sent < len(text):
+        comm.send_text(text[sent : sent + chunk], layout)
+        comm.port.flush()
+        sent = min(sent + chunk, len(text))
+
+        if progress is not None:
+            progress(sent, len(text))
+        if sent < len(text) and cancelled is not None and cancelled():
+            logger.info(f"Paste cancelled after {sent} of {len(text)} characters")
+            break
+    return sent
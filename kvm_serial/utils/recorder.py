@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+"""
+Record the HID reports sent to a CH9329 and replay them later.
+
+Log format: the magic bytes b"KVMR\\x01", then one record per report:
+    delta (varint, microseconds since the previous report)
+    command (1 byte)
+    either: length (1 byte) and data
+    or, if bit 7 of the command is set: index (1 byte) of an earlier report for this command
+
+The first 256 distinct reports of each command are numbered in order of appearance, so a
+typing session is mostly 3-4 byte records.
+
+Replay with `python -m kvm_serial replay PORT LOG [--speed N | --max]`.
+"""
+
+import logging
+import time
+from typing import Iterable, Iterator, NamedTuple
+
+from kvm_serial.utils.communication import CMD_KEYBOARD, CMD_MOUSE_ABS, CMD_MOUSE_REL
+from kvm_serial.utils.communication import DataComm, FrameEncoder
+from kvm_serial.utils.replies import FrameParser
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KVMR\x01"
+HID_COMMANDS = (CMD_KEYBOARD[0], CMD_MOUSE_ABS[0], CMD_MOUSE_REL[0])
+REPEAT = 0x80
+DICTIONARY_SIZE = 256
+
+
+class Event(NamedTuple):
+    time: float  # Seconds since the start of the recording
+    cmd: int
+    data: bytes
+
+
+class Recorder:
+    """
+    Collect HID reports from the outgoing byte stream into a delta-encoded log.
+
+    record() only appends the written bytes and a timestamp to a list; parsing frames and
+    encoding them into `log` happens every `compact_every` writes, and on save().
+    """
+
+    def __init__(self, compact_every: int = 1024):
+        """
+        :param compact_every: Number of writes buffered before they are encoded
+        """
+        self.compact_every = compact_every
+        self.log = bytearray(MAGIC)
+        self.reports = 0
+
+        self._raw: list[tuple[int, bytes]] = []
+        self._parser = FrameParser()
+        self._start: int | None = None
+        self._last = 0
+        self._seen: dict[int, dict[bytes, int]] = {}
+
+    def tap(self, port) -> "RecordingPort":
+        """Wrap a port so everything written to it is recorded"""
+        return RecordingPort(port, self)
+
+    def record(self, data: bytes, now: int | None = None):
+        """
+        Record bytes written to the port
+        :param data: Frames as written (frames may span writes)
+        :param now: time.monotonic_ns() of the write
+        """
+        self._raw.append((time.monotonic_ns() if now is None else now, bytes(data)))
+        if len(self._raw) >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Encode buffered writes into the log"""
+        raw, self._raw = self._raw, []
+        for now, data in raw:
+            for frame in self._parser.feed(data):
+                if frame.cmd in HID_COMMANDS:
+                    self._append(now, frame.cmd, frame.data)
+
+    def _append(self, now: int, cmd: int, data: bytes):
+        if self._start is None:
+            self._start = now
+        micros = (now - self._start) // 1000
+        delta, self._last = micros - self._last, micros
+
+        log = self.log
+        while delta >= 0x80:
+            log.append(delta & 0x7F | 0x80)
+            delta >>= 7
+        log.append(delta)
+
+        seen = self._seen.setdefault(cmd, {})
+        index = seen.get(data)
+        if index is not None:
+            log.append(cmd | REPEAT)
+            log.append(index)
+        else:
+            log.append(cmd)
+            log.append(len(data))
+            log += data
+            if len(seen) < DICTIONARY_SIZE:
+                seen[data] = len(seen)
+        self.reports += 1
+
+    def getvalue(self) -> bytes:
+        self.compact()
+        return bytes(self.log)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.getvalue())
+        logger.info(f"Recorded {self.reports} reports ({len(self.log)} bytes) to {path}")
+
+
+class RecordingPort:
+    """Port wrapper which passes writes to a Recorder. Everything else goes to the port"""
+
+    def __init__(self, port, recorder: Recorder):
+        self.port = port
+        self.recorder = recorder
+
+    def write(self, data) -> int:
+        written = self.port.write(data)
+        self.recorder.record(data)
+        return written
+
+    def __getattr__(self, name):
+        return getattr(self.port, name)
+
+
+def iter_log(log: bytes) -> Iterator[Event]:
+    """
+    Decode a recorded log
+
+    Raises:
+        ValueError: if the data is not a recording
+    """
+    if not log.startswith(MAGIC):
+        raise ValueError("Not a kvm_serial HID recording")
+
+    seen: dict[int, list[bytes]] = {}
+    micros = 0
+    pos, size = len(MAGIC), len(log)
+    while pos < size:
+        delta = shift = 0
+        while True:
+            byte = log[pos]
+            pos += 1
+            delta |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        micros += delta
+
+        cmd = log[pos]
+        if cmd & REPEAT:
+            cmd &= ~REPEAT
+            data = seen[cmd][log[pos + 1]]
+            pos += 2
+        else:
+            length = log[pos + 1]
+            data = bytes(log[pos + 2 : pos + 2 + length])
+            pos += 2 + length
+            reports = seen.setdefault(cmd, [])
+            if len(reports) < DICTIONARY_SIZE:
+                reports.append(data)
+        yield Event(micros / 1e6, cmd, data)
+
+
+def load(path) -> list[Event]:
+    with open(path, "rb") as f:
+        return list(iter_log(f.read()))
+
+
+class Player:
+    """
+    Replay recorded events through a DataComm's port.
+
+    Events due within `window` seconds of each other are packed into one buffer and sent
+    in a single write, so replays keep up with the link. With speed=None, timing is
+    ignored and the whole recording is sent as fast as the link allows, or at the rate
+    set by the DataComm's rate controller if it has one.
+    """
+
+    def __init__(self, comm: DataComm, speed: float | None = 1.0, window: float = 0.002):
+        """
+        :param comm: DataComm to send through
+        :param speed: Playback speed multiplier, or None for maximum link speed
+        :param window: Seconds of upcoming events sent together
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be positive, or None for maximum speed")
+        self.comm = comm
+        self.speed = speed
+        self.window = window
+        self.encoder = FrameEncoder()
+        self.sent = 0
+
+    def _write(self, events: list[Event]):
+        buffer = bytearray(sum(len(e.data) for e in events) + FrameEncoder.OVERHEAD * len(events))
+        end = 0
+        for event in events:
+            end = self.encoder.encode_into(buffer, end, event.data, bytes((event.cmd,)))
+        if self.speed is None and self.comm.rate is not None:
+            self.comm.rate.send_many(self.comm, buffer)
+        else:
+            self.comm.port.write(buffer)
+        self.sent += len(events)
+
+    def play(self, events: Iterable[Event], batch: int = 4096) -> int:
+        """
+        Replay events
+        :param events: Events, e.g. from load()
+        :param batch: Maximum events per write
+        :return: Number of events sent
+        """
+        events = events if isinstance(events, list) else list(events)
+        start = time.monotonic()
+        i = 0
+        while i < len(events):
+            if self.speed is None:
+                j = min(i + batch, len(events))
+            else:
+                delay = start + events[i].time / self.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                horizon = (time.monotonic() - start + self.window) * self.speed
+                j = i + 1
+                while j < len(events) and j - i < batch and events[j].time <= horizon:
+                    j += 1
+
+            self._write(events[i:j])
+            i = j
+        return self.sent
+
+
+def main(argv: list[str] | None = None):
+    import argparse
+
+    from serial import Serial
+
+    from kvm_serial.utils.flowcontrol import RateController, link_frame_rate
+    from kvm_serial.utils.replies import ReplyReader, ReplyTracker
+    from kvm_serial.utils.writer import SerialWriter
+
+    parser = argparse.ArgumentParser(
+        prog="python -m kvm_serial replay", description="Replay a recorded HID session"
+    )
+    parser.add_argument("port", help="Serial port of the CH9329")
+    parser.add_argument("log", help="Recording made with control.py --record")
+    parser.add_argument("-b", "--baud", help="Serial baud rate", default=9600, type=int)
+    speed = parser.add_mutually_exclusive_group()
+    speed.add_argument("-s", "--speed", help="Playback speed multiplier", default=1.0, type=float)
+    speed.add_argument("--max", help="Replay at maximum link speed", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    events = load(args.log)
+    serial = Serial(args.port, args.baud)
+    comm = DataComm(serial)
+    writer = replies = None
+    if args.max:
+        # At maximum speed, send as fast as the CH9329's replies show it keeps up
+        writer = SerialWriter(serial, baud=args.baud).start()
+        tracker = ReplyTracker(byte_time=10 / args.baud).attach(writer)
+        replies = ReplyReader(serial, tracker).start()
+        link_rate = link_frame_rate(args.baud)
+        comm = DataComm(writer, RateController(tracker, initial=link_rate / 2, maximum=link_rate))
+    try:
+        start = time.monotonic()
+        Player(comm, speed=None if args.max else args.speed).play(events)
+        comm.port.flush()
+        logger.info(f"Replayed {len(events)} reports in {time.monotonic() - start:.1f}s")
+    finally:
+        if writer is not None:
+            writer.stop()
+            replies.stop()
+        serial.close()
+
+
+if __name__ == "__main__":
+    main()
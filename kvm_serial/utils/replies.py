@@ -0,0 +1,275 @@
+"""
+Parsing of CH9329 reply frames, and matching replies to the frames which were sent.
+
+The CH9329 answers every command with a frame whose command byte is the original
+command | 0x80 (success) or | 0xC0 (error), carrying a one-byte status for data commands.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, NamedTuple
+
+from serial import Serial, SerialException
+
+from kvm_serial.utils.communication import HEADER
+
+logger = logging.getLogger(__name__)
+
+REPLY_OK = 0x80
+REPLY_ERROR = 0xC0
+
+STATUS_SUCCESS = 0x00
+STATUS_NAMES = {
+    0x00: "success",
+    0xE1: "timeout",
+    0xE2: "header error",
+    0xE3: "command error",
+    0xE4: "checksum error",
+    0xE5: "parameter error",
+    0xE6: "operation failed",
+}
+
+
+class Frame(NamedTuple):
+    addr: int
+    cmd: int
+    data: bytes
+
+
+class FrameParser:
+    """
+    Incremental parser for CH9329 frames (header 0x57AB, addr, cmd, length, data, checksum).
+
+    feed() accepts arbitrary chunks of a byte stream. Bytes which are not part of a valid
+    frame are skipped, and a frame with a bad checksum causes a resync from the byte after
+    its header, so one corrupted frame cannot swallow the ones after it.
+    """
+
+    def __init__(self, on_checksum_error: Callable[[int], None] | None = None):
+        """
+        :param on_checksum_error: Called with the command byte of each frame failing its checksum
+        """
+        self._buffer = bytearray()
+        self.on_checksum_error = on_checksum_error
+        self.frames = 0
+        self.discarded = 0
+        self.checksum_errors = 0
+
+    def feed(self, data: bytes) -> list[Frame]:
+        """Add bytes to the stream, returning any frames completed by them"""
+        buffer = self._buffer
+        buffer += data
+        frames = []
+        pos = 0
+
+        while True:
+            start = buffer.find(HEADER, pos)
+            if start < 0:
+                # Keep a trailing first header byte: the second may arrive in the next chunk
+                keep = 1 if buffer[-1:] == HEADER[:1] else 0
+                self.discarded += len(buffer) - pos - keep
+                del buffer[: len(buffer) - keep]
+                break
+
+            self.discarded += start - pos
+            if len(buffer) - start < 5:
+                del buffer[:start]
+                break
+
+            end = start + 5 + buffer[start + 4]
+            if len(buffer) <= end:
+                del buffer[:start]
+                break
+
+            if sum(buffer[start:end]) & 0xFF != buffer[end]:
+                self.checksum_errors += 1
+                self.discarded += 1
+                if self.on_checksum_error is not None:
+                    self.on_checksum_error(buffer[start + 3])
+                pos = start + 1
+                continue
+
+            frames.append(
+                Frame(buffer[start + 2], buffer[start + 3], bytes(buffer[start + 5 : end]))
+            )
+            pos = end + 1
+
+        self.frames += len(frames)
+        return frames
+
+
+def iter_commands(data: bytes):
+    """Yield the command byte of each frame in a buffer of back-to-back outgoing frames"""
+    pos, size = 0, len(data)
+    while pos + 5 <= size:
+        yield data[pos + 3]
+        pos += 6 + data[pos + 4]
+
+
+class ReplyTracker:
+    """
+    Match replies to sent frames, recording round-trip times and error codes.
+
+    Replies arrive in the order frames were sent, so each reply is matched to the oldest
+    pending frame with the same command. Pending frames skipped over, or older than the
+    timeout, are counted as lost.
+    """
+
+    def __init__(self, timeout: float = 1.0, history: int = 4096, byte_time: float = 0.0):
+        """
+        :param timeout: Seconds after which an unanswered frame is counted as lost
+        :param history: Number of round-trip times kept for percentiles
+        :param byte_time: Seconds each byte takes on the wire (10 / baud for 8N1). Frames are
+            stamped when their last byte is expected to have been sent, so frames written in
+            one batch do not show round-trip times growing with their place in the batch
+        """
+        self.timeout = timeout
+        self.byte_time = byte_time
+        self.rtts: deque[float] = deque(maxlen=history)
+        self.listeners: list[Callable[[int, int, float], None]] = []
+
+        self.sent_frames = 0
+        self.acked = 0
+        self.lost = 0
+        self.unmatched = 0
+        self.errors: Counter = Counter()
+
+        self._pending: deque[tuple[int, float]] = deque()
+        self._line_free = float("-inf")  # When the last frame sent leaves the wire
+        self._lock = threading.Lock()
+
+    def attach(self, writer) -> "ReplyTracker":
+        """Record every write made by a SerialWriter as sent"""
+        writer.on_write = self.sent
+        return self
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def sent(self, data: bytes, now: float | None = None):
+        """Record the frames in data as sent"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            # Frames queue behind any still being sent, then go out back to back
+            start = max(now, self._line_free)
+            pos, size = 0, len(data)
+            while pos + 5 <= size:
+                cmd = data[pos + 3]
+                pos = min(size, pos + 6 + data[pos + 4])
+                self._pending.append((cmd, start + pos * self.byte_time))
+                self.sent_frames += 1
+            self._line_free = start + size * self.byte_time
+
+    def received(self, frame: Frame, now: float | None = None) -> float | None:
+        """
+        Match a reply frame to the frame it answers
+
+        Returns:
+            Round-trip time in seconds, or None if no sent frame matched
+        """
+        now = time.monotonic() if now is None else now
+        cmd = frame.cmd & ~REPLY_ERROR
+        status = frame.data[0] if frame.data else STATUS_SUCCESS
+        if (frame.cmd & REPLY_ERROR) == REPLY_ERROR and status == STATUS_SUCCESS:
+            status = 0xE6  # Error reply without a status byte
+
+        with self._lock:
+            pending = self._pending
+            while pending and (pending[0][0] != cmd or now - pending[0][1] > self.timeout):
+                pending.popleft()
+                self.lost += 1
+
+            if not pending:
+                self.unmatched += 1
+                return None
+
+            _, sent_at = pending.popleft()
+            rtt = max(0.0, now - sent_at)
+            self.rtts.append(rtt)
+            self.acked += 1
+            if status != STATUS_SUCCESS:
+                self.errors[status] += 1
+                logger.debug(f"CH9329 replied to 0x{cmd:02x}: {STATUS_NAMES.get(status, status)}")
+
+        for listener in self.listeners:
+            listener(cmd, status, rtt)
+        return rtt
+
+    def expire(self, now: float | None = None) -> int:
+        """Count pending frames older than the timeout as lost, returning how many"""
+        now = time.monotonic() if now is None else now
+        expired = 0
+        with self._lock:
+            while self._pending and now - self._pending[0][1] > self.timeout:
+                self._pending.popleft()
+                expired += 1
+            self.lost += expired
+        return expired
+
+    def percentile(self, p: float) -> float | None:
+        """Round-trip time percentile (0-100) in seconds over the recorded history"""
+        rtts = sorted(self.rtts)
+        if not rtts:
+            return None
+        return rtts[min(len(rtts) - 1, int(len(rtts) * p / 100))]
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent_frames,
+            "acked": self.acked,
+            "pending": self.pending,
+            "lost": self.lost,
+            "unmatched": self.unmatched,
+            "errors": {STATUS_NAMES.get(k, hex(k)): v for k, v in self.errors.items()},
+            "rtt_p50": self.percentile(50),
+            "rtt_p95": self.percentile(95),
+            "rtt_p99": self.percentile(99),
+        }
+
+
+class ReplyReader:
+    """Background thread which reads the port and feeds replies to a ReplyTracker"""
+
+    def __init__(self, port: Serial, tracker: ReplyTracker | None = None, poll: float = 0.1):
+        """
+        :param port: Serial port to read from. Its read timeout is set to poll if unset
+        :param tracker: Tracker to pass replies to
+        :param poll: Read timeout in seconds, bounding how long stop() takes
+        """
+        self.port = port
+        self.tracker = tracker or ReplyTracker()
+        self.parser = FrameParser()
+        if getattr(port, "timeout", None) is None:
+            port.timeout = poll
+
+        self.running = False
+        self.thread = threading.Thread(target=self._run, name="ReplyReader", daemon=True)
+
+    def start(self) -> "ReplyReader":
+        self.running = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread.is_alive():
+            self.thread.join()
+        logger.debug(f"CH9329 replies: {self.tracker.stats()}")
+
+    def _run(self):
+        while self.running:
+            try:
+                data = self.port.read(self.port.in_waiting or 1)
+            except (SerialException, OSError, TypeError) as e:
+                logger.error(f"Reply reader stopped: {e}")
+                break
+
+            if data:
+                now = time.monotonic()
+                for frame in self.parser.feed(data):
+                    self.tracker.received(frame, now)
+            else:
+                self.tracker.expire()
@@ -0,0 +1,230 @@
+"""
+Priority-aware scheduling of CH9329 frames, paced to the serial link's bandwidth
+"""
+
+import re
+import time
+from collections import deque
+from enum import IntEnum
+from itertools import count
+
+from kvm_serial.utils.communication import CMD_MOUSE_ABS, CMD_MOUSE_REL, HEADER
+
+_MOUSE_ABS = CMD_MOUSE_ABS[0]
+_MOUSE_REL = CMD_MOUSE_REL[0]
+_ABS_FRAME_LENGTH = 13  # 5 byte prefix, 7 data bytes, checksum
+
+# Header, address and command of a mouse frame: searched in C before walking any frames
+_MOUSE_COMMAND = re.compile(re.escape(HEADER) + b".[" + CMD_MOUSE_ABS + CMD_MOUSE_REL + b"]", re.S)
+
+
+def _frames(data: bytes):
+    """Split a write into the CH9329 frames it contains; anything else is one item"""
+    start = 0
+    while start < len(data):
+        if data[start : start + 2] != HEADER or start + 5 > len(data):
+            yield data[start:]
+            return
+        end = start + 6 + data[start + 4]
+        yield data[start:end]
+        start = end
+
+
+def _mouse_fields(frame: bytes) -> tuple[int, int, bool] | None:
+    """(buttons, wheel, moved) of a mouse frame, or None if it is not one"""
+    if len(frame) < 10 or frame[:2] != HEADER:
+        return None
+
+    cmd = frame[3]
+    if cmd == _MOUSE_ABS:
+        # 0x02, buttons, x (2b), y (2b), wheel
+        return frame[6], frame[11] if len(frame) > 11 else 0, True
+    if cmd == _MOUSE_REL:
+        # 0x01, buttons, dx, dy, wheel
+        return frame[6], frame[9], bool(frame[7] or frame[8])
+    return None
+
+
+class Priority(IntEnum):
+    KEYBOARD = 0  # Key reports, and anything not recognised as a mouse frame
+    BUTTON = 1  # Mouse frames which change button state (as urgent as key reports)
+    SCROLL = 2  # Mouse frames with a wheel movement
+    MOTION = 3  # Pointer movement only
+
+
+class FrameScheduler:
+    """
+    Queue of serial writes, split into one FIFO per Priority class.
+
+    pop() returns the oldest write of the most important non-empty class. Key reports
+    and button changes are one class, served in the order they were queued, so a key
+    never overtakes a click (or the reverse). Button changes are never sent ahead of
+    pointer motion queued before them, so a click always lands where the pointer was
+    when it happened.
+
+    Absolute moves are latest-wins: a new absolute move replaces one still waiting in
+    the queue, so the pointer is at most one frame behind however slow the link is.
+
+    When a baud rate is given, a token bucket limits writes to the link's bandwidth.
+    Keeping the OS and UART buffers shallow means priority is decided here, rather than
+    frames waiting in a FIFO we cannot reorder.
+    """
+
+    def __init__(self, baud: int | None = None, burst: int = 32, bits_per_byte: int = 10):
+        """
+        :param baud: Serial baud rate, or None for no bandwidth budget
+        :param burst: Bytes which may be written ahead of the link rate
+        :param bits_per_byte: Bits on the wire per byte (10 for 8N1)
+        """
+        self.queues: tuple[deque, ...] = tuple(deque() for _ in Priority)
+        self.rate = baud / bits_per_byte if baud else None
+        self.burst = burst
+
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._seq = count()
+        self._buttons = 0  # Button state of the last mouse frame popped
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self.queues)
+
+    def __bool__(self) -> bool:
+        return any(self.queues)
+
+    def classify(self, data: bytes) -> Priority:
+        """
+        Assign a priority class to a write: the most important class of the frames it
+        contains. Button changes are judged against the button state once everything
+        queued has been sent
+        """
+        return self._classify(data, self._queued_buttons())[0]
+
+    def _classify(self, data: bytes, buttons: int) -> tuple[Priority, int]:
+        """(priority class, button state once the write is sent), from the state before it"""
+        if not _MOUSE_COMMAND.search(data):
+            return Priority.KEYBOARD, buttons  # Fast path: no mouse frames to walk
+
+        priority, keyboard = None, False
+        for frame in _frames(data):
+            mouse = _mouse_fields(frame)
+            if mouse is None:
+                keyboard = True
+                continue
+
+            frame_buttons, wheel, moved = mouse
+            if frame_buttons != buttons:
+                buttons = frame_buttons
+                frame_priority = Priority.BUTTON
+            elif wheel:
+                frame_priority = Priority.SCROLL
+            else:
+                frame_priority = Priority.MOTION if moved else Priority.BUTTON
+            priority = frame_priority if priority is None else min(priority, frame_priority)
+
+        if keyboard or priority is None:
+            priority = Priority.KEYBOARD
+        return priority, buttons
+
+    def _queued_buttons(self) -> int:
+        """Button state once everything queued has been sent, as stored with the newest item"""
+        newest = None
+        for queue in self.queues:
+            try:
+                item = queue[-1]
+            except IndexError:
+                continue
+            if newest is None or item[0] > newest[0]:
+                newest = item
+        return self._buttons if newest is None else newest[2]
+
+    def push(self, data: bytes, priority: Priority | None = None) -> Priority:
+        """Queue a write, classifying it unless a priority is given"""
+        classified, buttons = self._classify(data, self._queued_buttons())
+        if priority is None:
+            priority = classified
+
+        # Items are (sequence number, data, button state once sent), so the frames of a
+        # write are only walked once, here
+        item = (next(self._seq), data, buttons)
+        if priority is Priority.MOTION and self._is_abs_move(data) and self._replace_move(item):
+            self.coalesced += 1
+        else:
+            self.queues[priority].append(item)
+        return priority
+
+    @staticmethod
+    def _is_abs_move(data: bytes) -> bool:
+        return len(data) == _ABS_FRAME_LENGTH and data[3] == _MOUSE_ABS
+
+    def _replace_move(self, item: tuple[int, bytes, int]) -> bool:
+        """Overwrite the newest queued absolute move, unless a button change follows it"""
+        button, motion = self.queues[Priority.BUTTON], self.queues[Priority.MOTION]
+        try:
+            seq, data, _ = motion[-1]
+            if not self._is_abs_move(data) or (button and button[-1][0] > seq):
+                return False
+            motion[-1] = item
+        except IndexError:
+            return False  # Queue emptied by the writer thread; append instead
+        return True
+
+    def pop(self) -> bytes | None:
+        """Remove and return the next write to send, or None if empty"""
+        item = self._pop()
+        if item is None:
+            return None
+        self._buttons = item[2]
+        return item[1]
+
+    def _pop(self) -> tuple[int, bytes, int] | None:
+        keyboard, button, _, motion = self.queues
+        try:
+            # Key reports and button changes are one class, in the order they were queued
+            if keyboard and not (button and button[0][0] < keyboard[0][0]):
+                return keyboard.popleft()
+
+            if button:
+                # Motion queued before a button change must reach the target first
+                if motion and motion[0][0] < button[0][0]:
+                    return motion.popleft()
+                return button.popleft()
+
+            for queue in self.queues[Priority.SCROLL :]:
+                if queue:
+                    return queue.popleft()
+        except IndexError:
+            pass  # Emptied by drop_oldest() on another thread
+        return None
+
+    def drop_oldest(self) -> bool:
+        """Discard the oldest write of the least important non-empty class"""
+        for queue in reversed(self.queues):
+            try:
+                queue.popleft()
+                return True
+            except IndexError:
+                continue
+        return False
+
+    def wait_time(self) -> float:
+        """Seconds until the bandwidth budget allows another write"""
+        if self.rate is None:
+            return 0.0
+
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        return 0.0 if self._tokens > 0 else -self._tokens / self.rate
+
+    def consume(self, nbytes: int) -> float:
+        """
+        Charge a write against the bandwidth budget
+
+        Returns:
+            Remaining budget in bytes (infinite without a baud rate)
+        """
+        if self.rate is None:
+            return float("inf")
+        self._tokens -= nbytes
+        return self._tokens
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+"""
+CH9329 simulator on a pseudo-terminal, for benchmarking and testing without hardware.
+
+Run `python -m kvm_serial.utils.simulator` and point control.py at the port it prints.
+"""
+
+import logging
+import os
+import select
+import termios
+import threading
+import time
+import tty
+from collections import deque
+from typing import NamedTuple
+
+from kvm_serial.utils.baudrate import (
+    CMD_GET_INFO,
+    CMD_GET_PARA_CFG,
+    CMD_RESET,
+    CMD_SET_PARA_CFG,
+    PARA_BAUD,
+    PARA_CFG_LENGTH,
+)
+from kvm_serial.utils.communication import CMD_KEYBOARD, CMD_MOUSE_ABS, CMD_MOUSE_REL
+from kvm_serial.utils.communication import FrameEncoder
+from kvm_serial.utils.replies import REPLY_ERROR, REPLY_OK, Frame, FrameParser
+from kvm_serial.utils.utils import scancode_to_ascii
+
+logger = logging.getLogger(__name__)
+
+HID_COMMANDS = (CMD_KEYBOARD[0], CMD_MOUSE_ABS[0], CMD_MOUSE_REL[0])
+
+STATUS_SUCCESS = 0x00
+STATUS_COMMAND_ERROR = 0xE3
+STATUS_CHECKSUM_ERROR = 0xE4
+STATUS_PARAMETER_ERROR = 0xE5
+
+
+class Report(NamedTuple):
+    time: float  # When the frame finished arriving (time.monotonic)
+    cmd: int
+    data: bytes
+
+
+class CH9329Simulator:
+    """
+    Emulate a CH9329 on the master side of a pty. The slave path (`port`) can be opened
+    with serial.Serial like a real device.
+
+    Incoming frames are checksum-validated and answered like the chip does. HID reports
+    (keyboard 0x02, mouse 0x04/0x05) are collected in `reports`. With timing enabled,
+    bytes are consumed at the configured baud rate, so a fast host blocks on a full pty
+    just as it would on a real UART. The chip's input buffer holds `buffer_frames` frames,
+    each taking `report_interval` seconds to forward over USB; frames arriving when the
+    buffer is full are dropped and counted as overruns.
+    """
+
+    def __init__(
+        self,
+        baud: int = 9600,
+        timing: bool = True,
+        buffer_frames: int = 16,
+        report_interval: float = 0.001,
+        check_baud: bool = False,
+        version: int = 0x30,
+    ):
+        """
+        :param baud: Baud rate the simulated chip uses
+        :param timing: Model wire time at the baud rate; False processes frames instantly
+        :param buffer_frames: Size of the chip's input buffer, in frames
+        :param report_interval: Seconds the chip takes to forward each HID report
+        :param check_baud: Ignore input while the host's port is set to a different rate
+        :param version: Chip version reported by GET_INFO
+        """
+        self.baud = baud
+        self.timing = timing
+        self.buffer_frames = buffer_frames
+        self.report_interval = report_interval
+        self.check_baud = check_baud
+        self.version = version
+
+        self.params = bytearray(PARA_CFG_LENGTH)
+        self.params[PARA_BAUD] = baud.to_bytes(4, "big")
+
+        self.reports: list[Report] = []
+        self.frames = 0
+        self.overruns = 0
+        self.garbled = 0
+
+        self.parser = FrameParser(on_checksum_error=self._on_checksum_error)
+        self.encoder = FrameEncoder()
+        self.port: str | None = None
+
+        self._master: int | None = None
+        self._slave: int | None = None
+        self._wire = 0.0
+        self._busy: deque[float] = deque()
+        self._received = threading.Condition()
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="CH9329Simulator", daemon=True)
+
+    def __enter__(self) -> "CH9329Simulator":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def checksum_errors(self) -> int:
+        return self.parser.checksum_errors
+
+    def start(self) -> str:
+        """Create the pty and start processing. Returns the device path to open"""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self.thread.start()
+        logger.info(f"CH9329 simulator listening on {self.port} at {self.baud} baud")
+        return self.port
+
+    def stop(self):
+        self._stop.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def wait_for(self, count: int, timeout: float = 5.0) -> bool:
+        """Wait until at least count HID reports have been received"""
+        with self._received:
+            return self._received.wait_for(lambda: len(self.reports) >= count, timeout)
+
+    def keyboard_reports(self) -> list[bytes]:
+        return [r.data for r in self.reports if r.cmd == CMD_KEYBOARD[0]]
+
+    def mouse_reports(self) -> list[Report]:
+        return [r for r in self.reports if r.cmd != CMD_KEYBOARD[0]]
+
+    def text(self, layout=None) -> str:
+        """
+        Reconstruct typed text from keyboard reports: each key newly down in a report
+        :param layout: KeyboardLayout or name the host decodes with (default: the default layout)
+        """
+        typed = []
+        held = ()
+        for report in self.keyboard_reports():
+            keys = tuple(key for key in report[2:] if key)
+            for key in keys:
+                if key not in held:
+                    char = scancode_to_ascii(bytes((report[0], 0, key)), layout=layout)
+                    if char is not None:
+                        typed.append(char)
+            held = keys
+        return "".join(typed)
+
+    def _host_baud_matches(self) -> bool:
+        expected = getattr(termios, f"B{self.baud}", None)
+        if expected is None:
+            return True
+        return termios.tcgetattr(self._slave)[4] == expected
+
+    def _run(self):
+        master = self._master
+        while not self._stop.is_set():
+            readable, _, _ = select.select([master], [], [], 0.05)
+            if not readable:
+                continue
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                break
+
+            now = time.monotonic()
+            if self.check_baud and not self._host_baud_matches():
+                self.garbled += len(data)
+                continue
+
+            # Bytes finish arriving one character time (10 bits) apart
+            byte_time = 10 / self.baud if self.timing else 0.0
+            self._wire = max(self._wire, now)
+            for frame in self.parser.feed(data):
+                self._wire += (6 + len(frame.data)) * byte_time
+                if self.timing:
+                    delay = self._wire - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                self._handle(frame, self._wire if self.timing else now)
+
+    def _handle(self, frame: Frame, arrived: float):
+        self.frames += 1
+        cmd = frame.cmd
+
+        if cmd in HID_COMMANDS:
+            # Model the chip's input buffer draining at one report per interval
+            busy = self._busy
+            while busy and busy[0] <= arrived:
+                busy.popleft()
+            if len(busy) >= self.buffer_frames:
+                self.overruns += 1
+                return
+            busy.append(max(arrived, busy[-1] if busy else arrived) + self.report_interval)
+
+            with self._received:
+                self.reports.append(Report(arrived, cmd, frame.data))
+                self._received.notify_all()
+            self._reply(cmd, bytes((STATUS_SUCCESS,)))
+
+        elif cmd == CMD_GET_INFO:
+            self._reply(cmd, bytes((self.version, 0x01, 0, 0, 0, 0, 0, 0)))
+
+        elif cmd == CMD_GET_PARA_CFG:
+            self._reply(cmd, bytes(self.params))
+
+        elif cmd == CMD_SET_PARA_CFG:
+            if len(frame.data) != PARA_CFG_LENGTH:
+                self._reply(cmd, bytes((STATUS_PARAMETER_ERROR,)), error=True)
+                return
+            self.params[:] = frame.data
+            self._reply(cmd, bytes((STATUS_SUCCESS,)))
+
+        elif cmd == CMD_RESET:
+            self._reply(cmd, bytes((STATUS_SUCCESS,)))
+            self.baud = int.from_bytes(self.params[PARA_BAUD], "big")
+            logger.info(f"CH9329 simulator reset: now at {self.baud} baud")
+
+        else:
+            self._reply(cmd, bytes((STATUS_COMMAND_ERROR,)), error=True)
+
+    def _on_checksum_error(self, cmd: int):
+        self._reply(cmd, bytes((STATUS_CHECKSUM_ERROR,)), error=True)
+
+    def _reply(self, cmd: int, data: bytes, error: bool = False):
+        reply = bytes(((cmd & 0x3F) | (REPLY_ERROR if error else REPLY_OK),))
+        os.write(self._master, self.encoder.encode(data, reply))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulate a CH9329 on a pseudo-terminal")
+    parser.add_argument("-b", "--baud", help="Simulated chip baud rate", default=9600, type=int)
+    parser.add_argument(
+        "--no-timing", help="Process frames instantly", dest="timing", action="store_false"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+
+    sim = CH9329Simulator(baud=args.baud, timing=args.timing, check_baud=True)
+    print(sim.start(), flush=True)
+    try:
+        seen = 0
+        while True:
+            sim.wait_for(seen + 1, timeout=1.0)
+            for report in sim.reports[seen:]:
+                logger.debug(f"0x{report.cmd:02x} {report.data.hex(' ')}")
+            seen = len(sim.reports)
+    except KeyboardInterrupt:
+        print(
+            f"\n{sim.frames} frames; {sim.overruns} overruns; {sim.checksum_errors} bad checksums"
+        )
+        print(f"Typed: {sim.text()!r}")
+    finally:
+        sim.stop()
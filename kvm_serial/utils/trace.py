@@ -0,0 +1,138 @@
+"""
+Event-to-wire latency tracing, written as Chrome trace-event JSON (chrome://tracing, or
+https://ui.perfetto.dev).
+
+Each input event is stamped where a backend receives it, then again as it passes through
+DataComm (serialised), the SerialWriter queue (queued) and the port write (written):
+
+    span = TRACER.begin("curses")   # in the backend, as the key arrives
+    ...                             # DataComm and SerialWriter stamp the current span
+
+The span being handled is kept per thread, so stamps need no extra arguments. Each
+backend gets its own track in the trace. Tracing is off unless TRACER.start() is called;
+until then every stamp is a single attribute check.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from itertools import count
+
+logger = logging.getLogger(__name__)
+
+# Spans drawn for each event: (name, from stamp, to stamp)
+STAGES = (
+    ("encode", "source", "serialised"),
+    ("queue", "queued", "write"),
+    ("write", "write", "written"),
+)
+
+
+class Span:
+    """Timestamps (perf_counter_ns) of one input event on its way to the port"""
+
+    __slots__ = ("id", "backend", "name", "stamps", "done")
+
+    def __init__(self, id: int, backend: str, name: str, now: int):
+        self.id = id
+        self.backend = backend
+        self.name = name
+        self.stamps = {"source": now}
+        self.done = False
+
+    def stamp(self, stage: str, now: int | None = None):
+        """Record a stage, keeping the first time it is reached"""
+        if stage not in self.stamps:
+            self.stamps[stage] = time.perf_counter_ns() if now is None else now
+
+
+class Tracer:
+    """Collects finished spans as trace events, for dump()"""
+
+    def __init__(self):
+        self.enabled = False
+        self.events: list[dict] = []
+        self._local = threading.local()
+        self._ids = count(1)
+        self._tracks: dict[str, int] = {}
+        self._origin = time.perf_counter_ns()
+
+    def start(self) -> "Tracer":
+        self.events.clear()
+        self._tracks.clear()
+        self._origin = time.perf_counter_ns()
+        self.enabled = True
+        return self
+
+    def stop(self):
+        self.enabled = False
+
+    def begin(self, backend: str, name: str = "key", now: int | None = None) -> Span | None:
+        """
+        Stamp an input event at its source, making it the current span of this thread
+        :param now: perf_counter_ns() when the event was captured (default: now)
+        """
+        if not self.enabled:
+            return None
+        span = Span(next(self._ids), backend, name, time.perf_counter_ns() if now is None else now)
+        self._local.span = span
+        return span
+
+    def current(self) -> Span | None:
+        """The span this thread is handling, unless it has already been written"""
+        if not self.enabled:
+            return None
+        span = getattr(self._local, "span", None)
+        return None if span is None or span.done else span
+
+    def finish(self, span: Span):
+        """Record a span whose first frame has been written. Later calls are ignored"""
+        if span.done:
+            return
+        span.done = True
+
+        stamps = span.stamps
+        track = self._tracks.get(span.backend)
+        if track is None:
+            track = self._tracks[span.backend] = len(self._tracks) + 1
+
+        def event(name: str, start: int, end: int, **args) -> dict:
+            return {
+                "name": name,
+                "cat": span.backend,
+                "ph": "X",
+                "ts": (start - self._origin) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": track,
+                "args": args,
+            }
+
+        end = stamps.get("written", stamps["source"])
+        events = [event(span.name, stamps["source"], end, id=span.id, backend=span.backend)]
+        for name, start_stage, end_stage in STAGES:
+            if start_stage in stamps and end_stage in stamps:
+                events.append(event(name, stamps[start_stage], stamps[end_stage], id=span.id))
+        self.events.extend(events)
+
+    def trace(self) -> dict:
+        """The trace, with a named track per backend"""
+        pid = os.getpid()
+        meta = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "kvm_serial"}},
+            *(
+                {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                for name, tid in self._tracks.items()
+            ),
+        ]
+        return {"traceEvents": meta + self.events, "displayTimeUnit": "ms"}
+
+    def dump(self, path: str | os.PathLike):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.trace(), f)
+        logger.info(f"Wrote {len(self.events)} trace events to {path}")
+
+
+TRACER = Tracer()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""
+Type a file into the target, streaming it from a memory map in bounded chunks.
+
+Run with `python -m kvm_serial type-file PORT FILE`. Ctrl+C stops after the current chunk
+and prints the byte offset reached, which can be passed back with --offset to resume.
+"""
+
+import logging
+import mmap
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Callable, NamedTuple
+
+from kvm_serial.utils.communication import DataComm
+
+logger = logging.getLogger(__name__)
+
+
+class Progress(NamedTuple):
+    offset: int  # Bytes of the file typed so far
+    total: int  # File size in bytes
+    elapsed: float  # Seconds spent typing, excluding pauses
+    chars: int  # Characters typed in this run
+
+    @property
+    def fraction(self) -> float:
+        return self.offset / self.total if self.total else 1.0
+
+    @property
+    def chars_per_sec(self) -> float:
+        return self.chars / self.elapsed if self.elapsed else 0.0
+
+
+class FileTyper:
+    """
+    Type the contents of a UTF-8 text file through a DataComm.
+
+    The file is memory-mapped and encoded `chunk_size` bytes at a time (split on character
+    boundaries), so memory use does not depend on the file size. After each chunk the port
+    is flushed, so `offset` only counts text that has actually been sent and can be used
+    to resume after an interruption. A DataComm with a rate controller types at the rate
+    the device's replies allow.
+    """
+
+    def __init__(
+        self,
+        comm: DataComm,
+        path: str | os.PathLike,
+        offset: int = 0,
+        chunk_size: int = 256,
+        layout=None,
+        minimal: bool = False,
+        progress: Callable[[Progress], None] | None = None,
+    ):
+        """
+        :param comm: DataComm to send with
+        :param path: File to type
+        :param offset: Byte offset to start from (e.g. to resume)
+        :param chunk_size: Bytes of the file encoded and sent per chunk
+        :param layout: KeyboardLayout or layout name (default: the default layout)
+        :param minimal: Send the shortest report sequence (see utils.optimise_scancodes)
+        :param progress: Called with a Progress after each chunk
+        """
+        self.comm = comm
+        self.path = path
+        self.offset = offset
+        self.chunk_size = chunk_size
+        self.layout = layout
+        self.minimal = minimal
+        self.progress = progress
+
+        self.total = os.path.getsize(path)
+        self.chars = 0
+        self.elapsed = 0.0
+
+        self._running = threading.Event()
+        self._running.set()
+        self._stopped = False
+
+    def pause(self):
+        """Stop sending after the current chunk, until resume()"""
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def stop(self):
+        """Stop after the current chunk; run() returns the offset reached"""
+        self._stopped = True
+        self._running.set()
+
+    def status(self) -> Progress:
+        return Progress(self.offset, self.total, self.elapsed, self.chars)
+
+    def run(self) -> int:
+        """
+        Type the file from the current offset to the end (or until stopped)
+
+        Returns:
+            The byte offset reached
+        """
+        if self.offset >= self.total:
+            return self.offset
+
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            while self.offset < self.total:
+                self._running.wait()
+                if self._stopped:
+                    break
+
+                start = time.monotonic()
+                end = min(self.offset + self.chunk_size, self.total)
+                # Do not split a multi-byte UTF-8 character across chunks
+                while self.total > end > self.offset + 1 and mm[end] & 0xC0 == 0x80:
+                    end -= 1
+
+                text = mm[self.offset : end].decode("utf-8", errors="replace")
+                if self.comm.send_text(text, self.layout, minimal=self.minimal):
+                    self.comm.port.flush()
+
+                self.offset = end
+                self.chars += len(text)
+                self.elapsed += time.monotonic() - start
+                if self.progress is not None:
+                    self.progress(self.status())
+
+        return self.offset
+
+
+def type_file(comm: DataComm, path: str | os.PathLike, **kwargs) -> int:
+    """Type a file through comm (see FileTyper for arguments), returning the offset reached"""
+    return FileTyper(comm, path, **kwargs).run()
+
+
+def _print_progress(progress: Progress):
+    print(
+        f"\r{progress.offset}/{progress.total} bytes ({progress.fraction:.1%}), "
+        f"{progress.chars_per_sec:.0f} chars/s",
+        end="",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def main(argv: list[str] | None = None):
+    import argparse
+
+    from serial import Serial
+
+    from kvm_serial.utils.flowcontrol import RateController, link_frame_rate
+    from kvm_serial.utils.replies import ReplyReader, ReplyTracker
+    from kvm_serial.utils.writer import SerialWriter
+
+    parser = argparse.ArgumentParser(
+        prog="python -m kvm_serial type-file", description="Type a text file into the target"
+    )
+    parser.add_argument("port", help="Serial port of the CH9329")
+    parser.add_argument("file", help="UTF-8 text file to type")
+    parser.add_argument("-b", "--baud", help="Serial baud rate", default=9600, type=int)
+    parser.add_argument("-o", "--offset", help="Byte offset to resume from", default=0, type=int)
+    parser.add_argument("--chunk", help="Bytes encoded per chunk", default=256, type=int)
+    parser.add_argument("-l", "--layout", help="Target keyboard layout", default="uk")
+    parser.add_argument("--minimal", help="Send the shortest report sequence", action="store_true")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+
+    # Type as fast as the CH9329's replies show it keeps up, up to the link's frame rate
+    serial = Serial(args.port, args.baud)
+    writer = SerialWriter(serial, baud=args.baud).start()
+    tracker = ReplyTracker(byte_time=10 / args.baud).attach(writer)
+    replies = ReplyReader(serial, tracker).start()
+    link_rate = link_frame_rate(args.baud)
+    rate = RateController(tracker, initial=link_rate / 2, maximum=link_rate)
+
+    typer = FileTyper(
+        DataComm(writer, rate),
+        args.file,
+        offset=args.offset,
+        chunk_size=args.chunk,
+        layout=args.layout,
+        minimal=args.minimal,
+        progress=_print_progress,
+    )
+
+    # First Ctrl+C finishes the current chunk, so the offset is exact; a second one aborts
+    def interrupt(sig, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        typer.stop()
+
+    signal.signal(signal.SIGINT, interrupt)
+    try:
+        typer.run()
+    finally:
+        writer.stop()
+        replies.stop()
+        serial.close()
+        print(file=sys.stderr)
+
+    if typer.offset < typer.total:
+        logger.warning(f"Stopped: resume with --offset {typer.offset}")
+    else:
+        logger.info(f"Typed {typer.chars} characters in {typer.elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,18 @@ Utilities for character code conversion
 
 from array import array
 
+from kvm_serial.utils import layout as _layout
+from kvm_serial.utils.layout import KeyboardLayout
 
-def scancode_to_ascii(scancode, raise_err: bool = False):
+
+def scancode_to_ascii(
+    scancode, raise_err: bool = False, layout: KeyboardLayout | str | None = None
+):
     """
     Convert a keyboard scancode to its ASCII representation
     :param scancode:
     :param raise_err: Raise KeyError instead of returning None if mapping failse
+    :param layout: Keyboard layout, or its name, to decode with (default: the default layout)
     :return: mapping to ASCII
     """
     key = 0
@@ -22,84 +28,21 @@ def scancode_to_ascii(scancode, raise_err: bool = False):
             break
         index += 1
 
-    # This function is customised to UK-ISO keyboard layout. ANSI scancodes have differences.
-    # fmt: off
-    hid_to_ascii_mapping = {
-        0x04: 'a', 0x05: 'b', 0x06: 'c', 0x07: 'd', 0x08: 'e', 0x09: 'f', 0x0a: 'g', 0x0b: 'h',
-        0x0c: 'i', 0x0d: 'j', 0x0e: 'k', 0x0f: 'l', 0x10: 'm', 0x11: 'n', 0x12: 'o', 0x13: 'p',
-        0x14: 'q', 0x15: 'r', 0x16: 's', 0x17: 't', 0x18: 'u', 0x19: 'v', 0x1a: 'w', 0x1b: 'x',
-        0x1c: 'y', 0x1d: 'z', 0x1E: '1', 0x1F: '2', 0x20: '3', 0x21: '4', 0x22: '5', 0x23: '6',
-        0x24: '7', 0x25: '8', 0x26: '9', 0x27: '0', 0x2D: '-', 0x2E: '=', 0x2F: '[', 0x30: ']',
-        0x31: '#', 0x32: '#', 0x33: ';', 0x34: "'", 0x35: '`', 0x36: ',', 0x37: '.', 0x38: '/',
-        0x39: 'CAPSLOCK', 0x29: 'ESC', 0x4f: '→', 0x50: '←', 0x51: '↓', 0x52: '↑',
-        0x49: 'Ins', 0x4a: 'Home', 0x4b: 'PgUp', 0x4c: 'Del', 0x4d: 'End', 0x4e: 'PgDn',
-        0x28: '\n', 0x2C: ' ', 0x2B: '\t', 0x2a: '\b', 0x64: '\\',
-    }
-
-    # Overwrite dict values for shift-modified keys. Note: must deep-copy dict!
-    modifier_ascii_mapping = hid_to_ascii_mapping.copy()
-    modifier_ascii_mapping.update({
-        0x04: 'A', 0x05: 'B', 0x06: 'C', 0x07: 'D', 0x08: 'E', 0x09: 'F', 0x0A: 'G', 0x0B: 'H',
-        0x0C: 'I', 0x0D: 'J', 0x0E: 'K', 0x0F: 'L', 0x10: 'M', 0x11: 'N', 0x12: 'O', 0x13: 'P',
-        0x14: 'Q', 0x15: 'R', 0x16: 'S', 0x17: 'T', 0x18: 'U', 0x19: 'V', 0x1A: 'W', 0x1B: 'X',
-        0x1C: 'Y', 0x1D: 'Z', 0x1E: '!', 0x1F: '"', 0x20: '#', 0x21: '$', 0x22: '%', 0x23: '^',
-        0x24: '&', 0x25: '*', 0x26: '(', 0x27: ')', 0x2D: '_', 0x2E: '+', 0x2F: '{', 0x30: '}',
-        0x31: '~', 0x32: '~', 0x33: ':', 0x34: '@', 0x35: '¬', 0x36: '<', 0x37: '>', 0x38: '?',
-        0x64: '|'
-    })
-    # fmt: on
-
-    try:
-        if scancode[0] & 0x22 or scancode[0] & 0x22:  # LShift 0x2 or RShift 0x20 held
-            return modifier_ascii_mapping[key]
-        return hid_to_ascii_mapping[key]
-    except KeyError as e:
-        if not raise_err:
-            return None
-        raise e
-
-
-def ascii_to_scancode(ascii_char):
+    char = _layout.get_layout(layout).decode(scancode[0], key)
+    if char is None and raise_err:
+        raise KeyError(key)
+    return char
+
+
+def ascii_to_scancode(ascii_char, layout: KeyboardLayout | str | None = None):
     """
     Convert an ASCII character to a scancode
     :param ascii_char:
+    :param layout: Keyboard layout, or its name, to encode with (default: the default layout)
     :return: scancode (bytes array)
     """
-    # No modifier (L/RShift) held
-    # fmt: off
-    ascii_to_hid_mapping = {
-        'a': 0x04, 'b': 0x05, 'c': 0x06, 'd': 0x07, 'e': 0x08, 'f': 0x09, 'g': 0x0a,
-        'h': 0x0b, 'i': 0x0c, 'j': 0x0d, 'k': 0x0e, 'l': 0x0f, 'm': 0x10, 'n': 0x11,
-        'o': 0x12, 'p': 0x13, 'q': 0x14, 'r': 0x15, 's': 0x16, 't': 0x17, 'u': 0x18,
-        'v': 0x19, 'w': 0x1a, 'x': 0x1b, 'y': 0x1c, 'z': 0x1d, '1': 0x1e, '2': 0x1f,
-        '3': 0x20, '4': 0x21, '5': 0x22, '6': 0x23, '7': 0x24, '8': 0x25, '9': 0x26,
-        '0': 0x27, '-': 0x2d, '=': 0x2e, '[': 0x2f, ']': 0x30, '#': 0x32, ';': 0x33,
-        "'": 0x34, '`': 0x35, ',': 0x36, '.': 0x37, '/': 0x38, '\\': 0x64,
-        # Paragraph control characters
-        '\n': 0x28, '\t': 0x2b, '\b': 0x2a, ' ': 0x2c,
-    }
-
-    # With modifier (still same scancode for char)
-    ascii_to_modifier = {
-        'A': 0x04, 'B': 0x05, 'C': 0x06, 'D': 0x07, 'E': 0x08, 'F': 0x09, 'G': 0x0a,
-        'H': 0x0b, 'I': 0x0c, 'J': 0x0d, 'K': 0x0e, 'L': 0x0f, 'M': 0x10, 'N': 0x11,
-        'O': 0x12, 'P': 0x13, 'Q': 0x14, 'R': 0x15, 'S': 0x16, 'T': 0x17, 'U': 0x18,
-        'V': 0x19, 'W': 0x1a, 'X': 0x1b, 'Y': 0x1c, 'Z': 0x1d, '!': 0x1e, '"': 0x1f,
-        '£': 0x20, '$': 0x21, '%': 0x22, '^': 0x23, '&': 0x24, '*': 0x25, '(': 0x26,
-        ')': 0x27, '_': 0x2d, '+': 0x2e, '{': 0x2f, '}': 0x30, '~': 0x32, ':': 0x33,
-        '@': 0x34, '¬': 0x35, '<': 0x36, '>': 0x37, '?': 0x38, '|': 0x64,
-    }
-    # fmt: on
-
-    try:
-        return build_scancode(ascii_to_hid_mapping[ascii_char])
-    except KeyError:
-        pass
-
-    try:
-        return build_scancode(ascii_to_modifier[ascii_char], 0x2)
-    except KeyError:
-        return build_scancode(0x0)
+    report = _layout.get_layout(layout).encode(ascii_char)
+    return array("B", report or _layout.NO_KEY)
 
 
 def build_scancode(byte, modifier=0x0):
@@ -150,9 +93,12 @@ def merge_scancodes(byte_arrays, max_packet_size=8):
     return retval
 
 
-def string_to_scancodes(input_string, key_repeat: int = 1, key_up: int = 0):
+def string_to_scancodes(
+    input_string, key_repeat: int = 1, key_up: int = 0, layout: KeyboardLayout | str | None = None
+):
     """
     Convert a string into a list of scancodes, as if typed
+    :param layout: Keyboard layout, or its name, to encode with (default: the default layout)
     :param key_repeat: Keyboard keys repeat when held down. Emulate this functionality using param.
     :param key_up: Number of key up signals to insert as scancodes
     :param input_string: The input string to create
@@ -165,8 +111,9 @@ def string_to_scancodes(input_string, key_repeat: int = 1, key_up: int = 0):
         raise ValueError("key_repeat and key_up should be non-negative integers.")
 
     # Create list of scancodes from string
+    layout = _layout.get_layout(layout)
     for char in input_string:
-        scancodes.append(ascii_to_scancode(char))
+        scancodes.append(ascii_to_scancode(char, layout))
 
     # Duplicate scancodes by the key_repeat parameter
     if key_repeat > 1:
@@ -183,3 +130,63 @@ def string_to_scancodes(input_string, key_repeat: int = 1, key_up: int = 0):
         scancodes = new_scancodes
 
     return scancodes
+
+
+def optimise_scancodes(input_string, rollover: int = 1, layout: KeyboardLayout | str | None = None):
+    """
+    Convert a string into the shortest sequence of scancodes which types it.
+
+    Compared to string_to_scancodes(input_string, key_up=1):
+      - Shift (or AltGr) stays held across runs of characters needing it
+      - Each key goes straight to the next, with no empty report in between. A release is
+        only inserted when the same key is pressed again
+      - With rollover > 1, up to that many new keys are pressed in one report. Hosts register
+        them in slot order; keep rollover at 1 for hosts which do not
+    The sequence ends with a full release. Characters the layout cannot type are skipped.
+
+    :param input_string: The input string to type
+    :param rollover: Maximum new keys pressed per report (1-6)
+    :param layout: Keyboard layout, or its name, to encode with (default: the default layout)
+    :return: A list of keyboard scancodes (byte arrays)
+    """
+    if not 1 <= rollover <= 6:
+        raise ValueError("rollover must be between 1 and 6")
+
+    layout = _layout.get_layout(layout)
+    keys = []
+    for char in input_string:
+        report = layout.encode(char)
+        if report is not None:
+            keys.append((report[0], report[2]))
+
+    scancodes = []
+    held = ()
+    i = 0
+    while i < len(keys):
+        modifier, key = keys[i]
+
+        # The same key cannot be pressed again without first being released
+        if key in held:
+            scancodes.append(build_scancode(0x0, modifier))
+            held = ()
+
+        pressed = [key]
+        i += 1
+        while (
+            len(pressed) < rollover
+            and i < len(keys)
+            and keys[i][0] == modifier
+            and keys[i][1] not in pressed
+            and keys[i][1] not in held
+        ):
+            pressed.append(keys[i][1])
+            i += 1
+
+        scancode = build_scancode(0x0, modifier)
+        scancode[2 : 2 + len(pressed)] = array("B", pressed)
+        scancodes.append(scancode)
+        held = pressed
+
+    if scancodes:
+        scancodes.append(build_scancode(0x0))
+    return scancodes
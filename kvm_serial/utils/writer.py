@@ -0,0 +1,279 @@
+"""
+Single-writer serial output: one thread owns the port, input callbacks only enqueue frames
+"""
+
+import logging
+import threading
+import time
+from enum import Enum
+from typing import Callable
+
+from serial import Serial
+
+from kvm_serial.utils.metrics import REGISTRY, Registry
+from kvm_serial.utils.scheduler import FrameScheduler
+from kvm_serial.utils.trace import TRACER, Span
+
+logger = logging.getLogger(__name__)
+
+
+class Backpressure(Enum):
+    BLOCK = 0  # Producer waits for space in the queue
+    DROP_NEWEST = 1  # Frame being written is discarded
+    DROP_OLDEST = 2  # Oldest queued frame is discarded to make room
+
+
+class SerialWriter:
+    """
+    Serialise all writes to a serial port through one thread.
+
+    Exposes the write()/flush()/close() subset of Serial, so it can be passed anywhere a
+    port is expected (e.g. DataComm). Each write() is queued whole and written whole,
+    so frames from different producer threads can never interleave.
+
+    Writes are queued in a FrameScheduler, so keyboard reports overtake pending mouse
+    motion. Given a baud rate, writes are released at the link's rate so that the
+    scheduler, not the OS buffer, decides what goes next.
+
+    The producer path is a deque append plus an Event set; deque append/popleft are
+    atomic, so no lock is taken per frame. Counters are updated without a lock and
+    may be slightly off under contention; they are intended as metrics only.
+    """
+
+    def __init__(
+        self,
+        port: Serial,
+        maxsize: int = 256,
+        policy: Backpressure | str = Backpressure.BLOCK,
+        timeout: float | None = None,
+        baud: int | None = None,
+    ):
+        """
+        :param port: Serial port to own
+        :param maxsize: Maximum number of queued writes
+        :param policy: What to do when the queue is full
+        :param timeout: Maximum seconds to block under Backpressure.BLOCK before dropping
+        :param baud: Link baud rate used to pace writes, or None to write as fast as possible
+        """
+        if isinstance(policy, str):
+            policy = Backpressure[policy.upper()]
+
+        self.port = port
+        self.maxsize = maxsize
+        self.policy = policy
+        self.timeout = timeout
+
+        self.scheduler = FrameScheduler(baud)
+        self._ready = threading.Event()
+        self._space = threading.Event()
+        self._idle = threading.Condition()
+        self._busy = False
+
+        # Traced spans by id() of their queued write (see kvm_serial.utils.trace)
+        self._spans: dict[int, Span] = {}
+
+        # Called with each completed write, e.g. ReplyTracker.sent
+        self.on_write: Callable[[bytes], None] | None = None
+
+        # Metrics (see also register_metrics)
+        self._write_seconds = REGISTRY.histogram(
+            "kvm_writer_port_write_seconds", "Time taken by each write to the port"
+        )
+        self.enqueued = 0
+        self.written = 0
+        self.bytes_written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+
+        self.running = False
+        self.thread = threading.Thread(target=self._run, name="SerialWriter", daemon=True)
+
+    @property
+    def depth(self) -> int:
+        """Number of writes currently waiting in the queue"""
+        return len(self.scheduler)
+
+    def stats(self) -> dict:
+        """Snapshot of queue metrics"""
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "bytes_written": self.bytes_written,
+            "dropped": self.dropped,
+            "coalesced": self.scheduler.coalesced,
+            "errors": self.errors,
+        }
+
+    def register_metrics(self, registry: Registry = REGISTRY):
+        """Export this writer's queue metrics, read from its counters when scraped"""
+        for name, help in (
+            ("enqueued", "Writes queued"),
+            ("written", "Writes sent to the port"),
+            ("bytes_written", "Bytes written to the port"),
+            ("dropped", "Writes dropped because the queue was full"),
+            ("errors", "Failed port writes"),
+        ):
+            registry.counter(
+                f"kvm_writer_{name}_total", help, function=lambda name=name: getattr(self, name)
+            )
+        registry.counter(
+            "kvm_writer_coalesced_total",
+            "Pending absolute mouse moves replaced by newer ones",
+            function=lambda: self.scheduler.coalesced,
+        )
+        registry.gauge(
+            "kvm_writer_queue_depth", "Writes waiting in the queue", function=lambda: self.depth
+        )
+        registry.gauge(
+            "kvm_writer_queue_max_depth",
+            "Deepest the queue has been",
+            function=lambda: self.max_depth,
+        )
+
+    def start(self) -> "SerialWriter":
+        self.register_metrics()
+        self.running = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop the writer thread after writing whatever is already queued"""
+        self.running = False
+        self._ready.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        logger.debug(f"SerialWriter stopped: {self.stats()}")
+
+    def close(self):
+        self.stop()
+        self.port.close()
+
+    def write(self, data: bytes) -> int:
+        """
+        Queue data for writing. Returns immediately unless the queue is full and the
+        policy is Backpressure.BLOCK.
+
+        Returns:
+            Number of bytes queued (0 if dropped)
+        """
+        scheduler = self.scheduler
+
+        if len(scheduler) >= self.maxsize:
+            if self.policy is Backpressure.DROP_NEWEST:
+                self.dropped += 1
+                return 0
+            elif self.policy is Backpressure.DROP_OLDEST:
+                if scheduler.drop_oldest():
+                    self.dropped += 1
+            elif not self._wait_for_space():
+                self.dropped += 1
+                return 0
+
+        item = bytes(data)
+        span = TRACER.current()
+        if span is not None and "queued" not in span.stamps:
+            span.stamp("queued")
+            if len(self._spans) > self.maxsize * 4:
+                self._spans.clear()  # Spans of writes dropped or coalesced away
+            if id(item) in self._spans:
+                item = bytes(bytearray(item))  # Cached frames are shared: queue a copy
+            self._spans[id(item)] = span
+
+        scheduler.push(item)
+        self.enqueued += 1
+        depth = len(scheduler)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        self._ready.set()
+        return len(data)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Block until everything queued so far has been written to the port
+
+        Returns:
+            False if the timeout expired first, or the writer thread is not running so
+            queued writes will not be written
+        """
+        thread = self.thread
+        if not thread.is_alive():
+            return not self.scheduler
+
+        with self._idle:
+            self._idle.wait_for(
+                lambda: (not self.scheduler and not self._busy) or not thread.is_alive(), timeout
+            )
+            return not self.scheduler and not self._busy
+
+    def _wait_for_space(self) -> bool:
+        while len(self.scheduler) >= self.maxsize:
+            if not self.running or not self.thread.is_alive():
+                return False  # Nothing will make space
+            self._space.clear()
+            if len(self.scheduler) < self.maxsize:
+                break
+            if not self._space.wait(self.timeout) or not self.running:
+                return False
+        return True
+
+    def _run(self):
+        scheduler = self.scheduler
+        while True:
+            self._ready.wait()
+            self._ready.clear()
+
+            while scheduler:
+                self._busy = True
+
+                # Wait for bandwidth before choosing, so the freshest urgent frame wins
+                wait = scheduler.wait_time()
+                if wait > 0:
+                    time.sleep(wait)
+                    continue
+
+                # Coalesce pending writes into one, for as long as the budget allows
+                chunks = []
+                while (chunk := scheduler.pop()) is not None:
+                    chunks.append(chunk)
+                    if scheduler.consume(len(chunk)) <= 0:
+                        break
+                self._space.set()
+                if not chunks:
+                    continue
+
+                spans = self._spans and [
+                    span for chunk in chunks if (span := self._spans.pop(id(chunk), None))
+                ]
+
+                data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+                try:
+                    started = time.perf_counter_ns()
+                    self.port.write(data)
+                    finished = time.perf_counter_ns()
+                    self._write_seconds.observe((finished - started) / 1e9)
+                    for span in spans or ():
+                        span.stamp("write", started)
+                        span.stamp("written", finished)
+                        TRACER.finish(span)
+                    self.written += len(chunks)
+                    self.bytes_written += len(data)
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Serial write failed: {e}")
+                    continue
+
+                if self.on_write is not None:
+                    try:
+                        self.on_write(data)
+                    except Exception as e:
+                        logger.exception(f"on_write callback failed: {e}")
+
+            with self._idle:
+                self._busy = False
+                self._idle.notify_all()
+
+            if not self.running and not scheduler:
+                break
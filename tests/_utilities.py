@@ -22,3 +22,15 @@ class MockSerial:
 @fixture
 def mock_serial():
     return MockSerial()
+
+
+@fixture
+def ch9329_simulator():
+    """
+    CH9329 simulated on a pty, without baud-rate timing (so with a buffer large enough never
+    to overrun). Open its `port` with Serial
+    """
+    from kvm_serial.utils.simulator import CH9329Simulator
+
+    with CH9329Simulator(baud=9600, timing=False, buffer_frames=65536) as simulator:
+        yield simulator
@@ -26,13 +26,26 @@ class MockTerminal:
 
 
 class TestCursesOperation:
+    def test_function_key_codes(self):
+        """F1-F12 are HID usage codes 0x3A-0x45, as in pynput mode"""
+        assert [MODIFIER_CODES[f"KEY_F({n})"] for n in range(1, 13)] == list(range(0x3A, 0x46))
+
     @patch("serial.Serial", MockSerial)
     @patch("kvm_serial.backend.implementations.cursesop.curses.wrapper")
-    def test_cursesop_instantiation(self, mock_curses, mock_serial):
+    @patch("kvm_serial.backend.implementations.cursesop.sys.stdin")
+    def test_cursesop_instantiation(self, mock_stdin, mock_curses, mock_serial):
+        import os
+
         op = CursesOp(mock_serial)
         assert op.name == "curses"
         mock_curses.return_value = True
-        op.run()
+        read_fd, write_fd = os.pipe()
+        mock_stdin.fileno.return_value = read_fd
+        try:
+            op.run()
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
 
     @patch("serial.Serial", MockSerial)
     @patch("kvm_serial.backend.implementations.cursesop.curses.raw")
@@ -50,3 +63,120 @@ class TestCursesOperation:
         assert term.clear.called
         assert term.keypad.called
         assert term.addstr.called
+
+    @patch("serial.Serial", MockSerial)
+    def test_cursesop_waits_for_input(self, mock_serial):
+        """With no input pending, the loop waits on stdin instead of sleeping"""
+        op = CursesOp(mock_serial)
+        term = MockTerminal()
+
+        with patch.object(CursesOp, "_wait_for_input") as mock_wait:
+            with patch("kvm_serial.backend.implementations.cursesop.curses.napms") as mock_napms:
+                assert op._parse_key(term)
+        mock_wait.assert_called_once()
+        mock_napms.assert_not_called()
+
+    @patch("serial.Serial", MockSerial)
+    def test_cursesop_wakes(self, mock_serial):
+        """A waiting loop wakes when input arrives, and when stopped"""
+        import os
+        import threading
+
+        op = CursesOp(mock_serial)
+        read_fd, write_fd = os.pipe()
+        stdin = MagicMock()
+        stdin.fileno.return_value = read_fd
+
+        with patch("kvm_serial.backend.implementations.cursesop.sys.stdin", stdin):
+            try:
+                os.write(write_fd, b"a")
+                op._wait_for_input(timeout=5)
+                os.read(read_fd, 1)
+
+                waiter = threading.Thread(target=op._wait_for_input, kwargs={"timeout": 5})
+                waiter.start()
+                op.stop()
+                waiter.join(timeout=1)
+                assert not waiter.is_alive()
+                assert not op.running
+            finally:
+                op.cleanup()
+                os.close(read_fd)
+                os.close(write_fd)
+
+    @patch("serial.Serial", MockSerial)
+    @patch("kvm_serial.backend.implementations.cursesop.curses.raw")
+    def test_cursesop_stop_before_idle(self, mock_raw, mock_serial):
+        """stop() called before the loop first waits still wakes it"""
+        import os
+        import threading
+
+        op = CursesOp(mock_serial)
+        term = MockTerminal()
+
+        def getkey():
+            op.stop()  # Between the loop's running check and its wait
+            raise curses.error("no input")
+
+        term.getkey = getkey
+        read_fd, write_fd = os.pipe()
+        stdin = MagicMock()
+        stdin.fileno.return_value = read_fd
+
+        with patch("kvm_serial.backend.implementations.cursesop.sys.stdin", stdin):
+            with patch(
+                "kvm_serial.backend.implementations.cursesop.curses.wrapper",
+                side_effect=lambda loop: loop(term),
+            ):
+                runner = threading.Thread(target=op.run, daemon=True)
+                runner.start()
+                runner.join(timeout=5)
+        try:
+            assert not runner.is_alive()
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+
+    @patch("serial.Serial", MockSerial)
+    @patch("kvm_serial.backend.implementations.cursesop.curses.ungetch")
+    def test_cursesop_paste(self, mock_ungetch, mock_serial):
+        """A bracketed paste is collected and sent in bulk, instead of exiting on ESC"""
+        from kvm_serial.utils.paste import PASTE_END, PASTE_START
+
+        op = CursesOp(mock_serial)
+        term = MockTerminal()
+        term.getyx = MagicMock(return_value=(0, 0))
+        term.move = term.clrtoeol = term.refresh = MagicMock()
+        term.getch = MagicMock(side_effect=[ord(c) for c in PASTE_START[1:]] + [-1])
+        term.set_keys(["\x1b", *f"pasted{PASTE_END}"])
+
+        with patch("kvm_serial.backend.implementations.cursesop.send_paste") as mock_paste:
+            mock_paste.return_value = 6
+            assert op._parse_key(term)
+        assert mock_paste.call_args.args[1] == "pasted"
+        mock_ungetch.assert_not_called()
+
+    @patch("serial.Serial", MockSerial)
+    def test_cursesop_paste_marker_split(self, mock_serial):
+        """A paste marker arriving in pieces is waited for rather than taken as ESC"""
+        from kvm_serial.utils.paste import ESC_TIMEOUT, PASTE_START
+
+        op = CursesOp(mock_serial)
+        term = MockTerminal()
+        term.getch = MagicMock(side_effect=[ord("["), -1, *[ord(c) for c in PASTE_START[2:]]])
+
+        with patch.object(CursesOp, "_wait_for_input") as mock_wait:
+            assert op._paste_started(term)
+        mock_wait.assert_called_once_with(ESC_TIMEOUT)
+
+    @patch("serial.Serial", MockSerial)
+    @patch("kvm_serial.backend.implementations.cursesop.curses.ungetch")
+    def test_cursesop_escape(self, mock_ungetch, mock_serial):
+        """ESC without a paste marker still exits, and read-ahead keys are put back"""
+        op = CursesOp(mock_serial)
+        term = MockTerminal()
+        term.getch = MagicMock(side_effect=[ord("["), ord("A")])
+        term.set_keys(["\x1b"])
+
+        assert not op._parse_key(term)
+        assert [c.args[0] for c in mock_ungetch.call_args_list] == [ord("A"), ord("[")]
@@ -14,3 +14,49 @@ class TestPynputOperation:
         """Test that the name property returns 'pynput'"""
         op = PynputOp(mock_serial)
         assert op.name == "pynput"
+
+
+SHIFT = object()  # Stand-in modifier key, as pynput's Key members may be aliased in tests
+
+
+@patch.dict("kvm_serial.backend.implementations.pynputop.MODIFIER_TO_VALUE", {SHIFT: 0x02})
+class TestPynputReports:
+    """Reports sent for sequences of pynput events"""
+
+    def sent(self, op):
+        return [c.args[0] for c in op.hid_serial_out.send_scancode.call_args_list]
+
+    @patch("serial.Serial", MockSerial)
+    def test_chorded_typing(self, mock_serial):
+        """Held Shift stays in the report while other keys are released"""
+        from pynput.keyboard import KeyCode
+
+        op = PynputOp(mock_serial)
+        op.hid_serial_out = MagicMock()
+        op.on_press(SHIFT)
+        op.on_press(KeyCode.from_char("A"))
+        op.on_press(KeyCode.from_char("A"))  # Auto-repeat
+        op.on_release(KeyCode.from_char("A"))
+        op.on_press(KeyCode.from_char("B"))
+        op.on_release(KeyCode.from_char("B"))
+        op.on_release(SHIFT)
+
+        assert self.sent(op) == [
+            bytes((0x02, 0, 0, 0, 0, 0, 0, 0)),
+            bytes((0x02, 0, 0x04, 0, 0, 0, 0, 0)),
+            bytes((0x02, 0, 0, 0, 0, 0, 0, 0)),
+            bytes((0x02, 0, 0x05, 0, 0, 0, 0, 0)),
+            bytes((0x02, 0, 0, 0, 0, 0, 0, 0)),
+            bytes(8),
+        ]
+
+    @patch("serial.Serial", MockSerial)
+    def test_release_matches_press(self, mock_serial):
+        """A key released as a different character releases the code it pressed"""
+        from pynput.keyboard import KeyCode
+
+        op = PynputOp(mock_serial)
+        op.hid_serial_out = MagicMock()
+        op.on_press(KeyCode.from_vk(0x31, char="1"))
+        op.on_release(KeyCode.from_vk(0x31, char="!"))
+        assert self.sent(op) == [bytes((0, 0, 0x1E, 0, 0, 0, 0, 0)), bytes(8)]
@@ -1,8 +1,36 @@
-from unittest.mock import patch
-from kvm_serial.backend.implementations.pyusb import PyUSBOp, get_usb_endpoints
+import queue
+import threading
+from array import array
+from unittest.mock import MagicMock, patch
+
+import pytest
+import usb.core
+
+from kvm_serial.backend.implementations.pyusb import PyUSBOp, USBCapture, get_usb_endpoints
 from tests._utilities import MockSerial, mock_serial
 
 
+class MockEndpoint:
+    """Interrupt IN endpoint which returns queued reports, and times out when there are none"""
+
+    wMaxPacketSize = 8
+
+    def __init__(self):
+        self.reports = queue.SimpleQueue()
+        self.buffers = set()
+
+    def read(self, buffer, timeout=None):
+        self.buffers.add(id(buffer))
+        try:
+            report = self.reports.get(timeout=timeout / 1000)
+        except queue.Empty:
+            raise usb.core.USBTimeoutError("Operation timed out", errno=110)
+        if isinstance(report, Exception):
+            raise report
+        buffer[: len(report)] = array("B", report)
+        return len(report)
+
+
 class TestPyUSBOperation:
     @patch("serial.Serial", MockSerial)
     @patch("kvm_serial.backend.implementations.pyusb.get_usb_endpoints", return_value={})
@@ -10,3 +38,136 @@ class TestPyUSBOperation:
         """Test that the name property returns 'usb'"""
         op = PyUSBOp(mock_serial)
         assert op.name == "usb"
+
+    @patch("serial.Serial", MockSerial)
+    @patch("kvm_serial.backend.implementations.pyusb.get_usb_endpoints", return_value={})
+    def test_parse_key_forwards_reports_until_ctrl_esc(self, mock_serial):
+        """Reports are sent as read; Ctrl+ESC and the end of capture stop the loop"""
+        op = PyUSBOp(mock_serial)
+        op.hid_serial_out = MagicMock()
+        op.debounce = None
+        report = bytes([0, 0, 0x04, 0, 0, 0, 0, 0])
+
+        assert op._parse_key(report)
+        op.hid_serial_out.send_scancode.assert_called_once_with(report)
+        assert not op._parse_key(bytes([1, 0, 0x29, 0, 0, 0, 0, 0]))
+        assert not op._parse_key(b"")
+        assert op.hid_serial_out.send_scancode.call_count == 1
+
+
+class TestUSBCapture:
+    def test_reports_reuse_preallocated_buffers(self):
+        """Every read fills one of the pooled buffers, in order, with no allocation per read"""
+        endpoint = MockEndpoint()
+        capture = USBCapture(endpoint, buffers=4, timeout=50).start()
+        try:
+            reports = [bytes([0, 0, code, 0, 0, 0, 0, 0]) for code in range(4, 4 + 20)]
+            for report in reports:
+                endpoint.reports.put(report)
+
+            assert [capture.get(timeout=5)[0] for _ in reports] == reports
+            assert capture.received == 20
+            assert len(endpoint.buffers) <= 4
+        finally:
+            capture.stop()
+
+    def test_short_report_is_trimmed(self):
+        """Only the bytes actually read are returned"""
+        endpoint = MockEndpoint()
+        capture = USBCapture(endpoint, timeout=50).start()
+        try:
+            endpoint.reports.put(b"\x01\x00\x29")
+            assert capture.get(timeout=5)[0] == b"\x01\x00\x29"
+        finally:
+            capture.stop()
+
+    def test_timeouts_are_not_reports(self):
+        """An idle keyboard times out quietly rather than producing reports"""
+        capture = USBCapture(MockEndpoint(), timeout=10).start()
+        try:
+            with pytest.raises(queue.Empty):
+                capture.get(timeout=0.1)
+            assert capture.received == 0
+        finally:
+            capture.stop()
+
+    def test_stop_wakes_get(self):
+        """stop() makes a waiting get() return an empty report"""
+        capture = USBCapture(MockEndpoint(), timeout=10).start()
+        result = []
+        consumer = threading.Thread(target=lambda: result.append(capture.get()))
+        consumer.start()
+        capture.stop()
+        consumer.join(timeout=5)
+
+        assert result == [(b"", 0)]
+        assert not capture.thread.is_alive()
+
+    def test_read_error_is_raised_in_consumer(self):
+        """A failed read stops the reader and is raised by get()"""
+        endpoint = MockEndpoint()
+        capture = USBCapture(endpoint, timeout=50).start()
+        endpoint.reports.put(usb.core.USBError("No such device", errno=19))
+
+        with pytest.raises(usb.core.USBError):
+            capture.get(timeout=5)
+        capture.thread.join(timeout=5)
+        assert not capture.thread.is_alive()
+        with pytest.raises(usb.core.USBError):
+            capture.get(timeout=5)
+
+    def test_unexpected_error_is_raised_in_consumer(self):
+        """Errors other than USBError also reach get(), rather than leaving it waiting"""
+        endpoint = MockEndpoint()
+        capture = USBCapture(endpoint, timeout=50).start()
+        endpoint.reports.put(NotImplementedError("intr_read"))
+
+        with pytest.raises(NotImplementedError):
+            capture.get(timeout=5)
+        capture.thread.join(timeout=5)
+        assert not capture.thread.is_alive()
+
+    def test_consumer_falling_behind_stalls_reader(self):
+        """With every buffer waiting to be consumed the reader waits, losing no reports"""
+        endpoint = MockEndpoint()
+        capture = USBCapture(endpoint, buffers=2, timeout=50).start()
+        try:
+            reports = [bytes([0, 0, code, 0, 0, 0, 0, 0]) for code in range(4, 10)]
+            for report in reports:
+                endpoint.reports.put(report)
+            for _ in range(500):
+                if capture.stalls:
+                    break
+                threading.Event().wait(0.01)
+            assert capture.stalls
+
+            assert [capture.get(timeout=5)[0] for _ in reports] == reports
+        finally:
+            capture.stop()
+
+    def test_trace_source_is_read_time(self):
+        """Reports carry the time they were read, so traces include time spent queued"""
+        import time
+
+        from kvm_serial.utils.trace import TRACER
+
+        endpoint = MockEndpoint()
+        capture = USBCapture(endpoint, timeout=50).start()
+        try:
+            before = time.perf_counter_ns()
+            endpoint.reports.put(bytes(8))
+            report, captured = capture.get(timeout=5)
+        finally:
+            capture.stop()
+        assert before <= captured <= time.perf_counter_ns()
+
+        with patch("kvm_serial.backend.implementations.pyusb.get_usb_endpoints", return_value={}):
+            op = PyUSBOp(MagicMock())
+        op.debounce = None
+        op.hid_serial_out = MagicMock()
+        TRACER.start()
+        try:
+            op._parse_key(report, captured)
+            assert TRACER.current().stamps["source"] == captured
+        finally:
+            TRACER.stop()
@@ -1,4 +1,4 @@
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from kvm_serial.backend.implementations.ttyop import TtyOp
 from tests._utilities import MockSerial, mock_serial
 
@@ -20,3 +20,72 @@ class TestTTYOperation:
             op.run()
 
         assert mock_tty.setcbreak.called
+
+    @patch("serial.Serial", MockSerial)
+    def test_ttyop_paste(self, mock_serial, capsys):
+        """A bracketed paste is sent in bulk, apart from the keys around it"""
+        from kvm_serial.utils.paste import PASTE_END, PASTE_START
+
+        op = TtyOp(mock_serial)
+        reads = [f"a{PASTE_START}hello ", f"world{PASTE_END}b", ""]
+        with patch.object(TtyOp, "_read", side_effect=reads):
+            with patch.object(op.hid_serial_out, "send_text") as send_text:
+                with patch.object(op, "_paste") as paste:
+                    op._parse_key()
+
+        paste.assert_called_once_with("hello world")
+        assert [c.args[0] for c in send_text.call_args_list] == ["a", "b"]
+
+    @patch("serial.Serial", MockSerial)
+    def test_ttyop_escape(self, mock_serial, capsys):
+        """A lone ESC is sent once no paste marker follows it"""
+        op = TtyOp(mock_serial)
+        with patch.object(TtyOp, "_read", side_effect=["\x1b", ""]):
+            with patch.object(op.hid_serial_out, "send_text") as send_text:
+                op._parse_key()
+        send_text.assert_called_once_with("\x1b")
+
+    @patch("serial.Serial", MockSerial)
+    def test_ttyop_batch(self, mock_serial, capsys):
+        """Everything available is read at once and written in a single burst"""
+        import os
+
+        read_fd, write_fd = os.pipe()
+        stdin = MagicMock()
+        stdin.fileno.return_value = read_fd
+        port = MagicMock()
+        op = TtyOp(port)
+        try:
+            os.write(write_fd, b"hello world\n")
+            with patch("kvm_serial.backend.implementations.ttyop.sys.stdin", stdin):
+                assert op._parse_key()
+                os.close(write_fd)
+                assert not op._parse_key()  # End of input
+        finally:
+            os.close(read_fd)
+
+        assert port.write.call_count == 1
+        assert len(port.write.call_args.args[0]) == 12 * 2 * 14
+        assert capsys.readouterr().out == "hello world\n"
+
+    @patch("serial.Serial", MockSerial)
+    def test_ttyop_split_character(self, mock_serial, capsys):
+        """A character split across two reads is waited for, not taken as end of input"""
+        import os
+        import threading
+
+        read_fd, write_fd = os.pipe()
+        stdin = MagicMock()
+        stdin.fileno.return_value = read_fd
+        op = TtyOp(mock_serial)
+        try:
+            os.write(write_fd, "é".encode()[:1])
+            threading.Timer(0.05, os.write, (write_fd, "é".encode()[1:])).start()
+            with patch("kvm_serial.backend.implementations.ttyop.sys.stdin", stdin):
+                with patch.object(op.hid_serial_out, "send_text") as send_text:
+                    assert op._parse_key()
+        finally:
+            os.close(write_fd)
+            os.close(read_fd)
+
+        send_text.assert_called_once_with("é")
@@ -1,5 +1,5 @@
 from unittest.mock import patch, MagicMock
-from kvm_serial.backend.mouse import MouseListener
+from kvm_serial.backend.mouse import Button, MouseListener
 from tests._utilities import MockSerial, mock_serial
 
 
@@ -17,3 +17,26 @@ class TestMouse:
 
         # Verify DataComm was initialized with our mock serial
         mock_datacomm.assert_called_once_with(mock_serial)
+
+    @patch("kvm_serial.backend.mouse.get_monitors")
+    @patch("kvm_serial.backend.mouse.Listener")
+    def test_mouse_events(self, mock_listener, mock_monitors):
+        """Mouse events are scaled and fed to the report engine"""
+        mock_monitors.return_value = [MagicMock(width=1024, height=512)]
+        comm = MagicMock()
+
+        with patch("kvm_serial.backend.mouse.DataComm", return_value=comm):
+            listener = MouseListener(MagicMock(), rate=None)
+
+        listener.on_move(512, 256)
+        assert comm.send.call_args.args[0] == bytes((0x02, 0, 0x00, 0x08, 0x00, 0x08, 0))
+
+        listener.on_click(512, 256, Button.left, True)
+        assert comm.send.call_args.args[0][1] == 0x01
+        listener.on_scroll(512, 256, 0, -1)
+        assert comm.send.call_args.args[0][1] == 0x01
+        assert comm.send.call_args.args[0][6] == 0xFF
+        listener.on_click(512, 256, Button.left, False)
+        assert comm.send.call_args.args[0][1] == 0x00
+
+        assert listener.scale(-512, 0) == (2048, 0)
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+from unittest.mock import patch
+
+from kvm_serial.bench import (
+    NullPort,
+    bench_frame_encoder,
+    bench_input_wakeup,
+    bench_loopback,
+    bench_utils,
+    legacy_encode,
+    main,
+    percentiles,
+)
+from kvm_serial.utils.communication import DataComm
+
+
+class TestBench:
+    def test_legacy_encode_matches_datacomm(self):
+        """The legacy reference encoder produces the same frames as DataComm"""
+        sent = []
+        port = NullPort()
+        port.write = lambda data: sent.append(bytes(data))
+        comm = DataComm(port)
+
+        key = bytes((0x0, 0x0, 0x4, 0x0, 0x0, 0x0, 0x0, 0x0))
+        comm.send(key)
+        comm.send(bytearray(b"\x02\x00\x00\x08\x00\x08\x00"), cmd=b"\x04")
+
+        assert sent[0] == legacy_encode(key)
+        assert sent[1] == legacy_encode(b"\x02\x00\x00\x08\x00\x08\x00", cmd=b"\x04")
+
+    def test_bench_frame_encoder(self):
+        """Benchmark returns a positive rate for every measurement"""
+        results = bench_frame_encoder(iterations=10)
+        assert set(results) == {"keyboard_legacy", "keyboard_send", "mouse_legacy", "mouse_send"}
+        assert all(rate > 0 for rate in results.values())
+
+    def test_bench_utils(self):
+        """Scancode utility benchmarks return positive rates"""
+        results = bench_utils(iterations=100)
+        assert all(rate > 0 for rate in results.values())
+
+    def test_percentiles(self):
+        """Percentiles are reported in milliseconds"""
+        assert percentiles([0.001 * i for i in range(1, 101)]) == {
+            "p50": 51.0,
+            "p95": 96.0,
+            "p99": 100.0,
+        }
+        assert percentiles([])["p50"] is None
+
+    @pytest.mark.parametrize("backend", ["direct", "writer", "async"])
+    def test_bench_loopback(self, backend):
+        """A short loopback run delivers the pasted text intact"""
+        result = bench_loopback(baud=115200, backend=backend, chars=20, samples=3)
+        assert result["text_intact"]
+        assert result["complete"]
+        assert result["frames"] == 40
+        assert result["frames_per_sec"] > 0
+        assert result["latency_ms"]["p50"] > 0
+
+    def test_bench_loopback_incomplete_is_valid_json(self):
+        """A run whose paste does not all arrive is marked incomplete, without NaN rates"""
+        with patch("kvm_serial.utils.simulator.CH9329Simulator.wait_for", return_value=False):
+            result = bench_loopback(baud=115200, chars=5, samples=1)
+
+        assert result["complete"] is False
+        assert result["frames_per_sec"] is None
+        json.dumps(result, allow_nan=False)
+
+    def test_bench_input_wakeup(self):
+        """Waiting in select() notices keys sooner than polling with a sleep"""
+        result = bench_input_wakeup(samples=5, interval=0.05)
+        assert result["select"]["p50"] < result["polling"]["p50"]
+
+    def test_main_writes_json(self, tmp_path):
+        """Results are written to the output file as JSON"""
+        output = tmp_path / "bench.json"
+        main(["--micro", "-n", "100", "-o", str(output)])
+
+        results = json.loads(output.read_text())
+        assert results["loopback"] == []
+        assert "frame_encoder_frames_per_sec" in results["micro"]
@@ -0,0 +1,142 @@
+import asyncio
+import os
+from unittest.mock import patch
+
+import pytest
+
+from kvm_serial.utils.aio import AsyncDataComm, AsyncSerialTransport, open_async
+from kvm_serial.utils.communication import FrameEncoder
+
+
+class PipePort:
+    """Port stand-in backed by a pipe: writes go to the pipe, reads come from it"""
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self.closed = False
+
+    def fileno(self):
+        return self.write_fd
+
+    def read_all(self) -> bytes:
+        data = b""
+        while True:
+            try:
+                chunk = os.read(self.read_fd, 65536)
+            except BlockingIOError:
+                return data
+            if not chunk:
+                return data
+            data += chunk
+
+    def close(self):
+        self.closed = True
+        os.close(self.write_fd)
+
+
+@pytest.fixture
+def pipe_port():
+    port = PipePort()
+    yield port
+    if not port.closed:
+        os.close(port.write_fd)
+    os.close(port.read_fd)
+
+
+class TestAsyncDataComm:
+    def test_send(self, pipe_port):
+        """A single report is written as one frame"""
+        comm = AsyncDataComm(AsyncSerialTransport(pipe_port))
+        key = bytes((0, 0, 4, 0, 0, 0, 0, 0))
+        assert asyncio.run(comm.send(key))
+        assert pipe_port.read_all() == FrameEncoder().encode(key)
+
+    def test_type_text_and_click(self, pipe_port):
+        """Text is typed as press/release pairs and clicks as press/release reports"""
+        enc = FrameEncoder()
+        comm = AsyncDataComm(AsyncSerialTransport(pipe_port))
+
+        async def main():
+            assert await comm.type_text("ab") == 4
+            assert await comm.click(0x123, 5000) == 2
+            assert await comm.release()
+
+        asyncio.run(main())
+        release = enc.encode(bytes(8))
+        expected = (
+            enc.encode(bytes((0, 0, 4, 0, 0, 0, 0, 0)))
+            + release
+            + enc.encode(bytes((0, 0, 5, 0, 0, 0, 0, 0)))
+            + release
+            + enc.encode(b"\x02\x01\x23\x01\xff\x0f\x00", cmd=b"\x04")
+            + enc.encode(b"\x02\x00\x23\x01\xff\x0f\x00", cmd=b"\x04")
+            + release
+        )
+        assert pipe_port.read_all() == expected
+
+    def test_concurrent_producers(self, pipe_port):
+        """Writes larger than the pipe buffer are completed in order by the event loop"""
+        comm = AsyncDataComm(AsyncSerialTransport(pipe_port))
+        received = bytearray()
+
+        async def reader():
+            while len(received) < 2 * 20000 * 28:
+                await asyncio.sleep(0)
+                received.extend(pipe_port.read_all())
+
+        async def main():
+            await asyncio.gather(
+                comm.type_text("a" * 20000),
+                comm.type_text("b" * 20000),
+                reader(),
+            )
+
+        asyncio.run(main())
+        frames = [bytes(received[i : i + 14]) for i in range(0, len(received), 14)]
+        assert all(f[-1] == sum(f[:-1]) % 256 for f in frames)
+        # Each coroutine's text arrives contiguously, never interleaved mid-frame
+        keys = [f[7] for f in frames if f[7]]
+        assert keys == [4] * 20000 + [5] * 20000
+        assert comm.transport.bytes_written == len(received)
+
+    def test_type_text_delay_and_hold(self, pipe_port):
+        """Delayed typing and held clicks send one write per step"""
+        comm = AsyncDataComm(AsyncSerialTransport(pipe_port))
+
+        async def main():
+            assert await comm.type_text("ab", delay=0.001) == 4
+            assert await comm.click(0, 0, hold=0.001) == 2
+            assert await comm.move_to(-1, 1)
+
+        asyncio.run(main())
+        assert len(pipe_port.read_all()) == 4 * 14 + 3 * 13
+
+    def test_read(self):
+        """read() waits for data to become available"""
+        read_fd, write_fd = os.pipe()
+
+        class ReadPort:
+            def fileno(self):
+                return read_fd
+
+            def close(self):
+                os.close(read_fd)
+
+        transport = AsyncSerialTransport(ReadPort())
+
+        async def main():
+            asyncio.get_running_loop().call_later(0.01, os.write, write_fd, b"\x57\xab")
+            return await transport.read()
+
+        assert asyncio.run(main()) == b"\x57\xab"
+        transport.close()
+        os.close(write_fd)
+
+    @patch("kvm_serial.utils.aio.Serial")
+    def test_open_async(self, mock_serial, pipe_port):
+        """open_async opens a non-blocking Serial"""
+        mock_serial.return_value = pipe_port
+        comm = open_async("/dev/ttyUSB0", 115200)
+        mock_serial.assert_called_once_with("/dev/ttyUSB0", 115200, timeout=0)
+        assert comm.transport.port is pipe_port
@@ -0,0 +1,120 @@
+from unittest.mock import patch
+
+import pytest
+
+from kvm_serial.utils.baudrate import (
+    get_info,
+    get_parameters,
+    probe_baud,
+    reset,
+    set_parameters,
+    upgrade_baud,
+)
+from kvm_serial.utils.communication import FrameEncoder
+from kvm_serial.utils.replies import FrameParser
+
+
+class FakeChip:
+    """Port stand-in which answers configuration commands like a CH9329"""
+
+    def __init__(self, chip_baud=9600, accept=True, apply_on_reset=True):
+        self.baudrate = 9600
+        self.timeout = None
+        self.chip_baud = chip_baud
+        self.accept = accept
+        self.apply_on_reset = apply_on_reset
+        self.params = bytearray(50)
+        self.params[3:7] = chip_baud.to_bytes(4, "big")
+        self._parser = FrameParser()
+        self._encoder = FrameEncoder()
+        self._out = bytearray()
+
+    @property
+    def in_waiting(self):
+        return len(self._out)
+
+    def reset_input_buffer(self):
+        self._out.clear()
+
+    def read(self, size=1):
+        data = bytes(self._out[:size])
+        del self._out[:size]
+        return data
+
+    def write(self, data):
+        if self.baudrate != self.chip_baud:
+            return len(data)  # Garbled at the wrong rate: no reply
+
+        for frame in self._parser.feed(data):
+            if frame.cmd == 0x01:
+                self._reply(0x81, b"\x30\x01\x00\x00\x00\x00\x00\x00")
+            elif frame.cmd == 0x08:
+                self._reply(0x88, bytes(self.params))
+            elif frame.cmd == 0x09:
+                if self.accept:
+                    self.params[:] = frame.data
+                self._reply(0x89 if self.accept else 0xC9, b"\x00" if self.accept else b"\xe5")
+            elif frame.cmd == 0x0F:
+                self._reply(0x8F, b"\x00")
+                if self.apply_on_reset:
+                    self.chip_baud = int.from_bytes(self.params[3:7], "big")
+        return len(data)
+
+    def _reply(self, cmd, data):
+        self._out += self._encoder.encode(data, bytes((cmd,)))
+
+
+class TestBaudRate:
+    def test_commands(self):
+        """Info and parameter commands round-trip through the frame protocol"""
+        chip = FakeChip()
+        assert get_info(chip) == {"version": 0x30, "usb_connected": True, "leds": 0}
+        params = get_parameters(chip)
+        assert int.from_bytes(params[3:7], "big") == 9600
+        assert set_parameters(chip, params)
+        assert reset(chip)
+        assert chip.timeout is None  # restored after each command
+        with pytest.raises(ValueError):
+            set_parameters(chip, b"\x00")
+
+    def test_probe(self):
+        """Probing finds the chip's rate and leaves the port at it"""
+        chip = FakeChip(chip_baud=57600)
+        assert probe_baud(chip) == 57600
+        assert chip.baudrate == 57600
+
+        chip = FakeChip(chip_baud=12345)
+        assert probe_baud(chip, rates=[9600, 115200]) is None
+        assert chip.baudrate == 9600
+
+    @patch("kvm_serial.utils.baudrate.time.sleep")
+    def test_upgrade(self, mock_sleep):
+        """The chip and port are both moved to the target rate"""
+        chip = FakeChip()
+        assert upgrade_baud(chip, 115200, current=9600) == 115200
+        assert chip.baudrate == chip.chip_baud == 115200
+
+        # Already there
+        assert upgrade_baud(chip, 115200) == 115200
+
+    @patch("kvm_serial.utils.baudrate.time.sleep")
+    def test_upgrade_fallback(self, mock_sleep):
+        """Failures leave the port at the rate the chip actually uses"""
+        chip = FakeChip(accept=False)
+        assert upgrade_baud(chip, 115200, current=9600) == 9600
+
+        chip = FakeChip(apply_on_reset=False)
+        assert upgrade_baud(chip, 115200, current=9600) == 9600
+        assert chip.baudrate == 9600
+
+        # Wrong idea of the current rate: parameters cannot be read
+        chip = FakeChip(chip_baud=19200)
+        assert upgrade_baud(chip, 115200, current=9600) == 9600
+
+    @patch("kvm_serial.utils.baudrate.time.sleep")
+    @patch("kvm_serial.utils.baudrate.BAUD_RATES", [9600])
+    def test_upgrade_no_answer(self, mock_sleep):
+        """A chip which never answers leaves the port unchanged"""
+        chip = FakeChip(chip_baud=1200)
+        chip.baudrate = 4800
+        assert upgrade_baud(chip, 115200, current=None) == 4800
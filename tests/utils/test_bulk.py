@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock
+
+from kvm_serial.utils.bulk import FRAME_LENGTH, encode_text
+from kvm_serial.utils.communication import DataComm, FrameEncoder
+from kvm_serial.utils.layout import get_layout
+from kvm_serial.utils.utils import optimise_scancodes, string_to_scancodes
+
+
+def reference(text, layout=None, release=True):
+    """Frames built one at a time from string_to_scancodes"""
+    encoder = FrameEncoder()
+    frames = b""
+    for scancode in string_to_scancodes(text, layout=layout):
+        frames += encoder.encode(bytes(scancode))
+        if release:
+            frames += encoder.encode(DataComm.RELEASE)
+    return frames
+
+
+class TestEncodeText:
+    def test_matches_reference(self):
+        """Bulk frames are identical to frames built per character"""
+        text = "Hello, World!\n\t(x + y) * z; ~@£\\|"
+        assert bytes(encode_text(text)) == reference(text)
+
+    def test_without_release(self):
+        """Release frames can be left out"""
+        assert bytes(encode_text("aB", release=False)) == reference("aB", release=False)
+        assert len(encode_text("aB", release=False)) == 2 * FRAME_LENGTH
+
+    def test_layout(self):
+        """The requested layout is used, including characters above U+00FF"""
+        text = "yz@€"
+        assert bytes(encode_text(text, "de")) == reference(text, get_layout("de"))
+
+    def test_unmapped_skipped(self):
+        """Characters the layout cannot type are skipped"""
+        assert bytes(encode_text("a☃b")) == reference("ab")
+        assert len(encode_text("")) == 0
+
+    def test_minimal(self):
+        """The minimal sequence matches optimise_scancodes"""
+        encoder = FrameEncoder()
+        for text in ("Hello WORLD aa!", "aaA", "x", "€€☃"):
+            expected = b"".join(encoder.encode(bytes(s)) for s in optimise_scancodes(text))
+            assert bytes(encode_text(text, minimal=True)) == expected
+
+    def test_send_text(self):
+        """DataComm.send_text writes whole frames, in bursts when asked"""
+        port = MagicMock()
+        dc = DataComm(port)
+
+        assert dc.send_text("abc", max_burst=30) == 6
+        writes = [bytes(call.args[0]) for call in port.write.call_args_list]
+        assert [len(w) for w in writes] == [28, 28, 28]
+        assert b"".join(writes) == reference("abc")
+        assert port.flush.call_count == 2
@@ -1,8 +1,8 @@
 import pytest
 import termios
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from serial import SerialException
-from kvm_serial.utils.communication import DataComm, list_serial_ports
+from kvm_serial.utils.communication import DataComm, FrameEncoder, list_serial_ports
 
 from tests._utilities import MockSerial, mock_serial
 
@@ -193,3 +193,95 @@ class TestDataComm:
         with pytest.raises(Exception) as exc_info:
             list_serial_ports()
         assert "Simulated critical error" in str(exc_info.value)
+
+
+class TestFrameEncoder:
+    """Test Suite for FrameEncoder class"""
+
+    def test_encode_matches_reference(self):
+        """Encoded frames match hand-built reference packets for keyboard and mouse"""
+        enc = FrameEncoder()
+        key = bytes((0x0, 0x0, 0x4, 0x0, 0x0, 0x0, 0x0, 0x0))
+        assert enc.encode(key) == b"\x57\xab\x00\x02\x08\x00\x00\x04\x00\x00\x00\x00\x00\x10"
+
+        move = bytearray(b"\x02\x00\xff\x0f\xff\x0f\x00")
+        frame = enc.encode(move, cmd=b"\x04")
+        assert frame[:5] == b"\x57\xab\x00\x04\x07"
+        assert frame[5:-1] == move
+        assert frame[-1] == sum(frame[:-1]) % 256
+
+    def test_encode_into_packs_frames(self):
+        """Multiple frames can be packed back-to-back into one buffer"""
+        enc = FrameEncoder()
+        buffer = bytearray(64)
+        key = bytes((0x0, 0x0, 0x4, 0x0, 0x0, 0x0, 0x0, 0x0))
+
+        end = enc.encode_into(buffer, 0, key)
+        end = enc.encode_into(memoryview(buffer), end, DataComm.RELEASE)
+
+        assert end == 28
+        assert bytes(buffer[:end]) == enc.encode(key) + enc.encode(DataComm.RELEASE)
+
+    def test_encode_cached(self):
+        """Cached frames are reused for repeated keyboard reports"""
+        enc = FrameEncoder(cache_size=4)
+        first = enc.encode_cached(DataComm.RELEASE)
+        assert enc.encode_cached(DataComm.RELEASE) is first
+        assert enc.encode_cached.cache_info().hits == 1
+
+    def test_encode_errors(self):
+        """Bad headers raise ValueError and oversized data raises OverflowError"""
+        enc = FrameEncoder()
+        with pytest.raises(ValueError):
+            enc.encode(b"\x00", cmd=b"\x02\x02")
+        with pytest.raises(OverflowError):
+            enc.encode(b"x" * 256)
+        with pytest.raises(OverflowError):
+            enc.encode_into(bytearray(300), 0, b"x" * 256)
+
+
+class TestSendMany:
+    """Test Suite for DataComm batched writes"""
+
+    KEY_A = bytes((0x0, 0x0, 0x4, 0x0, 0x0, 0x0, 0x0, 0x0))
+    FRAME_A = b"\x57\xab\x00\x02\x08\x00\x00\x04\x00\x00\x00\x00\x00\x10"
+    FRAME_RELEASE = b"\x57\xab\x00\x02\x08\x00\x00\x00\x00\x00\x00\x00\x00\x0c"
+
+    @patch("serial.Serial", MockSerial)
+    def test_send_many_single_write(self, mock_serial):
+        """All reports are packed into a single write"""
+        dc = DataComm(mock_serial)
+        reports = [self.KEY_A, DataComm.RELEASE] * 3
+
+        assert dc.send_many(reports) == 6
+        mock_serial.write.assert_called_once_with((self.FRAME_A + self.FRAME_RELEASE) * 3)
+
+    @patch("serial.Serial", MockSerial)
+    def test_send_many_empty(self, mock_serial):
+        """No write is made for an empty batch"""
+        dc = DataComm(mock_serial)
+        assert dc.send_many(iter(())) == 0
+        mock_serial.write.assert_not_called()
+
+    def test_send_many_max_burst(self):
+        """Bursts are split on frame boundaries and flushed in between"""
+        port = MagicMock()
+        dc = DataComm(port)
+        reports = [self.KEY_A, DataComm.RELEASE] * 3
+
+        # 14-byte frames: two fit in a 30-byte burst, three do not
+        assert dc.send_many(iter(reports), max_burst=30) == 6
+        writes = [bytes(c.args[0]) for c in port.write.call_args_list]
+        assert writes == [self.FRAME_A + self.FRAME_RELEASE] * 3
+        assert port.flush.call_count == 2
+
+    @patch("serial.Serial", MockSerial)
+    def test_send_keypress(self, mock_serial):
+        """A keypress writes the report and its release together"""
+        dc = DataComm(mock_serial)
+        assert dc.send_keypress(self.KEY_A)
+        mock_serial.write.assert_called_once_with(self.FRAME_A + self.FRAME_RELEASE)
+
+        mock_serial.write.reset_mock()
+        assert dc.send_keypress(b"\x00") is False
+        mock_serial.write.assert_not_called()
@@ -0,0 +1,163 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from serial import Serial
+
+from kvm_serial.utils.bulk import FRAME_LENGTH, encode_text
+from kvm_serial.utils.communication import DataComm
+from kvm_serial.utils.flowcontrol import RateController, link_frame_rate
+from kvm_serial.utils.paste import send_paste
+from kvm_serial.utils.replies import Frame, ReplyReader, ReplyTracker
+from kvm_serial.utils.simulator import CH9329Simulator
+from kvm_serial.utils.writer import SerialWriter
+
+
+class TestRateController:
+    def test_additive_increase(self):
+        """Successful replies raise the rate, capped at the maximum"""
+        rc = RateController(initial=10, maximum=11, increase=5)
+        rc.on_reply(0x02, 0x00, 0.02, now=0)
+        assert rc.rate == pytest.approx(10.5)
+        for _ in range(10):
+            rc.on_reply(0x02, 0x00, 0.02, now=0)
+        assert rc.rate == 11
+        assert rc.baseline_rtt == 0.02
+
+    def test_decrease_on_error_and_latency(self):
+        """Error replies and latency growth cut the rate, at most once per round trip"""
+        rc = RateController(initial=100, minimum=20, latency_factor=2)
+        rc.on_reply(0x02, 0x00, 0.01, now=0)
+
+        rc.on_reply(0x02, 0xE1, 0.01, now=1.0)
+        assert rc.rate == pytest.approx(50, rel=0.01)
+        # Within cooldown (baseline * factor = 20ms): ignored
+        rc.on_reply(0x02, 0x00, 0.05, now=1.01)
+        assert rc.cuts == 1
+
+        rc.on_reply(0x02, 0x00, 0.05, now=1.1)
+        assert rc.cuts == 2
+        rc.on_reply(0x02, 0xE4, 0.01, now=2.0)
+        assert rc.rate == 20  # clamped at minimum
+
+    def test_cooldown_covers_round_trip_and_batch(self):
+        """After a cut, the next waits for a round trip and a batch period to pass"""
+        rc = RateController(initial=100, latency_factor=2)
+        rc.on_reply(0x02, 0x00, 0.001, now=0)
+        rc._period = 0.05
+
+        rc.on_reply(0x02, 0xE1, 0.02, now=1.0)
+        rc.on_reply(0x02, 0xE1, 0.02, now=1.04)  # Within the batch period
+        assert rc.cuts == 1
+        rc.on_reply(0x02, 0xE1, 0.08, now=1.07)  # Within the latest round trip
+        assert rc.cuts == 1
+        rc.on_reply(0x02, 0xE1, 0.08, now=1.09)
+        assert rc.cuts == 2
+
+    def test_loss_from_tracker(self):
+        """Frames counted as lost by the tracker cut the rate"""
+        tracker = ReplyTracker(timeout=0.1)
+        rc = RateController(tracker, initial=100)
+        assert rc.on_reply in tracker.listeners
+
+        tracker.sent(b"\x57\xab\x00\x02\x01\x00\x05", now=0.0)
+        rc.check_loss(now=1.0)
+        assert rc.rate == 50
+        RateController().check_loss()  # no tracker: nothing to do
+
+    @patch("kvm_serial.utils.flowcontrol.time.sleep")
+    def test_send_many_batches(self, mock_sleep):
+        """Reports are sent in batches sized from the current rate"""
+        comm = MagicMock()
+        rc = RateController(initial=100)
+        reports = [bytes(8)] * 12
+
+        assert rc.send_many(comm, iter(reports), period=0.05) == 12
+        assert [len(c.args[0]) for c in comm.send_many.call_args_list] == [5, 5, 2]
+        assert mock_sleep.called
+
+    @patch("kvm_serial.utils.flowcontrol.time.sleep")
+    def test_send_many_window(self, mock_sleep):
+        """Sending pauses while too many frames await a reply"""
+        comm = MagicMock()
+        tracker = MagicMock(lost=0, listeners=[])
+        type(tracker).pending = property(lambda self: 100 if mock_sleep.call_count < 2 else 0)
+        rc = RateController(tracker, initial=1000, window=10)
+
+        assert rc.send_many(comm, [bytes(8)]) == 1
+        assert mock_sleep.call_count >= 2
+
+    @patch("kvm_serial.utils.flowcontrol.time.sleep")
+    def test_send_many_encoded_frames(self, mock_sleep):
+        """Pre-encoded frames are sent in rate-sized batches, split on frame boundaries"""
+        port = MagicMock()
+        frames = encode_text("hello")
+        rc = RateController(initial=80)
+
+        assert rc.send_many(DataComm(port), frames, period=0.05) == 10
+        writes = [bytes(c.args[0]) for c in port.write.call_args_list]
+        assert [len(w) // FRAME_LENGTH for w in writes] == [4, 4, 2]
+        assert b"".join(writes) == bytes(frames)
+
+    def test_paste_slows_on_error_replies(self):
+        """A paste through a rate-controlled DataComm slows down when replies report errors"""
+        clock = [0.0]
+
+        def sleep(seconds: float):
+            clock[0] += seconds
+
+        patch_time = patch.multiple(
+            "kvm_serial.utils.flowcontrol.time", monotonic=lambda: clock[0], sleep=sleep
+        )
+        tracker = ReplyTracker()
+        port = MagicMock()
+        port.write.side_effect = tracker.sent
+        rc = RateController(tracker, initial=200, minimum=20, window=1000)
+        comm = DataComm(port, rc)
+
+        def progress(sent: int, total: int):
+            # The CH9329 reports a timeout for every frame typed
+            while tracker.pending:
+                tracker.received(Frame(0, 0x02 | 0xC0, bytes((0xE1,))))
+
+        with patch_time:
+            assert send_paste(comm, "a" * 40, chunk=10, progress=progress) == 40
+
+        batches = [len(c.args[0]) // FRAME_LENGTH for c in port.write.call_args_list]
+        assert batches[0] == 10  # 200 frames/s, 50ms per batch
+        assert batches[-1] == 1  # Cut to the minimum
+        assert rc.rate == 20
+        assert rc.cuts == 4
+
+    def test_link_frame_rate(self):
+        """14-byte keyboard frames at 10 bits per byte"""
+        assert link_frame_rate(115200) == pytest.approx(822.86, rel=0.01)
+
+
+class TestSimulatedLink:
+    def test_full_rate_at_115200(self):
+        """Batches at the link's frame rate are not mistaken for congestion"""
+        baud = 115200
+        link_rate = link_frame_rate(baud)
+        with CH9329Simulator(baud=baud, buffer_frames=64) as simulator:
+            serial = Serial(simulator.port, baud, timeout=0.1)
+            writer = SerialWriter(serial, baud=baud).start()
+            tracker = ReplyTracker(byte_time=10 / baud).attach(writer)
+            replies = ReplyReader(serial, tracker).start()
+            rc = RateController(tracker, initial=link_rate, maximum=link_rate)
+            try:
+                frames = encode_text("The quick brown fox jumps over the lazy dog. " * 16)
+                total = len(frames) // FRAME_LENGTH
+                start = time.monotonic()
+                assert rc.send_many(DataComm(writer), frames) == total
+                assert simulator.wait_for(total, timeout=10)
+                elapsed = time.monotonic() - start
+            finally:
+                writer.stop()
+                replies.stop()
+                serial.close()
+
+        assert tracker.lost == 0 and simulator.overruns == 0
+        assert rc.cuts == 0
+        assert rc.rate > 0.9 * link_rate
+        assert total / elapsed > 0.8 * link_rate
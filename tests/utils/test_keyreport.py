@@ -0,0 +1,44 @@
+from kvm_serial.utils.keyreport import KeyReportState
+
+
+def report(modifiers=0, *keys):
+    return bytes((modifiers, 0, *keys, *bytes(6 - len(keys))))
+
+
+class TestKeyReportState:
+    def test_chord(self):
+        """Releasing one key of a chord keeps the others held"""
+        state = KeyReportState()
+        assert state.press(modifiers=0x02) == report(0x02)
+        assert state.press(0x04) == report(0x02, 0x04)
+        assert state.press(0x05) == report(0x02, 0x04, 0x05)
+        assert state.release(0x04) == report(0x02, 0x00, 0x05)
+        assert state.release(modifiers=0x02) == report(0x00, 0x00, 0x05)
+        assert state.press(0x06) == report(0x00, 0x06, 0x05)
+
+    def test_auto_repeat(self):
+        """Repeated presses of a held key, and unheld releases, send nothing"""
+        state = KeyReportState()
+        assert state.press(0x04) is not None
+        assert state.press(0x04) is None
+        assert state.press(modifiers=0x01) is not None
+        assert state.press(modifiers=0x01) is None
+        assert state.release(0x05) is None
+        assert state.release(modifiers=0x02) is None
+
+    def test_rollover(self):
+        """A seventh key is ignored until a slot frees up"""
+        state = KeyReportState()
+        for code in range(0x04, 0x0A):
+            state.press(code)
+        assert state.press(0x0A) is None
+        assert state.release(0x0A) is None
+        assert state.release(0x05) == report(0, 0x04, 0, 0x06, 0x07, 0x08, 0x09)
+        assert state.press(0x0A) == report(0, 0x04, 0x0A, 0x06, 0x07, 0x08, 0x09)
+
+    def test_clear(self):
+        state = KeyReportState()
+        assert state.clear() is None
+        state.press(0x04, 0x02)
+        assert state.clear() == report()
+        assert state.press(0x04) == report(0, 0x04)
@@ -0,0 +1,122 @@
+import json
+from array import array
+from unittest.mock import patch
+
+import pytest
+
+from kvm_serial.utils.layout import (
+    KeyboardLayout,
+    compile_layout,
+    get_layout,
+    load_layout,
+    set_default_layout,
+)
+from kvm_serial.utils.utils import ascii_to_scancode, scancode_to_ascii, string_to_scancodes
+
+
+@pytest.fixture
+def default_uk():
+    yield
+    set_default_layout("uk")
+
+
+class TestKeyboardLayout:
+    @pytest.mark.parametrize("name", ["uk", "us", "de"])
+    def test_round_trip(self, name):
+        """Every character a layout can type decodes back to itself"""
+        layout = get_layout(name)
+        for point, report in enumerate(layout.reports):
+            if report is not None:
+                assert layout.decode(report[0], report[2]) == chr(point)
+
+    def test_us_layout(self):
+        """US symbols differ from UK"""
+        us = get_layout("us")
+        assert us.encode("@") == bytes((0x02, 0, 0x1F, 0, 0, 0, 0, 0))
+        assert us.encode("\\") == bytes((0, 0, 0x31, 0, 0, 0, 0, 0))
+        assert us.encode("£") is None
+        assert get_layout("uk").encode("@") == bytes((0x02, 0, 0x34, 0, 0, 0, 0, 0))
+
+    def test_de_layout(self):
+        """DE swaps Y and Z and types @ with AltGr"""
+        de = get_layout("de")
+        assert de.encode("z") == bytes((0, 0, 0x1C, 0, 0, 0, 0, 0))
+        assert de.encode("Y") == bytes((0x02, 0, 0x1D, 0, 0, 0, 0, 0))
+        assert de.encode("@") == bytes((0x40, 0, 0x14, 0, 0, 0, 0, 0))
+        assert de.decode(0x40, 0x08) == "€"
+
+    def test_uk_hash_key(self):
+        """UK '#' is typed with the ISO key, but both hash keys decode"""
+        uk = get_layout("uk")
+        assert uk.encode("#")[2] == 0x32
+        assert uk.decode(0, 0x31) == "#"
+        assert uk.decode(0x20, 0x20) == "£"
+
+    def test_named_keys_not_typed(self):
+        """Named keys decode, but their arrow characters are not typed"""
+        uk = get_layout("uk")
+        assert uk.decode(0, 0x4F) == "→"
+        assert uk.encode("→") is None
+
+    def test_layout_argument(self):
+        """Conversion functions accept a layout"""
+        assert ascii_to_scancode("y", get_layout("de"))[2] == 0x1D
+        assert scancode_to_ascii(array("B", [0, 0, 0x1D, 0, 0, 0, 0, 0]), layout="de") == "y"
+        assert [s[2] for s in string_to_scancodes("zy", layout=get_layout("de"))] == [0x1C, 0x1D]
+
+    def test_set_default_layout(self, default_uk):
+        """The default layout is used when none is given"""
+        set_default_layout("us")
+        assert ascii_to_scancode('"')[2] == 0x34
+
+
+class TestLoadLayout:
+    def test_compile_extends_base(self):
+        """A custom layout can extend a built-in one"""
+        layout = compile_layout({"name": "uk-x", "base": "uk", "altgr": {"0x04": "á"}})
+        assert isinstance(layout, KeyboardLayout)
+        assert layout.encode("á") == bytes((0x40, 0, 0x04, 0, 0, 0, 0, 0))
+        assert layout.encode("a") == bytes(8)[:2] + b"\x04" + bytes(5)
+
+    def test_load_cached(self, tmp_path):
+        """Compiled layouts are cached on disk and reused"""
+        path = tmp_path / "mine.json"
+        path.write_text(json.dumps({"base": "us", "plain": {"0x04": "q"}}))
+        cache = tmp_path / "cache"
+
+        layout = load_layout(path, cache_dir=cache)
+        assert layout.name == "mine"
+        assert layout.encode("q")[2] == 0x04
+        assert len(list(cache.glob("layout-*.json"))) == 1
+
+        assert load_layout(path, cache_dir=cache).encode("q")[2] == 0x04
+
+    def test_load_cache_is_plain_tables(self, tmp_path):
+        """The cache is JSON rebuilt into an identical layout, and a malformed one is ignored"""
+        path = tmp_path / "mine.json"
+        path.write_text(json.dumps({"base": "de", "altgr": {"0x04": "á"}}))
+        cache = tmp_path / "cache"
+
+        compiled = load_layout(path, cache_dir=cache)
+        (cached_file,) = cache.glob("layout-*.json")
+        cached = load_layout(path, cache_dir=cache)
+        assert cached.to_tables() == compiled.to_tables()
+        assert cached.encode("á") == compiled.encode("á") and cached.encode("€")
+
+        cached_file.write_text(json.dumps({"name": "mine", "plain": []}))
+        assert load_layout(path, cache_dir=cache).to_tables() == compiled.to_tables()
+
+    def test_load_cache_keyed_by_name_and_version(self, tmp_path):
+        """Same content under another name, or from another compiler version, is recompiled"""
+        spec = json.dumps({"base": "us", "plain": {"0x04": "q"}})
+        cache = tmp_path / "cache"
+        for name in ("mine", "yours"):
+            (tmp_path / f"{name}.json").write_text(spec)
+
+        assert load_layout(tmp_path / "mine.json", cache_dir=cache).name == "mine"
+        assert load_layout(tmp_path / "yours.json", cache_dir=cache).name == "yours"
+        assert len(list(cache.glob("layout-*.json"))) == 2
+
+        with patch("kvm_serial.utils.layout.COMPILER_VERSION", -1):
+            load_layout(tmp_path / "mine.json", cache_dir=cache)
+        assert len(list(cache.glob("layout-*.json"))) == 3
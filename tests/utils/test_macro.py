@@ -0,0 +1,174 @@
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from serial import Serial
+
+from kvm_serial.utils.bulk import encode_text
+from kvm_serial.utils.communication import DataComm, FrameEncoder
+from kvm_serial.utils.macro import (
+    CompiledMacro,
+    MacroLibrary,
+    compile_macro,
+    parse_chord,
+    run_macro,
+)
+from kvm_serial.utils.metrics import REGISTRY
+from tests._utilities import ch9329_simulator
+
+RELEASE = FrameEncoder().encode(DataComm.RELEASE)
+
+
+@pytest.fixture
+def macro_file(tmp_path):
+    path = tmp_path / "macros.json"
+    path.write_text(
+        json.dumps(
+            {
+                "hotkeys": {"<ctrl>+<alt>+l": "login"},
+                "macros": {
+                    "login": [
+                        {"text": "admin"},
+                        {"keys": "tab"},
+                        {"text": "pa55!"},
+                        {"keys": "enter"},
+                    ],
+                    "bios": [{"keys": "f2", "times": 3, "interval": 0.01}],
+                },
+            }
+        )
+    )
+    return path
+
+
+class TestParseChord:
+    def test_modifiers_and_names(self):
+        """Modifier names combine, and key names map to usage codes"""
+        assert parse_chord("ctrl+alt+delete") == bytes((0x05, 0, 0x4C, 0, 0, 0, 0, 0))
+        assert parse_chord("F12") == bytes((0, 0, 0x45, 0, 0, 0, 0, 0))
+
+    def test_characters(self):
+        """Characters use the layout, including their Shift"""
+        assert parse_chord("ctrl+C") == bytes((0x03, 0, 0x06, 0, 0, 0, 0, 0))
+        assert parse_chord("ctrl++") == bytes((0x03, 0, 0x2E, 0, 0, 0, 0, 0))
+        assert parse_chord("gui+z", layout="de") == bytes((0x08, 0, 0x1C, 0, 0, 0, 0, 0))
+
+    def test_unknown_key(self):
+        with pytest.raises(ValueError):
+            parse_chord("ctrl+nope")
+
+
+class TestCompileMacro:
+    def test_blob(self):
+        """Text and chords are compiled into one blob"""
+        macro = compile_macro([{"text": "hi"}, {"keys": "enter"}])
+        enter = FrameEncoder().encode(bytes((0, 0, 0x28, 0, 0, 0, 0, 0)))
+        assert macro.blob == bytes(encode_text("hi")) + enter + RELEASE
+        assert macro.schedule == ((0.0, 0, len(macro.blob)),)
+
+    def test_schedule(self):
+        """Delays split the blob into scheduled slices"""
+        macro = compile_macro([{"keys": "f2", "times": 3, "interval": 0.5}, {"delay": 2}])
+        chord = len(macro.blob) // 3
+        assert macro.schedule == (
+            (0.0, 0, chord),
+            (0.5, chord, 2 * chord),
+            (0.5, 2 * chord, 3 * chord),
+            (2.0, 3 * chord, 3 * chord),
+        )
+        assert macro.duration == 3.0
+
+    def test_mouse(self):
+        """Clicks press and release at the given position"""
+        macro = compile_macro([{"click": "right", "at": [2048, 5000]}, {"scroll": -2}])
+        frames = [macro.blob[i : i + 13] for i in range(0, len(macro.blob), 13)]
+        assert [f[3] for f in frames] == [0x04, 0x04, 0x04]
+        assert frames[0][5:12] == bytes((0x02, 0x02, 0x00, 0x08, 0xFF, 0x0F, 0))
+        assert frames[1][6] == 0
+        assert frames[2][11] == 0xFE
+
+    def test_mouse_in_place(self):
+        """Clicks and scrolls before any position is given are relative, leaving the pointer"""
+        macro = compile_macro(
+            [{"click": "left"}, {"scroll": 1}, {"move": [10, 20]}, {"click": "left"}]
+        )
+        relative, absolute = macro.blob[:33], macro.blob[33:]
+        frames = [relative[i : i + 11] for i in range(0, len(relative), 11)]
+        assert [f[3] for f in frames] == [0x05, 0x05, 0x05]
+        assert [f[5:10] for f in frames] == [
+            bytes((0x01, 0x01, 0, 0, 0)),
+            bytes((0x01, 0x00, 0, 0, 0)),
+            bytes((0x01, 0x00, 0, 0, 1)),
+        ]
+        frames = [absolute[i : i + 13] for i in range(0, len(absolute), 13)]
+        assert [f[3] for f in frames] == [0x04, 0x04, 0x04]
+        assert frames[1][5:12] == bytes((0x02, 0x01, 10, 0, 20, 0, 0))
+
+    def test_unknown_step(self):
+        with pytest.raises(ValueError):
+            compile_macro([{"dance": True}])
+
+    def test_unknown_button(self):
+        with pytest.raises(ValueError, match="'thumb'"):
+            compile_macro([{"click": "thumb", "at": [0, 0]}])
+
+
+class TestMacroLibrary:
+    def test_run(self, macro_file, tmp_path):
+        """Running a macro writes its blob slice by slice"""
+        port = MagicMock()
+        library = MacroLibrary(macro_file, cache_dir=tmp_path / "cache")
+        assert library.run("bios", DataComm(port)) == len(library.get("bios").blob)
+        assert port.write.call_count == 3
+
+    def test_disk_cache(self, macro_file, tmp_path):
+        """Compiled macros are cached on disk, and not recompiled"""
+        cache = tmp_path / "cache"
+        compiled = MacroLibrary(macro_file, cache_dir=cache).get("login")
+        assert len(list(cache.glob("macro-*.bin"))) == 1
+
+        with patch("kvm_serial.utils.macro.compile_macro") as compile_mock:
+            assert MacroLibrary(macro_file, cache_dir=cache).get("login") == compiled
+            compile_mock.assert_not_called()
+
+        # A different layout compiles separately
+        MacroLibrary(macro_file, layout="us", cache_dir=cache).get("login")
+        assert len(list(cache.glob("macro-*.bin"))) == 2
+
+    def test_disk_cache_format(self, macro_file, tmp_path):
+        """The cache is the raw blob and a JSON schedule; a malformed one is recompiled"""
+        cache = tmp_path / "cache"
+        compiled = MacroLibrary(macro_file, cache_dir=cache).get("bios")
+        (blob,) = cache.glob("macro-*.bin")
+        assert blob.read_bytes() == compiled.blob
+        schedule = blob.with_suffix(".json")
+        assert json.loads(schedule.read_text()) == [list(entry) for entry in compiled.schedule]
+
+        schedule.write_text(json.dumps([[0, 0, len(compiled.blob) + 1]]))
+        assert MacroLibrary(macro_file, cache_dir=cache).get("bios") == compiled
+
+    def test_run_macro_timing(self):
+        """Scheduled delays are observed"""
+        port = MagicMock()
+        start = time.monotonic()
+        run_macro(DataComm(port), CompiledMacro(b"ab", ((0.0, 0, 1), (0.05, 1, 2))))
+        assert time.monotonic() - start >= 0.05
+        assert [bytes(c.args[0]) for c in port.write.call_args_list] == [b"a", b"b"]
+
+    def test_run_macro_counted(self):
+        """Macro writes go through DataComm, so they are counted like any other send"""
+        writes = REGISTRY.counter("kvm_datacomm_writes_total")
+        before = writes.value
+        run_macro(DataComm(MagicMock()), CompiledMacro(b"abc", ((0.0, 0, 1), (0.0, 1, 3))))
+        assert writes.value == before + 2
+
+    def test_simulator(self, macro_file, tmp_path, ch9329_simulator):
+        """The login macro types its text and keys on the device"""
+        library = MacroLibrary(macro_file, cache_dir=tmp_path / "cache")
+        serial = Serial(ch9329_simulator.port, 9600)
+        library.run("login", DataComm(serial))
+        frames = len(library.get("login").blob) // 14
+        assert ch9329_simulator.wait_for(frames)
+        serial.close()
+        assert ch9329_simulator.text() == "admin\tpa55!\n"
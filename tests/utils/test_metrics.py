@@ -0,0 +1,98 @@
+import urllib.request
+from unittest.mock import MagicMock
+
+import pytest
+
+from kvm_serial.utils.communication import DataComm
+from kvm_serial.utils.metrics import (
+    REGISTRY,
+    MetricsServer,
+    Registry,
+    TextfileExporter,
+)
+from kvm_serial.utils.writer import SerialWriter
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+class TestMetrics:
+    def test_counter_and_gauge(self, registry):
+        """Metrics are shared by name and labels, and rendered with them"""
+        events = registry.counter("events_total", "Events", backend="tty")
+        events.inc()
+        registry.counter("events_total", backend="tty").inc(2)
+        registry.counter("events_total", backend="mouse").inc()
+        registry.gauge("depth", "Depth", function=lambda: 7)
+
+        text = registry.render()
+        assert "# HELP events_total Events\n# TYPE events_total counter\n" in text
+        assert 'events_total{backend="tty"} 3\n' in text
+        assert 'events_total{backend="mouse"} 1\n' in text
+        assert "# TYPE depth gauge\ndepth 7\n" in text
+
+    def test_type_conflict(self, registry):
+        registry.counter("things")
+        with pytest.raises(ValueError):
+            registry.gauge("things")
+
+    def test_histogram(self, registry):
+        """Buckets are cumulative, with an +Inf bucket"""
+        latency = registry.histogram("latency_seconds", buckets=(0.001, 0.01))
+        for value in (0.0005, 0.001, 0.005, 2.0):
+            latency.observe(value)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{le="0.001"} 2\n' in text
+        assert 'latency_seconds_bucket{le="0.01"} 3\n' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4\n' in text
+        assert "latency_seconds_count 4\n" in text
+        assert latency.count == 4 and latency.sum == pytest.approx(2.0065)
+
+    def test_textfile(self, registry, tmp_path):
+        """The textfile is written on stop, with no temporary files left behind"""
+        registry.counter("written_total").inc(5)
+        path = tmp_path / "kvm.prom"
+        exporter = TextfileExporter(path, interval=60, registry=registry).start()
+        exporter.stop()
+        assert "written_total 5\n" in path.read_text()
+        assert [p.name for p in tmp_path.iterdir()] == ["kvm.prom"]
+
+    def test_http(self, registry):
+        """Metrics are served at /metrics"""
+        registry.counter("served_total").inc()
+        server = MetricsServer(0, registry=registry).start()
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+                assert response.headers["Content-Type"].startswith("text/plain")
+                assert b"served_total 1\n" in response.read()
+        finally:
+            server.stop()
+
+
+class TestInstrumentation:
+    def test_datacomm(self):
+        """DataComm counts its writes and bytes"""
+        writes = REGISTRY.counter("kvm_datacomm_writes_total")
+        sent = REGISTRY.counter("kvm_datacomm_bytes_total")
+        before = writes.value, sent.value
+
+        comm = DataComm(MagicMock())
+        comm.send_keypress(b"\x00\x00\x04\x00\x00\x00\x00\x00")
+        comm.send_many([DataComm.RELEASE] * 3)
+        assert writes.value - before[0] == 2
+        assert sent.value - before[1] == 5 * 14
+
+    def test_writer(self):
+        """A running writer's queue metrics are exported"""
+        writer = SerialWriter(MagicMock()).start()
+        writer.write(b"abc")
+        writer.flush()
+        writer.stop()
+
+        text = REGISTRY.render()
+        assert "kvm_writer_bytes_written_total 3\n" in text
+        assert "kvm_writer_queue_depth 0\n" in text
+        assert REGISTRY.histogram("kvm_writer_port_write_seconds").count >= 1
@@ -0,0 +1,86 @@
+from unittest.mock import MagicMock, patch
+
+from kvm_serial.utils.mousereport import BUTTON_LEFT, BUTTON_RIGHT, MouseReportEngine
+
+
+def sent_reports(comm):
+    """Return the data of every report passed to comm.send"""
+    return [c.args[0] for c in comm.send.call_args_list]
+
+
+class TestMouseReportEngine:
+    def test_tick_combines_state(self):
+        """Moves between ticks are combined into a single absolute report"""
+        comm = MagicMock()
+        engine = MouseReportEngine(comm, rate=60)
+        engine.move_to(100, 200)
+        engine.move_to(0x123, 0x456)
+
+        assert engine.tick()
+        assert sent_reports(comm) == [bytes((0x02, 0, 0x23, 0x01, 0x56, 0x04, 0))]
+        assert comm.send.call_args.kwargs["cmd"] == b"\x04"
+
+        # Nothing changed: no report
+        assert not engine.tick()
+        assert engine.reports == 1
+
+    def test_dead_zone_and_clamp(self):
+        """Moves inside the dead zone are suppressed and coordinates are clamped"""
+        comm = MagicMock()
+        engine = MouseReportEngine(comm, rate=60, dead_zone=2)
+        engine.move_to(2, 1)
+        assert not engine.tick()
+        engine.move_to(5000, -10)
+        assert engine.tick()
+        assert sent_reports(comm)[-1][2:6] == bytes((0xFF, 0x0F, 0, 0))
+
+    def test_buttons_held_across_moves(self):
+        """A held button is carried in every report, and changes are sent immediately"""
+        comm = MagicMock()
+        engine = MouseReportEngine(comm, rate=60)
+        engine.move_to(10, 10)
+        engine.set_button(BUTTON_LEFT, True)
+        engine.set_button(BUTTON_RIGHT, True)
+        engine.move_to(20, 20)
+        engine.tick()
+        engine.set_button(BUTTON_LEFT, False)
+
+        buttons = [report[1] for report in sent_reports(comm)]
+        assert buttons == [0x01, 0x03, 0x03, 0x02]
+        assert sent_reports(comm)[0][2] == 10
+
+    def test_scroll_accumulates(self):
+        """Fractional scroll is accumulated into whole notches"""
+        comm = MagicMock()
+        engine = MouseReportEngine(comm, rate=60, scroll_step=0.5)
+        engine.scroll(1)
+        assert not engine.tick()
+        engine.scroll(1)
+        assert engine.tick()
+        engine.scroll(-600)
+        assert engine.tick()
+
+        wheels = [report[6] for report in sent_reports(comm)]
+        assert wheels == [1, 0x81]  # +1, then clamped to -127
+        assert engine.tick()  # remainder of the large scroll is still pending
+
+    def test_per_event_mode(self):
+        """Without a rate, every event sends a report straight away"""
+        comm = MagicMock()
+        engine = MouseReportEngine(comm, rate=None)
+        engine.move_to(1, 1)
+        engine.scroll(1)
+        assert comm.send.call_count == 2
+        engine.start()
+        assert not engine.thread.is_alive()
+
+    def test_thread(self):
+        """The tick thread sends pending state, and stop() flushes the rest"""
+        comm = MagicMock()
+        engine = MouseReportEngine(comm, rate=1000)
+        engine.start()
+        engine.move_to(50, 50)
+        engine.stop()
+
+        assert not engine.thread.is_alive()
+        assert sent_reports(comm)[-1][2] == 50
@@ -0,0 +1,65 @@
+from unittest.mock import MagicMock
+
+from kvm_serial.utils.bulk import FRAME_LENGTH
+from kvm_serial.utils.communication import DataComm
+from kvm_serial.utils.paste import PASTE_END, PASTE_START, PasteParser, send_paste
+
+
+class TestPasteParser:
+    def test_segments(self):
+        """Typed keys and pasted blocks are separated, in order"""
+        parser = PasteParser()
+        segments = parser.feed(f"ab{PASTE_START}hello\nworld{PASTE_END}c")
+        assert segments == [(False, "ab"), (True, "hello\nworld"), (False, "c")]
+        assert not parser.in_paste
+
+    def test_split_markers(self):
+        """Markers and pastes may be split across reads"""
+        parser = PasteParser()
+        data = f"x{PASTE_START}pasted{PASTE_END}"
+        segments = []
+        for char in data:
+            segments += parser.feed(char)
+        assert segments == [(False, "x"), (True, "pasted")]
+
+    def test_lone_escape(self):
+        """An ESC is held back until flush(), in case it starts a marker"""
+        parser = PasteParser()
+        assert parser.feed("a\x1b") == [(False, "a")]
+        assert parser.pending
+        assert parser.flush() == [(False, "\x1b")]
+        assert parser.feed("\x1b[A") == [(False, "\x1b[A")]
+
+    def test_in_paste(self):
+        """A parser can start inside a paste, after its marker has been read"""
+        parser = PasteParser(in_paste=True)
+        assert parser.feed("abc") == []
+        assert parser.flush() == []
+        assert parser.feed(f"d{PASTE_END}") == [(True, "abcd")]
+
+
+class TestSendPaste:
+    def test_chunks(self):
+        """Text is sent in chunks, flushing and reporting progress after each"""
+        port = MagicMock()
+        progress = MagicMock()
+        sent = send_paste(DataComm(port), "a" * 70, chunk=32, progress=progress)
+
+        assert sent == 70
+        assert port.write.call_count == port.flush.call_count == 3
+        assert [c.args for c in progress.call_args_list] == [(32, 70), (64, 70), (70, 70)]
+        assert sum(len(c.args[0]) for c in port.write.call_args_list) == 140 * FRAME_LENGTH
+
+    def test_line_endings(self):
+        """CR and CRLF are typed as Enter"""
+        port = MagicMock()
+        send_paste(DataComm(port), "a\r\nb\rc")
+        frames = bytes(port.write.call_args.args[0])
+        enters = [frames[i + 7] for i in range(0, len(frames), FRAME_LENGTH)].count(0x28)
+        assert enters == 2
+
+    def test_cancel(self):
+        """Cancelling stops after the current chunk"""
+        port = MagicMock()
+        assert send_paste(DataComm(port), "a" * 100, chunk=10, cancelled=lambda: True) == 10
+        assert port.write.call_count == 1
@@ -0,0 +1,113 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from serial import Serial
+
+from kvm_serial.utils.communication import CMD_MOUSE_ABS, DataComm, FrameEncoder
+from kvm_serial.utils.recorder import Event, Player, Recorder, iter_log, load
+from kvm_serial.utils.utils import string_to_scancodes
+from tests._utilities import ch9329_simulator
+
+KEY_A = bytes((0, 0, 0x04, 0, 0, 0, 0, 0))
+MOVE = b"\x02\x00\x00\x08\x00\x08\x00"
+
+
+class TestRecorder:
+    def test_round_trip(self):
+        """Recorded reports decode with their command, data and timing"""
+        recorder = Recorder()
+        encoder = FrameEncoder()
+        recorder.record(encoder.encode(KEY_A), now=1_000_000_000)
+        recorder.record(encoder.encode(DataComm.RELEASE), now=1_010_000_000)
+        recorder.record(encoder.encode(MOVE, CMD_MOUSE_ABS), now=1_500_000_000)
+
+        events = list(iter_log(recorder.getvalue()))
+        assert events == [
+            Event(0.0, 0x02, KEY_A),
+            Event(0.01, 0x02, DataComm.RELEASE),
+            Event(0.5, 0x04, MOVE),
+        ]
+
+    def test_compact_encoding(self):
+        """Repeated reports are stored as a reference to their first occurrence"""
+        recorder = Recorder(compact_every=2)
+        frames = FrameEncoder().encode(KEY_A) + FrameEncoder().encode(DataComm.RELEASE)
+        for i in range(100):
+            recorder.record(frames, now=i * 1_000_000)
+
+        log = recorder.getvalue()
+        assert recorder.reports == 200
+        assert len(log) < 200 * 5
+        assert [e.data for e in iter_log(log)][-2:] == [KEY_A, DataComm.RELEASE]
+
+    def test_tap(self):
+        """A tapped port records frames split across writes, and ignores replies"""
+        port = MagicMock()
+        recorder = Recorder()
+        tapped = recorder.tap(port)
+        frame = FrameEncoder().encode(KEY_A)
+
+        DataComm(tapped).send_many([KEY_A, DataComm.RELEASE])
+        tapped.write(frame[:5])
+        tapped.write(frame[5:])
+        tapped.write(FrameEncoder().encode(b"", b"\x01"))  # GET_INFO is not a HID report
+        tapped.flush()
+
+        assert [e.data for e in iter_log(recorder.getvalue())] == [KEY_A, DataComm.RELEASE, KEY_A]
+        port.flush.assert_called_once()
+
+    def test_bad_log(self):
+        """Non-recordings are rejected"""
+        with pytest.raises(ValueError):
+            list(iter_log(b"garbage"))
+
+    def test_save_load(self, tmp_path):
+        """Recordings survive a save and load"""
+        recorder = Recorder()
+        DataComm(recorder.tap(MagicMock())).send_many(string_to_scancodes("hi"))
+        recorder.save(tmp_path / "session.kvmr")
+
+        assert [e.data for e in load(tmp_path / "session.kvmr")] == [
+            bytes(s) for s in string_to_scancodes("hi")
+        ]
+
+
+class TestPlayer:
+    EVENTS = [Event(0.0, 0x02, KEY_A), Event(0.0, 0x02, DataComm.RELEASE), Event(0.1, 0x04, MOVE)]
+
+    def test_max_speed(self):
+        """At maximum speed, events are sent in one write"""
+        port = MagicMock()
+        assert Player(DataComm(port), speed=None).play(self.EVENTS) == 3
+
+        encoder = FrameEncoder()
+        port.write.assert_called_once_with(
+            encoder.encode(KEY_A) + encoder.encode(DataComm.RELEASE) + encoder.encode(MOVE, b"\x04")
+        )
+
+    def test_timing(self):
+        """Timed playback groups simultaneous events and waits for later ones"""
+        port = MagicMock()
+        start = time.monotonic()
+        Player(DataComm(port), speed=2.0).play(self.EVENTS)
+
+        assert time.monotonic() - start >= 0.05
+        assert port.write.call_count == 2
+
+    def test_invalid_speed(self):
+        with pytest.raises(ValueError):
+            Player(DataComm(MagicMock()), speed=0)
+
+    def test_replay_to_simulator(self, ch9329_simulator):
+        """A recording replays to the device as it was sent"""
+        recorder = Recorder()
+        DataComm(recorder.tap(MagicMock())).send_many(
+            [s for c in string_to_scancodes("Replay!") for s in (c, DataComm.RELEASE)]
+        )
+
+        serial = Serial(ch9329_simulator.port, 9600)
+        Player(DataComm(serial), speed=None).play(iter_log(recorder.getvalue()))
+        assert ch9329_simulator.wait_for(14)
+        serial.close()
+        assert ch9329_simulator.text() == "Replay!"
@@ -0,0 +1,130 @@
+import pytest
+from unittest.mock import MagicMock
+
+from serial import SerialException
+
+from kvm_serial.utils.communication import FrameEncoder
+from kvm_serial.utils.replies import Frame, FrameParser, ReplyReader, ReplyTracker, iter_commands
+from kvm_serial.utils.writer import SerialWriter
+
+enc = FrameEncoder()
+ACK_KEYBOARD = b"\x57\xab\x00\x82\x01\x00\x85"
+ACK_MOUSE = enc.encode(b"\x00", cmd=b"\x84")
+NAK_KEYBOARD = enc.encode(b"\xe4", cmd=b"\xc2")
+KEY = enc.encode(bytes(8))
+MOVE = enc.encode(b"\x02\x00\x00\x08\x00\x08\x00", cmd=b"\x04")
+
+
+class TestFrameParser:
+    def test_parse_reply(self):
+        """A complete reply frame is parsed"""
+        parser = FrameParser()
+        assert parser.feed(ACK_KEYBOARD) == [Frame(0x00, 0x82, b"\x00")]
+        assert parser.frames == 1
+
+    def test_parse_split_chunks(self):
+        """Frames split across arbitrary chunk boundaries are reassembled"""
+        stream = ACK_KEYBOARD + ACK_MOUSE + NAK_KEYBOARD
+        parser = FrameParser()
+        frames = []
+        for i in range(len(stream)):
+            frames += parser.feed(stream[i : i + 1])
+        assert [f.cmd for f in frames] == [0x82, 0x84, 0xC2]
+        assert parser.discarded == 0
+
+    def test_resync(self):
+        """Garbage and corrupted frames are skipped without losing following frames"""
+        corrupt = bytearray(ACK_MOUSE)
+        corrupt[-1] ^= 0xFF
+        parser = FrameParser()
+        frames = parser.feed(b"\x00\x57\x12" + bytes(corrupt) + ACK_KEYBOARD + b"\x57")
+        assert frames == [Frame(0x00, 0x82, b"\x00")]
+        assert parser.checksum_errors == 1
+        assert parser.discarded > 0
+
+        # Trailing 0x57 was kept as a possible header
+        assert parser.feed(ACK_KEYBOARD[1:]) == [Frame(0x00, 0x82, b"\x00")]
+
+    def test_iter_commands(self):
+        """Commands of back-to-back outgoing frames are found"""
+        assert list(iter_commands(KEY + MOVE + KEY)) == [0x02, 0x04, 0x02]
+
+
+class TestReplyTracker:
+    def test_match_and_rtt(self):
+        """Replies are matched to sent frames and round-trip times recorded"""
+        tracker = ReplyTracker()
+        listener = MagicMock()
+        tracker.listeners.append(listener)
+
+        tracker.sent(KEY + MOVE, now=1.0)
+        assert tracker.pending == 2
+        assert tracker.received(Frame(0, 0x82, b"\x00"), now=1.01) == pytest.approx(0.01)
+        assert tracker.received(Frame(0, 0x84, b"\x00"), now=1.03) == pytest.approx(0.03)
+        assert tracker.pending == 0
+        assert tracker.acked == 2
+        assert listener.call_args.args[:2] == (0x04, 0x00)
+
+        stats = tracker.stats()
+        assert stats["rtt_p50"] is not None and stats["rtt_p99"] >= stats["rtt_p50"]
+
+    def test_stamped_at_wire_completion(self):
+        """Frames in one write are stamped as they finish sending, behind any still sending"""
+        tracker = ReplyTracker(byte_time=0.001)
+        tracker.sent(KEY * 3, now=1.0)
+        tracker.sent(KEY, now=1.0)  # Queued behind the first write
+
+        ends = [1.0 + 0.014 * n for n in range(1, 5)]
+        rtts = [tracker.received(Frame(0, 0x82, b"\x00"), now=end + 0.002) for end in ends]
+        assert rtts == pytest.approx([0.002] * 4)
+
+    def test_errors_and_loss(self):
+        """Error replies are counted by status, and skipped frames count as lost"""
+        tracker = ReplyTracker(timeout=0.5)
+        tracker.sent(KEY + MOVE + KEY, now=0.0)
+
+        # The mouse frame got no reply
+        tracker.received(Frame(0, 0x82, b"\x00"), now=0.1)
+        tracker.received(Frame(0, 0xC2, b"\xe4"), now=0.2)
+        assert tracker.lost == 1
+        assert tracker.errors[0xE4] == 1
+        assert tracker.stats()["errors"] == {"checksum error": 1}
+
+        # Nothing left to match
+        assert tracker.received(Frame(0, 0x82, b"\x00"), now=0.3) is None
+        assert tracker.unmatched == 1
+
+        tracker.sent(KEY, now=1.0)
+        assert tracker.expire(now=2.0) == 1
+        assert tracker.lost == 2
+        assert ReplyTracker().percentile(50) is None
+
+    def test_attach_writer(self):
+        """Attached trackers see every write made by a SerialWriter"""
+        port = MagicMock()
+        tracker = ReplyTracker()
+        writer = SerialWriter(port)
+        tracker.attach(writer)
+        writer.write(KEY)
+        writer.start()
+        writer.stop()
+        assert tracker.sent_frames == 1
+
+
+class TestReplyReader:
+    def test_reader_thread(self):
+        """Replies read from the port are fed to the tracker"""
+        port = MagicMock()
+        port.timeout = None
+        port.in_waiting = 0
+        port.read.side_effect = [ACK_KEYBOARD[:3], ACK_KEYBOARD[3:], b"", SerialException("gone")]
+
+        tracker = ReplyTracker()
+        tracker.sent(KEY)
+        reader = ReplyReader(port, tracker)
+        assert port.timeout == 0.1
+
+        reader.start()
+        reader.thread.join(timeout=1)
+        reader.stop()
+        assert tracker.acked == 1
@@ -0,0 +1,168 @@
+from unittest.mock import patch
+
+from kvm_serial.utils.communication import FrameEncoder
+from kvm_serial.utils.scheduler import FrameScheduler, Priority
+from kvm_serial.utils.writer import SerialWriter
+from tests._utilities import MockSerial, mock_serial
+
+enc = FrameEncoder()
+KEY = enc.encode(bytes((0, 0, 4, 0, 0, 0, 0, 0)))
+MOVE = enc.encode(b"\x02\x00\x00\x08\x00\x08\x00", cmd=b"\x04")
+MOVE_2 = enc.encode(b"\x02\x00\x10\x08\x00\x08\x00", cmd=b"\x04")
+DRAG = enc.encode(b"\x02\x01\x10\x08\x00\x08\x00", cmd=b"\x04")
+CLICK = enc.encode(b"\x01\x01\x00\x00\x00", cmd=b"\x05")
+UNCLICK = enc.encode(b"\x01\x00\x00\x00\x00", cmd=b"\x05")
+SCROLL = enc.encode(b"\x01\x00\x00\x00\x01", cmd=b"\x05")
+REL_MOVE = enc.encode(b"\x01\x00\x01\x00\x00", cmd=b"\x05")
+
+
+class TestFrameScheduler:
+    def test_classify(self):
+        """Frames are classified by command, button changes and wheel movement"""
+        sched = FrameScheduler()
+        assert sched.push(KEY) is Priority.KEYBOARD
+        assert sched.push(b"\x00") is Priority.KEYBOARD
+        assert sched.push(MOVE) is Priority.MOTION
+        assert sched.push(CLICK) is Priority.BUTTON
+        assert sched.push(SCROLL) is Priority.BUTTON  # button released
+        assert sched.push(SCROLL) is Priority.SCROLL
+        assert sched.push(REL_MOVE) is Priority.MOTION
+
+    def test_classify_has_no_side_effects(self):
+        """Classifying a write does not change how later writes are classified"""
+        sched = FrameScheduler()
+        assert sched.classify(CLICK) is Priority.BUTTON
+        assert sched.classify(CLICK) is Priority.BUTTON
+        assert sched.classify(MOVE) is Priority.MOTION
+
+    def test_classify_multiple_frames(self):
+        """A write of several frames takes the most important class among them"""
+        sched = FrameScheduler()
+        assert sched.classify(MOVE + CLICK) is Priority.BUTTON
+        assert sched.classify(MOVE + KEY) is Priority.KEYBOARD
+        assert sched.classify(MOVE + MOVE_2) is Priority.MOTION
+
+        # The button state after the write is that of its last mouse frame
+        sched.push(CLICK + DRAG)
+        assert sched.classify(DRAG) is Priority.MOTION
+        assert sched.classify(MOVE) is Priority.BUTTON
+
+    def test_button_state_follows_sent_frames(self):
+        """A dropped button change is not taken as having been sent"""
+        sched = FrameScheduler()
+        sched.push(CLICK)
+        assert sched.drop_oldest()
+        assert sched.push(MOVE) is Priority.MOTION  # Buttons still up at the target
+
+        sched.pop()
+        sched.push(CLICK)
+        sched.pop()
+        assert sched.push(MOVE) is Priority.BUTTON  # Release after the sent click
+
+    def test_queued_writes_not_rescanned(self):
+        """Pushing and popping never walks the frames of writes already queued"""
+        import kvm_serial.utils.scheduler as scheduler
+
+        sched = FrameScheduler()
+        paste = KEY * 20_000
+        with patch.object(scheduler, "_frames", wraps=scheduler._frames) as frames:
+            sched.push(paste)
+            sched.push(CLICK + DRAG)
+            assert sched.push(MOVE) is Priority.BUTTON  # Buttons released after the drag
+            assert sched.pop() == paste
+            assert [len(c.args[0]) for c in frames.call_args_list] == [len(CLICK + DRAG), 13]
+
+    def test_keys_and_buttons_keep_order(self):
+        """Key reports and button changes are sent in the order they were queued"""
+        sched = FrameScheduler()
+        for frame in (CLICK, KEY, UNCLICK):
+            sched.push(frame)
+
+        assert [sched.pop() for _ in range(3)] == [CLICK, KEY, UNCLICK]
+
+    def test_keyboard_overtakes_motion(self):
+        """Key reports are popped ahead of queued motion and scroll"""
+        sched = FrameScheduler()
+        for frame in (MOVE, REL_MOVE, SCROLL, KEY):
+            sched.push(frame)
+
+        assert len(sched) == 4
+        assert [sched.pop() for _ in range(4)] == [KEY, SCROLL, MOVE, REL_MOVE]
+        assert sched.pop() is None
+        assert not sched
+
+    def test_button_waits_for_earlier_motion(self):
+        """A click is never sent before motion queued ahead of it"""
+        sched = FrameScheduler()
+        for frame in (MOVE, CLICK, DRAG, UNCLICK, MOVE_2, CLICK):
+            sched.push(frame)
+
+        assert sched.pop() == MOVE
+        assert sched.pop() == CLICK
+        assert sched.pop() == DRAG
+        assert sched.pop() == UNCLICK
+        assert sched.pop() == MOVE_2
+        assert sched.pop() == CLICK
+
+    def test_coalesce_absolute_moves(self):
+        """Only the newest queued absolute move is kept"""
+        sched = FrameScheduler()
+        for frame in (MOVE, MOVE_2, MOVE, MOVE_2):
+            sched.push(frame)
+
+        assert len(sched) == 1
+        assert sched.coalesced == 3
+        assert sched.pop() == MOVE_2
+
+    def test_coalesce_keeps_ordering(self):
+        """Moves are not merged across button changes or relative moves"""
+        sched = FrameScheduler()
+        for frame in (MOVE, CLICK, DRAG, DRAG, UNCLICK, MOVE_2, REL_MOVE, MOVE, MOVE_2):
+            sched.push(frame)
+
+        assert sched.coalesced == 2
+        assert [sched.pop() for _ in range(len(sched))] == [
+            MOVE,
+            CLICK,
+            DRAG,
+            UNCLICK,
+            MOVE_2,
+            REL_MOVE,
+            MOVE_2,
+        ]
+
+    def test_drop_oldest(self):
+        """Least important frames are dropped first"""
+        sched = FrameScheduler()
+        sched.push(KEY)
+        sched.push(MOVE)
+        assert sched.drop_oldest()
+        assert sched.pop() == KEY
+        assert not sched.drop_oldest()
+
+    @patch("kvm_serial.utils.scheduler.time.monotonic")
+    def test_bandwidth_budget(self, mock_time):
+        """Budget is derived from baud rate and refills over time"""
+        mock_time.return_value = 0.0
+        sched = FrameScheduler(baud=9600, burst=14)
+
+        assert sched.rate == 960
+        assert sched.wait_time() == 0
+        assert sched.consume(28) == -14
+        assert sched.wait_time() == 14 / 960
+
+        mock_time.return_value = 14 / 960
+        assert sched.wait_time() == 0
+        assert FrameScheduler().consume(1000) == float("inf")
+
+    def test_writer_paced(self, mock_serial):
+        """SerialWriter paced at the baud rate still delivers every frame, keys first"""
+        writer = SerialWriter(mock_serial, baud=115200)
+        for frame in (MOVE, MOVE_2, KEY):
+            writer.write(frame)
+        writer.start()
+        writer.stop()
+
+        written = b"".join(c.args[0] for c in mock_serial.write.call_args_list)
+        assert written == KEY + MOVE_2
+        assert writer.stats()["coalesced"] == 1
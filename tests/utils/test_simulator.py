@@ -0,0 +1,117 @@
+import time
+
+import pytest
+from serial import Serial
+
+from kvm_serial.utils.baudrate import get_info, upgrade_baud
+from kvm_serial.utils.communication import CMD_MOUSE_ABS, DataComm
+from kvm_serial.utils.replies import ReplyReader, ReplyTracker
+from kvm_serial.utils.simulator import CH9329Simulator
+from kvm_serial.utils.utils import optimise_scancodes, string_to_scancodes
+from tests._utilities import ch9329_simulator
+
+
+@pytest.fixture
+def port(ch9329_simulator):
+    serial = Serial(ch9329_simulator.port, 9600, timeout=0.5)
+    yield serial
+    serial.close()
+
+
+class TestCH9329Simulator:
+    def test_keyboard_reports(self, ch9329_simulator, port):
+        """Keypresses sent through DataComm are decoded back to text"""
+        comm = DataComm(port)
+        for scancode in string_to_scancodes("Hi!"):
+            comm.send_keypress(scancode)
+
+        assert ch9329_simulator.wait_for(6)
+        assert ch9329_simulator.text() == "Hi!"
+        assert ch9329_simulator.keyboard_reports()[1] == DataComm.RELEASE
+
+    def test_optimised_text(self, ch9329_simulator, port):
+        """Optimised sequences, including rollover, type the original text"""
+        text = "Hello, WORLD!! aaa"
+        comm = DataComm(port)
+        reports = optimise_scancodes(text, rollover=3)
+        comm.send_many(reports)
+
+        assert ch9329_simulator.wait_for(len(reports))
+        assert ch9329_simulator.text() == text
+
+    def test_replies(self, ch9329_simulator, port):
+        """Every frame is acknowledged and the acknowledgements match up"""
+        tracker = ReplyTracker()
+        reader = ReplyReader(port, tracker).start()
+        comm = DataComm(port)
+        data = comm.encoder.encode(DataComm.RELEASE)
+        tracker.sent(data * 10)
+        port.write(data * 10)
+
+        deadline = time.monotonic() + 5
+        while tracker.acked < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        reader.stop()
+
+        assert tracker.acked == 10
+        assert tracker.lost == 0
+
+    def test_checksum_error(self, ch9329_simulator, port):
+        """A corrupted frame is rejected with status 0xE4"""
+        frame = bytearray(DataComm(port).encoder.encode(DataComm.RELEASE))
+        frame[-1] ^= 0xFF
+        port.write(frame)
+
+        reply = port.read(7)
+        assert reply[3] == 0xC2
+        assert reply[5] == 0xE4
+        assert ch9329_simulator.checksum_errors == 1
+        assert ch9329_simulator.reports == []
+
+    def test_mouse_reports(self, ch9329_simulator, port):
+        """Mouse frames are recorded separately from keyboard frames"""
+        DataComm(port).send(b"\x02\x00\x00\x08\x00\x08\x00", cmd=CMD_MOUSE_ABS)
+
+        assert ch9329_simulator.wait_for(1)
+        assert ch9329_simulator.mouse_reports()[0].cmd == CMD_MOUSE_ABS[0]
+        assert ch9329_simulator.keyboard_reports() == []
+
+    def test_get_info(self, port):
+        """GET_INFO is answered with the chip version"""
+        assert get_info(port)["version"] == 0x30
+
+    def test_buffer_overrun(self):
+        """Frames arriving faster than the chip forwards them overflow its buffer"""
+        with CH9329Simulator(timing=False, buffer_frames=4, report_interval=1.0) as sim:
+            serial = Serial(sim.port, 9600)
+            DataComm(serial).send_many([DataComm.RELEASE] * 10)
+            assert sim.wait_for(4)
+            time.sleep(0.1)
+            serial.close()
+
+        assert len(sim.reports) == 4
+        assert sim.overruns == 6
+
+    def test_baud_timing(self):
+        """With timing enabled, frames are consumed no faster than the baud rate allows"""
+        with CH9329Simulator(baud=9600) as sim:
+            serial = Serial(sim.port, 9600)
+            start = time.monotonic()
+            DataComm(serial).send_many([DataComm.RELEASE] * 20)  # 20 * 14 bytes = ~0.29s
+            assert sim.wait_for(20)
+            elapsed = time.monotonic() - start
+            serial.close()
+
+        assert elapsed >= 0.25
+
+    def test_upgrade_baud(self):
+        """The simulated chip can be moved to a new rate, and ignores a mismatched host"""
+        with CH9329Simulator(baud=9600, timing=False, check_baud=True) as sim:
+            serial = Serial(sim.port, 9600, timeout=0.5)
+            assert upgrade_baud(serial, 115200, current=9600, settle=0) == 115200
+            assert sim.baud == 115200
+
+            serial.baudrate = 9600
+            assert get_info(serial, timeout=0.2) is None
+            assert sim.garbled > 0
+            serial.close()
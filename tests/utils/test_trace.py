@@ -0,0 +1,81 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from kvm_serial.backend.implementations.ttyop import TtyOp
+from kvm_serial.utils.communication import DataComm
+from kvm_serial.utils.trace import TRACER
+from kvm_serial.utils.writer import SerialWriter
+
+KEY = b"\x00\x00\x04\x00\x00\x00\x00\x00"
+
+
+@pytest.fixture
+def tracer():
+    yield TRACER.start()
+    TRACER.stop()
+
+
+def spans(tracer, name=None):
+    return [e for e in tracer.events if name is None or e["name"] == name]
+
+
+class TestTrace:
+    def test_disabled(self):
+        """Nothing is recorded unless tracing is started"""
+        assert TRACER.begin("tty") is None
+        DataComm(MagicMock()).send_keypress(KEY)
+        assert TRACER.current() is None
+
+    @patch.object(TtyOp, "_read", return_value="a")
+    def test_direct(self, mock_read, tracer, capsys):
+        """A key written straight to the port is traced from its source to the write"""
+        TtyOp(MagicMock())._parse_key()
+
+        assert [e["name"] for e in tracer.events] == ["key", "encode", "write"]
+        key, encode, write = tracer.events
+        assert key["args"]["backend"] == "tty" and key["ph"] == "X"
+        assert key["dur"] >= encode["dur"] + write["dur"] >= 0
+        assert encode["ts"] <= write["ts"]
+
+        # Further writes for the same event are not traced again
+        DataComm(MagicMock()).release()
+        assert len(tracer.events) == 3
+
+    def test_writer(self, tracer):
+        """Writes through a SerialWriter are traced through its queue"""
+        writer = SerialWriter(MagicMock()).start()
+        comm = DataComm(writer)
+        for name in ("press", "release"):
+            tracer.begin("pynput", name)
+            comm.send(KEY)
+        writer.flush()
+        writer.stop()
+
+        keys = [e for e in tracer.events if e["name"] in ("press", "release")]
+        assert [e["name"] for e in keys] == ["press", "release"]
+        assert len(spans(tracer, "queue")) == len(spans(tracer, "write")) == 2
+        assert all(
+            e["ts"] >= k["ts"]
+            for k in keys
+            for e in spans(tracer)
+            if e["args"]["id"] == k["args"]["id"]
+        )
+
+    def test_dump(self, tracer, tmp_path):
+        """The dump is Chrome trace JSON, with a named track per backend"""
+        for backend in ("curses", "usb"):
+            tracer.begin(backend)
+            DataComm(MagicMock()).send_keypress(KEY)
+        path = tmp_path / "trace.json"
+        tracer.dump(path)
+
+        trace = json.loads(path.read_text())
+        names = {
+            e["args"]["name"]: e["tid"]
+            for e in trace["traceEvents"]
+            if e["ph"] == "M" and "tid" in e
+        }
+        assert set(names) == {"curses", "usb"}
+        assert {e["tid"] for e in trace["traceEvents"] if e["ph"] == "X"} == set(names.values())
@@ -0,0 +1,89 @@
+from unittest.mock import MagicMock
+
+import pytest
+from serial import Serial
+
+from kvm_serial.utils.bulk import FRAME_LENGTH, encode_text
+from kvm_serial.utils.communication import DataComm
+from kvm_serial.utils.typefile import FileTyper, type_file
+from tests._utilities import ch9329_simulator
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_text("Héllo wörld! 1234\n" * 20, encoding="utf-8")
+    return path
+
+
+class TestFileTyper:
+    def test_chunks(self, text_file):
+        """The file is sent in bounded chunks, flushing after each"""
+        port = MagicMock()
+        typer = FileTyper(DataComm(port), text_file, chunk_size=64)
+
+        assert typer.run() == typer.total
+        sent = b"".join(bytes(call.args[0]) for call in port.write.call_args_list)
+        assert sent == bytes(encode_text(text_file.read_text(encoding="utf-8")))
+        assert port.write.call_count == port.flush.call_count > 1
+        assert max(len(call.args[0]) for call in port.write.call_args_list) <= 64 * 2 * 14
+
+    def test_rate_controlled(self, text_file):
+        """With a rate controller, each chunk is typed at its rate"""
+        rate = MagicMock()
+        rate.send_many.return_value = 1
+        typer = FileTyper(DataComm(MagicMock(), rate), text_file, chunk_size=64)
+
+        assert typer.run() == typer.total
+        sent = b"".join(bytes(call.args[1]) for call in rate.send_many.call_args_list)
+        assert sent == bytes(encode_text(text_file.read_text(encoding="utf-8")))
+
+    def test_utf8_boundaries(self, text_file):
+        """Chunks never split a multi-byte character"""
+        port = MagicMock()
+        FileTyper(DataComm(port), text_file, chunk_size=2).run()
+        sent = b"".join(bytes(call.args[0]) for call in port.write.call_args_list)
+        assert sent == bytes(encode_text(text_file.read_text(encoding="utf-8")))
+
+    def test_resume(self, text_file):
+        """Stopping reports an offset which resumes without repeating text"""
+        port = MagicMock()
+        offsets = []
+
+        def progress(status):
+            offsets.append(status.offset)
+            if len(offsets) == 3:
+                typer.stop()
+
+        typer = FileTyper(DataComm(port), text_file, chunk_size=50, progress=progress)
+        stopped_at = typer.run()
+        assert stopped_at == offsets[-1] < typer.total
+
+        assert type_file(DataComm(port), text_file, offset=stopped_at, chunk_size=50) == (
+            typer.total
+        )
+        sent = b"".join(bytes(call.args[0]) for call in port.write.call_args_list)
+        assert sent == bytes(encode_text(text_file.read_text(encoding="utf-8")))
+
+    def test_empty_file(self, tmp_path):
+        """An empty file types nothing"""
+        path = tmp_path / "empty.txt"
+        path.write_bytes(b"")
+        port = MagicMock()
+        assert type_file(DataComm(port), path) == 0
+        port.write.assert_not_called()
+
+    def test_simulator(self, ch9329_simulator, tmp_path):
+        """Typed files arrive intact at a simulated CH9329"""
+        path = tmp_path / "script.sh"
+        path.write_text("echo 'Hello, World!'\nls -la ~\n")
+        serial = Serial(ch9329_simulator.port, 9600)
+
+        typer = FileTyper(DataComm(serial), path, chunk_size=16, layout="us", minimal=True)
+        typer.run()
+        serial.close()
+
+        frames = len(encode_text(path.read_text(), "us", minimal=True)) // FRAME_LENGTH
+        assert ch9329_simulator.wait_for(frames)
+        assert typer.status().fraction == 1.0
+        assert ch9329_simulator.text(layout="us") == path.read_text()
@@ -8,6 +8,7 @@ from kvm_serial.utils.utils import (
     build_scancode,
     merge_scancodes,
     string_to_scancodes,
+    optimise_scancodes,
 )
 
 
@@ -73,6 +74,11 @@ class TestAsciiToScancode:
     def test_invalid_char(self):
         """Test invalid character returns zero scancode"""
         expected = array("B", [0, 0, 0, 0, 0, 0, 0, 0])
+        assert ascii_to_scancode("☃") == expected
+
+    def test_altgr_char(self):
+        """Characters typed with AltGr carry the Right Alt modifier"""
+        expected = array("B", [0x40, 0, 0x21, 0, 0, 0, 0, 0])
         assert ascii_to_scancode("€") == expected
 
 
@@ -151,3 +157,46 @@ class TestStringToScancodes:
             string_to_scancodes("a", key_repeat=0)
         with pytest.raises(ValueError):
             string_to_scancodes("a", key_up=-1)
+
+
+class TestOptimiseScancodes:
+    def test_shift_held(self):
+        """Shift stays held across a run of capitals, with no releases in between"""
+        codes = [bytes(s) for s in optimise_scancodes("ABc")]
+        assert codes == [
+            bytes((0x2, 0, 0x04, 0, 0, 0, 0, 0)),
+            bytes((0x2, 0, 0x05, 0, 0, 0, 0, 0)),
+            bytes((0x0, 0, 0x06, 0, 0, 0, 0, 0)),
+            bytes(8),
+        ]
+
+    def test_repeated_key(self):
+        """A release is inserted only where the same key repeats"""
+        codes = [bytes(s) for s in optimise_scancodes("aab")]
+        assert codes == [
+            bytes((0, 0, 0x04, 0, 0, 0, 0, 0)),
+            bytes(8),
+            bytes((0, 0, 0x04, 0, 0, 0, 0, 0)),
+            bytes((0, 0, 0x05, 0, 0, 0, 0, 0)),
+            bytes(8),
+        ]
+
+    def test_rollover(self):
+        """Several new keys can be pressed per report"""
+        codes = optimise_scancodes("abcde", rollover=3)
+        assert [bytes(s) for s in codes] == [
+            bytes((0, 0, 0x04, 0x05, 0x06, 0, 0, 0)),
+            bytes((0, 0, 0x07, 0x08, 0, 0, 0, 0)),
+            bytes(8),
+        ]
+
+    def test_shorter(self):
+        """The sequence is shorter than press/release per character"""
+        text = "Hello, World!"
+        assert len(optimise_scancodes(text)) < len(string_to_scancodes(text, key_up=1))
+        assert optimise_scancodes("") == []
+
+    def test_invalid_rollover(self):
+        """Rollover is limited to the six key slots"""
+        with pytest.raises(ValueError):
+            optimise_scancodes("a", rollover=7)
@@ -0,0 +1,127 @@
+import threading
+from unittest.mock import MagicMock
+
+from kvm_serial.utils.communication import DataComm
+from kvm_serial.utils.writer import Backpressure, SerialWriter
+from tests._utilities import MockSerial, mock_serial
+
+
+class TestSerialWriter:
+    def test_writes_in_order(self, mock_serial):
+        """Queued writes reach the port in order and metrics are updated"""
+        writer = SerialWriter(mock_serial).start()
+        for i in range(10):
+            writer.write(bytes([i]))
+        assert writer.flush(timeout=1)
+        writer.stop()
+
+        written = b"".join(c.args[0] for c in mock_serial.write.call_args_list)
+        assert written == bytes(range(10))
+        stats = writer.stats()
+        assert stats["enqueued"] == stats["written"] == 10
+        assert stats["bytes_written"] == 10
+        assert stats["depth"] == 0
+
+    def test_frames_not_torn(self, mock_serial):
+        """Frames written concurrently by several threads are never interleaved"""
+        writer = SerialWriter(mock_serial, maxsize=8).start()
+        comm = DataComm(writer)
+
+        def produce(key):
+            scancode = bytes((0, 0, key, 0, 0, 0, 0, 0))
+            for _ in range(200):
+                comm.send_keypress(scancode)
+
+        threads = [threading.Thread(target=produce, args=(k,)) for k in (4, 5, 6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        writer.stop()
+
+        written = b"".join(c.args[0] for c in mock_serial.write.call_args_list)
+        frames = [written[i : i + 14] for i in range(0, len(written), 14)]
+        assert len(frames) == 3 * 200 * 2
+        assert all(f[:5] == b"\x57\xab\x00\x02\x08" for f in frames)
+        assert all(f[-1] == sum(f[:-1]) % 256 for f in frames)
+        assert writer.dropped == 0
+
+    def test_drop_newest(self, mock_serial):
+        """DROP_NEWEST discards writes once the queue is full"""
+        writer = SerialWriter(mock_serial, maxsize=2, policy="drop_newest")
+        assert writer.write(b"a") == 1
+        assert writer.write(b"b") == 1
+        assert writer.write(b"c") == 0
+        assert writer.dropped == 1
+
+        writer.start()
+        writer.stop()
+        mock_serial.write.assert_called_once_with(b"ab")
+
+    def test_drop_oldest(self, mock_serial):
+        """DROP_OLDEST keeps the newest writes"""
+        writer = SerialWriter(mock_serial, maxsize=2, policy=Backpressure.DROP_OLDEST)
+        for data in (b"a", b"b", b"c"):
+            writer.write(data)
+        assert writer.dropped == 1
+        assert writer.max_depth == 2
+
+        writer.start()
+        writer.stop()
+        mock_serial.write.assert_called_once_with(b"bc")
+
+    def test_block_timeout(self, mock_serial):
+        """BLOCK waits for space, then drops once the timeout expires"""
+        writer = SerialWriter(mock_serial, maxsize=1, timeout=0.01)
+        writer.running = True
+        writer.write(b"a")
+        assert writer.write(b"b") == 0
+        assert writer.dropped == 1
+
+    def test_write_error(self):
+        """Port errors are counted and do not stop the writer thread"""
+        port = MagicMock()
+        port.write.side_effect = [OSError("unplugged"), 1]
+        writer = SerialWriter(port).start()
+        writer.write(b"a")
+        writer.flush(timeout=1)
+        writer.write(b"b")
+        writer.close()
+
+        assert writer.errors == 1
+        assert writer.written == 1
+        port.close.assert_called_once()
+
+    def test_flush_without_thread(self, mock_serial):
+        """flush() returns at once when no writer thread will write the queue"""
+        writer = SerialWriter(mock_serial)
+        assert writer.flush()
+        writer.write(b"a")
+        assert not writer.flush()
+
+        writer.start()
+        writer.stop()
+        assert writer.flush()
+        writer.write(b"b")
+        assert not writer.flush()
+
+    def test_block_after_stop(self, mock_serial):
+        """BLOCK does not wait for space which a stopped writer will never make"""
+        writer = SerialWriter(mock_serial, maxsize=1).start()
+        writer.stop()
+        writer.write(b"a")
+        assert writer.write(b"b") == 0
+        assert writer.dropped == 1
+
+    def test_on_write_error(self):
+        """A failing on_write callback is not counted as a port error"""
+        port = MagicMock()
+        writer = SerialWriter(port).start()
+        writer.on_write = MagicMock(side_effect=ValueError("bug"))
+        writer.write(b"a")
+        writer.flush(timeout=1)
+        writer.stop()
+
+        assert writer.errors == 0
+        assert writer.written == 1
+        writer.on_write.assert_called_once_with(b"a")